@@ -1,5 +1,6 @@
 import os
-from fastapi import FastAPI, HTTPException, Depends, status, Request, File, UploadFile, Form
+from fastapi import FastAPI, HTTPException, Depends, status, Request, Response, File, UploadFile, Form, Query
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from contextlib import asynccontextmanager
 from pydantic import BaseModel, field_validator, Field
@@ -9,56 +10,42 @@ from jwt.exceptions import InvalidTokenError
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any, Union
 from dotenv import load_dotenv
-from langchain_neo4j import Neo4jGraph
 from fastapi.middleware.cors import CORSMiddleware
 import uuid
 import base64
 from datetime import datetime
 import json
-import numpy as np
 import re
 from sse_starlette.sse import EventSourceResponse
-from langchain_huggingface import HuggingFaceEmbeddings
-from neo4j import GraphDatabase
+from neo4j_repository import Neo4jRepository
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request as StarletteRequest
 import asyncio
 import logging
-import requests
-
-# Instead, define the create_vector_index function directly here
-def create_vector_index(graph: Neo4jGraph) -> None:
-    # Remove old/unused indices
-    # index_query = "CREATE VECTOR INDEX stackoverflow IF NOT EXISTS FOR (m:Question) ON m.embedding"
-    # try:
-    #     driver.query(index_query)
-    # except Exception as e:
-    #     print(f"Error creating index stackoverflow (potentially harmless if already exists): {e}")
-    # index_query = (
-    #     "CREATE VECTOR INDEX top_answers IF NOT EXISTS FOR (m:Answer) ON m.embedding"
-    # )
-    # try:
-    #     driver.query(index_query)
-    # except Exception as e:
-    #     print(f"Error creating index top_answers (potentially harmless if already exists): {e}")
-    
-    # Additional index for notes
-    index_query_notes = "CREATE VECTOR INDEX notes_vector IF NOT EXISTS FOR (n:Note) ON (n.embedding)"
-    try:
-        print(f"Attempting to execute query: {index_query_notes}")
-        graph.query(index_query_notes)
-        print("Successfully created or verified 'notes_vector' index.")
-    except Exception as e:
-        print(f"ERROR creating 'notes_vector' index: {e}")
-
-    # Index for journals
-    index_query_journals = "CREATE VECTOR INDEX journals_vector IF NOT EXISTS FOR (j:Journal) ON (j.embedding)"
-    try:
-        print(f"Attempting to execute query: {index_query_journals}")
-        graph.query(index_query_journals)
-        print("Successfully created or verified 'journals_vector' index.")
-    except Exception as e:
-        print(f"ERROR creating 'journals_vector' index: {e}")
+from concurrent.futures import ThreadPoolExecutor
+from ollama_client import OllamaClient, OllamaError, OllamaTimeoutError
+from cache import TTLCache, VersionedCache
+from password_hashing import PasswordHasher, PasswordHasherBusy
+from blob_store import BlobStore, decode_data_url
+import codec
+from codec import FastJSONResponse
+from embedding_pipeline import EmbeddingPipeline
+from embedding_worker import EmbeddingWorker
+from note_chunks import NoteChunker
+from migration_jobs import EmbeddingMigration
+from embedding_models import (
+    SENTENCE_TRANSFORMER,
+    SENTENCE_TRANSFORMER_DIMENSION,
+    SENTENCE_TRANSFORMER_MODELS,
+    LazyEmbeddings,
+    embedding_model_id,
+    local_embedding_model,
+)
+from embedding_broker import RemoteEmbeddings, load_shared_sentence_transformer
+from embedding_versions import EmbeddingVersions, VersionedEmbeddings, embedding_version
+from vector_index import OWNER_QUERIES, OverFetch, UserVectorIndexes
+from hybrid_search import HybridSearch
+import functools
 
 # Add a simple logger class to avoid utils dependency
 class BaseLogger:
@@ -81,86 +68,206 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key")  # Change in production
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Content-addressed media store; notes hold /api/blobs/<sha256> references instead of base64
+blob_store = BlobStore(os.getenv("BLOB_STORE_PATH", "/blobs"))
+BLOB_URL_PREFIX = "/api/blobs/"
+BLOB_REFERENCE_PATTERN = re.compile(r"/api/blobs/([0-9a-f]{64})$")
+MAX_BLOB_BYTES = int(os.getenv("MAX_BLOB_BYTES", str(25 * 1024 * 1024)))
+
+# Note list pagination
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Note views: "full" returns the whole content (images, audio), "summary" only an excerpt
+NOTE_VIEW_PATTERN = "^(full|summary)$"
+EXCERPT_LENGTH = 100
+# Passages per note returned by passage search and put into RAG prompts
+PASSAGES_PER_NOTE = int(os.getenv("PASSAGES_PER_NOTE", "2"))
+
+# Cypher RETURN projections for a note bound to `n`. The summary projection never reads
+# n.content (which holds the media) unless the note predates the plain_text property.
+NOTE_FULL_PROJECTION = """
+        n.id as id, n.title as title, n.content as content,
+        n.created_at as created_at, n.updated_at as updated_at,
+        n.tags as tags, n.journal_id as journal_id
+"""
+NOTE_SUMMARY_PROJECTION = """
+        n.id as id, n.title as title, left(n.plain_text, %d) as text_head,
+        CASE WHEN n.plain_text IS NULL THEN n.content END as legacy_content,
+        n.created_at as created_at, n.updated_at as updated_at,
+        n.tags as tags, n.journal_id as journal_id
+""" % (EXCERPT_LENGTH + 1)
+
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-# Connect to Neo4j
-neo4j_graph = Neo4jGraph(url=url, username=username, password=password)
+# bcrypt runs off the event loop on a bounded pool; bursts beyond the queue limit get a 503
+password_hasher = PasswordHasher(
+    pwd_context,
+    max_workers=int(os.getenv("PASSWORD_HASH_WORKERS", "2")),
+    max_pending=int(os.getenv("PASSWORD_HASH_MAX_PENDING", "16")),
+)
+
+# Authenticated principals keyed by token subject, so most requests skip the user lookup
+principal_cache = TTLCache(
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60")),
+)
+
+# Query embeddings keyed by (model id, normalized query text); search-as-you-type
+# and retries repeat the same queries, and a hit skips the model entirely
+query_embedding_cache = TTLCache(
+    maxsize=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", "3600")),
+)
+
+# Search responses keyed by (user, content version, endpoint, normalized query). Note and
+# journal writes bump the user's version; the TTL bounds how long writes made through
+# other worker processes take to show up
+search_result_cache = VersionedCache(
+    maxsize=int(os.getenv("SEARCH_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "30")),
+)
+
+# Connect to Neo4j through a pooled async driver so slow queries don't block the event loop
+db = Neo4jRepository(
+    url=url,
+    username=username,
+    password=password,
+    database=os.getenv("NEO4J_DATABASE", "neo4j"),
+    max_connection_pool_size=int(os.getenv("NEO4J_MAX_CONNECTION_POOL_SIZE", "50")),
+    connection_acquisition_timeout=float(os.getenv("NEO4J_CONNECTION_ACQUISITION_TIMEOUT", "30")),
+)
 
 # Create constraints
-def create_user_constraints():
+async def create_user_constraints():
     # Create uniqueness constraint on username and email
-    neo4j_graph.query("""
+    await db.execute("""
     CREATE CONSTRAINT user_username_unique IF NOT EXISTS 
     FOR (u:User) REQUIRE u.username IS UNIQUE
     """)
     
-    neo4j_graph.query("""
+    await db.execute("""
     CREATE CONSTRAINT user_email_unique IF NOT EXISTS 
     FOR (u:User) REQUIRE u.email IS UNIQUE
     """)
 
-def create_note_constraints():
+async def create_note_constraints():
     # Create uniqueness constraint on note id
-    neo4j_graph.query("""
+    await db.execute("""
     CREATE CONSTRAINT note_id_unique IF NOT EXISTS
     FOR (n:Note) REQUIRE n.id IS UNIQUE
     """)
 
-def create_journal_constraints():
+async def create_journal_constraints():
     # Create uniqueness constraint on journal id
-    neo4j_graph.query("""
+    await db.execute("""
     CREATE CONSTRAINT journal_id_unique IF NOT EXISTS
     FOR (j:Journal) REQUIRE j.id IS UNIQUE
     """)
 
-# First, let's add a function to check if properties exist in Neo4j
-def ensure_property_exists(property_name):
-    # Check if property exists, create it if it doesn't
-    neo4j_graph.query(
-        """
-        CREATE (temp:PropertyCheck {
-          name: 'temp', 
-          %s: ''
-        })
-        """ % property_name
-    )
-    
-    # Clean up the temporary node
-    neo4j_graph.query(
-        """
-        MATCH (temp:PropertyCheck {name: 'temp'})
-        DELETE temp
-        """
-    )
-    print(f"Ensured property {property_name} exists in the database schema")
+async def create_embedding_version_constraints():
+    # One node per embedding model version, however many workers register it at once
+    await db.execute("""
+    CREATE CONSTRAINT embedding_version_key_unique IF NOT EXISTS
+    FOR (v:EmbeddingVersion) REQUIRE v.key IS UNIQUE
+    """)
 
-# Add a function to ensure relationships exist in Neo4j
-def ensure_relationship_exists(relationship_type):
-    # Create a temporary relationship to ensure it exists in the schema
-    neo4j_graph.query(
-        f"""
-        CREATE (a:RelationshipCheck {{name: 'source'}})
-        CREATE (b:RelationshipCheck {{name: 'target'}})
-        CREATE (a)-[:{relationship_type}]->(b)
-        """
-    )
+async def create_migration_lock_constraints():
+    # Makes MERGE on the lock node race-free, so concurrent migration starts serialize on one node
+    await db.execute("""
+    CREATE CONSTRAINT migration_lock_kind_unique IF NOT EXISTS
+    FOR (l:MigrationLock) REQUIRE l.kind IS UNIQUE
+    """)
+
+async def create_note_tag_constraints():
+    # Tags are per user: one node per (username, name), shared by that user's notes
+    await db.execute("""
+    CREATE CONSTRAINT note_tag_username_name_unique IF NOT EXISTS
+    FOR (t:NoteTag) REQUIRE (t.username, t.name) IS UNIQUE
+    """)
+    # Lists a user's tags without naming them
+    await db.execute("""
+    CREATE INDEX note_tag_username IF NOT EXISTS
+    FOR (t:NoteTag) ON (t.username)
+    """)
+
+async def create_note_indexes():
+    # Back keyset pagination of a user's notes and of a journal's notes, ordered by (updated_at, id)
+    await db.execute("""
+    CREATE INDEX note_owner_updated_at_id IF NOT EXISTS
+    FOR (n:Note) ON (n.owner, n.updated_at, n.id)
+    """)
+    await db.execute("""
+    CREATE INDEX note_journal_updated_at_id IF NOT EXISTS
+    FOR (n:Note) ON (n.journal_id, n.updated_at, n.id)
+    """)
+    # Superseded by the two above: note lists always start from an owner or a journal
+    await db.execute("DROP INDEX note_updated_at_id IF EXISTS")
+    # Lets chunk syncs find a note's passages by hash
+    await db.execute("""
+    CREATE INDEX note_chunk_note_hash IF NOT EXISTS
+    FOR (c:NoteChunk) ON (c.note_id, c.hash)
+    """)
+
+async def create_fulltext_indexes():
+    # Keyword search runs over extracted text only, never the JSON content with its media
+    await db.execute("""
+    CREATE FULLTEXT INDEX notes_fulltext IF NOT EXISTS
+    FOR (n:Note) ON EACH [n.title, n.plain_text]
+    """)
+    await db.execute("""
+    CREATE FULLTEXT INDEX journals_fulltext IF NOT EXISTS
+    FOR (j:Journal) ON EACH [j.title, j.description]
+    """)
+
+# Every constraint and index the app creates, by name. Vector indexes belong to
+# embedding versions and are created by EmbeddingVersions.ensure()
+SCHEMA_OBJECTS = {
+    "user_username_unique", "user_email_unique", "note_id_unique", "journal_id_unique",
+    "embedding_version_key_unique", "migration_lock_kind_unique",
+    "note_tag_username_name_unique", "note_tag_username",
+    "note_owner_updated_at_id", "note_journal_updated_at_id", "note_chunk_note_hash",
+    "notes_fulltext", "journals_fulltext",
+}
+
+async def verify_schema():
+    """Check the constraints and indexes in one round trip each, creating them only if any are missing."""
+    existing = {row["name"] for row in await db.read("SHOW CONSTRAINTS YIELD name RETURN name")}
+    existing |= {row["name"] for row in await db.read("SHOW INDEXES YIELD name RETURN name")}
+    missing = SCHEMA_OBJECTS - existing
+    if not missing:
+        print("Schema verified")
+        return
     
-    # Clean up temporary nodes and relationships
-    neo4j_graph.query(
-        """
-        MATCH (n:RelationshipCheck)
-        DETACH DELETE n
-        """
-    )
-    print(f"Ensured relationship {relationship_type} exists in the database schema")
+    print(f"Creating missing schema objects: {', '.join(sorted(missing))}")
+    await create_user_constraints()
+    await create_note_constraints()
+    await create_journal_constraints()
+    await create_embedding_version_constraints()
+    await create_migration_lock_constraints()
+    await create_note_tag_constraints()
+    await create_note_indexes()
+    await create_fulltext_indexes()
+    print("Constraints and indices created successfully")
+    if "note_owner_updated_at_id" in missing:
+        await backfill_note_owners()
+
+async def backfill_note_owners():
+    # Notes written before n.owner existed are invisible to the owner-keyed note list until filled in
+    await db.execute("""
+    MATCH (n:Note)-[:CREATED_BY]->(u:User)
+    WHERE n.owner IS NULL
+    CALL { WITH n, u SET n.owner = u.username } IN TRANSACTIONS OF 1000 ROWS
+    """)
+    print("Note owners backfilled")
 
 # Function to initialize the database with sample data
-def initialize_database():
+async def initialize_database():
     print("Checking if database needs initialization...")
 
     # Check if there's any content in the database
-    result = neo4j_graph.query("""
+    result = await db.read("""
     MATCH (n) RETURN count(n) as node_count
     """)
     
@@ -174,9 +281,9 @@ def initialize_database():
     # Create admin user
     admin_username = "admin"
     admin_email = "admin@example.com"
-    admin_password = get_password_hash("adminpassword")
+    admin_password = await password_hasher.hash("adminpassword")
     
-    neo4j_graph.query(
+    await db.write(
         """
         CREATE (u:User {
             username: $username,
@@ -211,9 +318,9 @@ def initialize_database():
     }
     
     # Convert template to JSON string
-    template_json = json.dumps(template)
+    template_json = codec.dumps(template)
     
-    neo4j_graph.query(
+    await db.write(
         """
         MATCH (u:User {username: $username})
         CREATE (j:Journal {
@@ -238,20 +345,8 @@ def initialize_database():
     
     print("Created sample journal")
     
-    # Generate embedding for the sample journal
-    journal_text = "Sample Journal This is a sample journal created during initialization"
-    journal_embedding = embedding_model.embed_query(journal_text)
-    
-    # Store the embedding
-    neo4j_graph.query(
-        """
-        MATCH (j:Journal {id: $journal_id})
-        SET j.embedding = $embedding
-        """,
-        {"journal_id": journal_id, "embedding": journal_embedding}
-    )
-    
-    print("Generated embedding for sample journal")
+    # Embedded by the background worker once it starts, so startup never waits for the model
+    embedding_worker.enqueue("journal", journal_id)
 
     # Create a sample note
     note_id = str(uuid.uuid4())
@@ -262,27 +357,34 @@ def initialize_database():
         "images": [], 
         "audio": None
     }
-    content_json = json.dumps(note_content)
+    content_json = codec.dumps(note_content)
     
-    neo4j_graph.query(
+    await db.write(
         """
         MATCH (u:User {username: $username})
         CREATE (n:Note {
             id: $id,
             title: 'Welcome to Project Scribe',
             content: $content,
+            plain_text: $plain_text,
             created_at: $timestamp,
             updated_at: $timestamp,
             tags: $tags,
-            journal_id: $journal_id
+            journal_id: $journal_id,
+            owner: u.username
         })
         CREATE (n)-[:CREATED_BY]->(u)
+        FOREACH (name IN $tags |
+            MERGE (t:NoteTag {username: u.username, name: name})
+            MERGE (n)-[:HAS_TAG]->(t)
+        )
         RETURN n
         """,
         {
             "id": note_id,
             "username": admin_username,
             "content": content_json,
+            "plain_text": note_content["text"],
             "timestamp": current_time,
             "tags": ["sample", "welcome"],
             "journal_id": journal_id
@@ -290,7 +392,7 @@ def initialize_database():
     )
     
     # Link note to journal
-    neo4j_graph.query(
+    await db.write(
         """
         MATCH (n:Note {id: $note_id})
         MATCH (j:Journal {id: $journal_id})
@@ -300,7 +402,7 @@ def initialize_database():
     )
     
     # Update journal note count
-    neo4j_graph.query(
+    await db.write(
         """
         MATCH (j:Journal {id: $journal_id})
         SET j.note_count = 1
@@ -310,180 +412,114 @@ def initialize_database():
     
     print("Created sample note and linked it to the journal")
     
-    # Generate embedding for the sample note
-    note_text = "Welcome to Project Scribe This is a sample note to help you get started."
-    note_embedding = embedding_model.embed_query(note_text)
-    
-    # Store the embedding
-    neo4j_graph.query(
-        """
-        MATCH (n:Note {id: $note_id})
-        SET n.embedding = $embedding
-        """,
-        {"note_id": note_id, "embedding": note_embedding}
-    )
-    
-    print("Generated embedding for sample note")
+    embedding_worker.enqueue("note", note_id)
     
     print("Database initialization complete")
 
-# Lifespan context manager (replacing on_event)
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    print("Creating constraints...")
+# Startup progress reported by /readyz
+startup_state = {"database": False, "model": False}
+background_tasks = set()
+
+def run_in_background(coro):
+    # Keeps a reference so the task isn't garbage collected mid-run
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def prepare_database():
+    """Verify the schema and seed an empty database, retrying until Neo4j is reachable."""
+    while True:
+        try:
+            await verify_schema()
+            await embedding_versions.ensure()
+            await initialize_database()
+            startup_state["database"] = True
+            break
+        except Exception as e:
+            print(f"Database not ready: {str(e)}; retrying in 5s")
+            await asyncio.sleep(5)
+
+async def backfill_embeddings():
+    """Resume an interrupted embedding migration, or start one to build a new version or fill in missing embeddings."""
     try:
-        create_user_constraints()
-        create_note_constraints()
-        create_journal_constraints()
-        print("Constraints created successfully")
-        
-        print("Creating vector indices...")
-        create_vector_index(neo4j_graph)
-        print("Vector indices created successfully")
-        
-        # Ensure all required properties exist in the schema
-        print("Ensuring properties exist...")
-        ensure_property_exists("full_name")
-        ensure_property_exists("disabled")
-        ensure_property_exists("title")
-        ensure_property_exists("content")
-        ensure_property_exists("tags")
-        ensure_property_exists("journal_id")
-        ensure_property_exists("updated_at")
-        ensure_property_exists("created_at")
-        ensure_property_exists("description")
-        ensure_property_exists("note_count")
-        ensure_property_exists("template")
-        
-        # Ensure relationships exist in the schema
-        print("Ensuring relationships exist...")
-        ensure_relationship_exists("CREATED_BY")
-        ensure_relationship_exists("OWNED_BY")
-        ensure_relationship_exists("BELONGS_TO")
-        
-        print("Schema properties and relationships created successfully")
-        
-        # Initialize database with sample data
-        print("Starting database initialization...")
-        initialize_database()
-        print("Database initialization completed")
-        
-        # Generate embeddings for all notes and journals without embeddings
-        print("Checking for notes and journals without embeddings...")
-        
-        # Count notes without embeddings
-        result = neo4j_graph.query(
-            """
-            MATCH (n:Note)
-            WHERE n.embedding IS NULL
-            RETURN count(n) as notes_without_embeddings
-            """
-        )
-        notes_without_embeddings = result[0]["notes_without_embeddings"] if result else 0
-        
-        # Count journals without embeddings
-        result = neo4j_graph.query(
-            """
-            MATCH (j:Journal)
-            WHERE j.embedding IS NULL
-            RETURN count(j) as journals_without_embeddings
+        if await embedding_migration.resume() is not None:
+            return
+        if embedding_versions.building is not None:
+            print(f"Building embedding version {embedding_versions.building.key} in the background")
+            await embedding_migration.start()
+            return
+        version = embedding_versions.active
+        result = await db.read(
             """
+            RETURN EXISTS { MATCH (n:Note) WHERE n.%s IS NULL } OR
+                   EXISTS { MATCH (j:Journal) WHERE j.%s IS NULL } OR
+                   EXISTS { MATCH (n:Note) WHERE n.%s IS NULL } as missing
+            """ % (version.embedding_property, version.embedding_property, version.chunks_hash_property)
         )
-        journals_without_embeddings = result[0]["journals_without_embeddings"] if result else 0
-        
-        if notes_without_embeddings > 0 or journals_without_embeddings > 0:
-            print(f"Found {notes_without_embeddings} notes and {journals_without_embeddings} journals without embeddings")
-            print("Generating missing embeddings...")
-            
-            # Process notes without embeddings
-            if notes_without_embeddings > 0:
-                notes = neo4j_graph.query(
-                    """
-                    MATCH (n:Note)
-                    WHERE n.embedding IS NULL
-                    RETURN n.id as id, n.title as title, n.content as content
-                    """
-                )
-                
-                print(f"Processing {len(notes)} notes without embeddings")
-                for i, note in enumerate(notes):
-                    content_dict = deserialize_json_field(note["content"])
-                    text_content = content_dict.get("text", "")
-                    
-                    # Include title in embedding to improve search relevance
-                    embed_text = f"{note['title']} {text_content}"
-                    
-                    if embed_text.strip():
-                        try:
-                            embedding = embedding_model.embed_query(embed_text)
-                            
-                            # Store embedding back to note
-                            neo4j_graph.query(
-                                """
-                                MATCH (n:Note {id: $note_id})
-                                SET n.embedding = $embedding
-                                """,
-                                {"note_id": note["id"], "embedding": embedding}
-                            )
-                            
-                            if (i + 1) % 10 == 0:
-                                print(f"Processed {i + 1}/{len(notes)} notes")
-                        except Exception as e:
-                            print(f"Error generating embedding for note {note['id']}: {e}")
-                
-                print(f"Completed embedding generation for {len(notes)} notes")
-            
-            # Process journals without embeddings
-            if journals_without_embeddings > 0:
-                journals = neo4j_graph.query(
-                    """
-                    MATCH (j:Journal)
-                    WHERE j.embedding IS NULL
-                    RETURN j.id as id, j.title as title, j.description as description
-                    """
-                )
-                
-                print(f"Processing {len(journals)} journals without embeddings")
-                for i, journal in enumerate(journals):
-                    description = journal.get("description", "")
-                    
-                    # Combine title and description for embedding
-                    embed_text = f"{journal['title']} {description}"
-                    
-                    if embed_text.strip():
-                        try:
-                            embedding = embedding_model.embed_query(embed_text)
-                            
-                            # Store embedding back to journal
-                            neo4j_graph.query(
-                                """
-                                MATCH (j:Journal {id: $journal_id})
-                                SET j.embedding = $embedding
-                                """,
-                                {"journal_id": journal["id"], "embedding": embedding}
-                            )
-                            
-                            if (i + 1) % 10 == 0:
-                                print(f"Processed {i + 1}/{len(journals)} journals")
-                        except Exception as e:
-                            print(f"Error generating embedding for journal {journal['id']}: {e}")
-                
-                print(f"Completed embedding generation for {len(journals)} journals")
-            
-            print("Finished generating all missing embeddings")
+        if result and result[0]["missing"]:
+            print("Found notes or journals without embeddings, starting background migration")
+            await embedding_migration.start()
         else:
             print("All notes and journals already have embeddings")
-        
     except Exception as e:
-        print(f"Error during startup: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        print(f"Could not start embedding backfill: {str(e)}")
+
+async def warm_embedding_model():
+    try:
+        if isinstance(embedding_model, LazyEmbeddings):
+            await asyncio.to_thread(embedding_model.warm)
+        startup_state["model"] = True
+    except Exception as e:
+        print(f"Could not load embedding model: {str(e)}")
+
+async def finish_startup(database_task):
+    await database_task
+    await backfill_embeddings()
+    # Until a build of the configured model completes, searches embed queries with the active version's model
+    active_model = embeddings_for(embedding_versions.active).embeddings
+    if EMBEDDING_PREWARM and active_model is not embedding_model and isinstance(active_model, LazyEmbeddings):
+        try:
+            await asyncio.to_thread(active_model.warm)
+        except Exception as e:
+            print(f"Could not load the active embedding version's model: {str(e)}")
+
+# Lifespan context manager (replacing on_event)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Only the schema check runs before traffic is accepted; the model loads and
+    # missing embeddings are backfilled in the background, tracked by /readyz
+    if EMBEDDING_PREWARM:
+        run_in_background(warm_embedding_model())
+    else:
+        # Loaded by the first request that needs it
+        startup_state["model"] = True
+    
+    database_task = run_in_background(prepare_database())
+    # Usually done in one round trip per check; if Neo4j is still starting the
+    # app comes up anyway and reports not ready until it is reachable
+    await asyncio.wait({database_task}, timeout=float(os.getenv("STARTUP_SCHEMA_TIMEOUT_SECONDS", "10")))
+    run_in_background(finish_startup(database_task))
     
+    embedding_worker.start()
     yield
-    # Shutdown: nothing to do
+    # Shutdown: checkpoint the migration, embed what is still queued, then release pooled connections
+    for task in list(background_tasks):
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await embedding_migration.stop()
+    await embedding_worker.stop()
+    await ollama_client.aclose()
+    await db.close()
+    password_hasher.shutdown()
+    embedding_executor.shutdown(wait=False, cancel_futures=True)
+    for broker in version_brokers.values():
+        broker.close()
+        if isinstance(broker.embeddings, RemoteEmbeddings):
+            await broker.embeddings.aclose()
 
 # FastAPI app
-app = FastAPI(title="Project Scribe Backend", lifespan=lifespan)
+app = FastAPI(title="Project Scribe Backend", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # Update CORS settings to be more specific
 app.add_middleware(
@@ -497,6 +533,14 @@ app.add_middleware(
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Shared Ollama client; keeps connections alive across all LLM endpoints
+ollama_client = OllamaClient(
+    chat_url=os.getenv("OLLAMA_API_URL", "http://host.docker.internal:11434/api/chat"),
+    model=os.getenv("OLLAMA_MODEL", "llama3"),
+    max_connections=int(os.getenv("OLLAMA_MAX_CONNECTIONS", "20")),
+    max_retries=int(os.getenv("OLLAMA_MAX_RETRIES", "2")),
+)
+
 # Models
 class UserCreate(BaseModel):
     username: str
@@ -530,8 +574,8 @@ class TokenData(BaseModel):
 # Note and Journal models
 class NoteContent(BaseModel):
     text: str = ""
-    images: List[str] = []  # Base64 encoded images
-    audio: Optional[str] = None  # Base64 encoded audio
+    images: List[str] = []  # /api/blobs/<sha256> references (base64 accepted on write)
+    audio: Optional[str] = None  # Same as images
 
 class NoteCreate(BaseModel):
     title: str
@@ -548,6 +592,24 @@ class Note(BaseModel):
     tags: List[str] = []
     journal_id: Optional[str] = None
 
+class NoteSummary(BaseModel):
+    # List/search view of a note: no images or audio, just a short text excerpt
+    id: str
+    title: str
+    excerpt: str
+    created_at: str
+    updated_at: str
+    tags: List[str] = []
+    journal_id: Optional[str] = None
+
+class NotePage(BaseModel):
+    items: List[Note]
+    next_cursor: Optional[str] = None  # Pass back as `cursor` to fetch the next page
+
+class NoteSummaryPage(BaseModel):
+    items: List[NoteSummary]
+    next_cursor: Optional[str] = None
+
 class NoteUpdate(BaseModel):
     title: Optional[str] = None
     content: Optional[NoteContent] = None
@@ -574,14 +636,15 @@ class JournalUpdate(BaseModel):
     template: Optional[Dict[str, Any]] = None
 
 # Helper functions
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
+def password_hasher_busy_exception():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many concurrent login requests, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
 
-def get_user(username: str):
-    result = neo4j_graph.query(
+async def get_user(username: str):
+    result = await db.read(
         """
         MATCH (u:User {username: $username}) 
         RETURN u.username as username, u.email as email, 
@@ -598,11 +661,15 @@ def get_user(username: str):
     user_data = result[0]
     return UserInDB(**user_data)
 
-def authenticate_user(username: str, password: str):
-    user = get_user(username)
+async def authenticate_user(username: str, password: str):
+    user = await get_user(username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    try:
+        password_ok = await password_hasher.verify(password, user.hashed_password)
+    except PasswordHasherBusy:
+        raise password_hasher_busy_exception()
+    if not password_ok:
         return False
     return user
 
@@ -630,11 +697,24 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         token_data = TokenData(username=username)
     except InvalidTokenError:
         raise credentials_exception
-    user = get_user(username=token_data.username)
-    if user is None:
+    user = principal_cache.get(token_data.username)
+    if user is not None:
+        return user
+    user_in_db = await get_user(username=token_data.username)
+    if user_in_db is None:
         raise credentials_exception
+    # Never keep the password hash in the cache
+    user = User(**user_in_db.model_dump(exclude={"hashed_password"}))
+    principal_cache.set(token_data.username, user)
     return user
 
+def invalidate_principal(username: Optional[str] = None):
+    """Drop a cached principal after the user is disabled or deleted; clears all when no username is given."""
+    if username is None:
+        principal_cache.clear()
+    else:
+        principal_cache.invalidate(username)
+
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
     if current_user.disabled:
         raise HTTPException(status_code=400, detail="Inactive user")
@@ -648,7 +728,7 @@ async def register_user(user: UserCreate, request: Request):
     
     # First, check if user already exists before trying to create
     try:
-        existing_user = neo4j_graph.query(
+        existing_user = await db.read(
             """
             MATCH (u:User) 
             WHERE u.username = $username OR u.email = $email
@@ -671,16 +751,19 @@ async def register_user(user: UserCreate, request: Request):
             detail="Username or email already registered"
         )
         
+    # Hash outside the try block below so saturation surfaces as 503, not 500
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except PasswordHasherBusy:
+        raise password_hasher_busy_exception()
+    
     # Now try to create the user
     try:
-        # Create new user
-        hashed_password = get_password_hash(user.password)
-        
         # Ensure full_name is always a string
         full_name = user.full_name if user.full_name is not None else ''
         
         # Create user
-        neo4j_graph.query(
+        await db.write(
             """
             CREATE (u:User {
                 username: $username, 
@@ -718,7 +801,7 @@ async def register_user(user: UserCreate, request: Request):
 @app.post("/token", response_model=Token)
 async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
     print(f"Login attempt from: {request.client.host}, username: {form_data.username}")
-    user = authenticate_user(form_data.username, form_data.password)
+    user = await authenticate_user(form_data.username, form_data.password)
     if not user:
         print(f"Invalid credentials for user: {form_data.username}")
         raise HTTPException(
@@ -741,131 +824,221 @@ async def read_users_me(current_user: User = Depends(get_current_active_user)):
 async def hello(request: Request):
     return {"message": "Hello from the API"}
 
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: the schema is verified, Neo4j is reachable and the embedding model is loaded."""
+    checks = dict(startup_state)
+    if checks["database"]:
+        try:
+            await db.verify_connectivity()
+        except Exception:
+            checks["database"] = False
+    ready = all(checks.values())
+    return FastJSONResponse(
+        {"status": "ready" if ready else "starting", "checks": checks},
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
 # Notes API Endpoints
 @app.post("/api/notes", response_model=Note)
 async def create_note(note_data: NoteCreate, current_user: User = Depends(get_current_active_user)):
     note_id = str(uuid.uuid4())
     current_time = datetime.utcnow().isoformat()
     
-    # Check if journal exists if journal_id is provided
-    if note_data.journal_id:
-        journal = neo4j_graph.query(
-            """
-            MATCH (j:Journal {id: $journal_id})
-            MATCH (u:User {username: $username})
-            MATCH (j)-[:OWNED_BY]->(u)
-            RETURN j
-            """,
-            {"journal_id": note_data.journal_id, "username": current_user.username}
-        )
-        
-        if not journal:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Journal not found or you don't have access to it"
-            )
-    
-    # Serialize content to JSON string
-    content_json = json.dumps(note_data.content.model_dump())
+    # Move inline media to the blob store, then serialize content to JSON string
+    note_content = await asyncio.to_thread(externalize_media, note_data.content)
+    content_json = codec.dumps(note_content.model_dump())
     
-    # Create note
-    neo4j_graph.query(
+    # Create the note, link it to its journal and tags and bump the journal's note
+    # count in a single write transaction. If a journal_id is given but the user doesn't own that
+    # journal, the WHERE filters out the only row and nothing is written.
+    result = await db.write(
         """
         MATCH (u:User {username: $username})
+        OPTIONAL MATCH (j:Journal {id: $journal_id})-[:OWNED_BY]->(u)
+        WITH u, j
+        WHERE $journal_id IS NULL OR j IS NOT NULL
         CREATE (n:Note {
             id: $id,
             title: $title,
             content: $content,
+            plain_text: $plain_text,
             created_at: $timestamp,
             updated_at: $timestamp,
-            tags: $tags
+            tags: $tags,
+            owner: u.username
         })
         CREATE (n)-[:CREATED_BY]->(u)
-        RETURN n
+        FOREACH (name IN $tags |
+            MERGE (t:NoteTag {username: u.username, name: name})
+            MERGE (n)-[:HAS_TAG]->(t)
+        )
+        FOREACH (_ IN CASE WHEN j IS NULL THEN [] ELSE [1] END |
+            CREATE (n)-[:BELONGS_TO]->(j)
+            SET n.journal_id = j.id,
+                j.note_count = COALESCE(j.note_count, 0) + 1
+        )
+        RETURN n.id as id, n.journal_id as journal_id
         """,
         {
             "id": note_id,
             "title": note_data.title,
             "content": content_json,
+            "plain_text": note_data.content.text,
             "timestamp": current_time,
             "tags": note_data.tags,
-            "username": current_user.username
+            "username": current_user.username,
+            "journal_id": note_data.journal_id or None
         }
     )
     
-    # Link note to journal if journal_id is provided
-    if note_data.journal_id:
-        neo4j_graph.query(
-            """
-            MATCH (n:Note {id: $note_id})
-            MATCH (j:Journal {id: $journal_id})
-            CREATE (n)-[:BELONGS_TO]->(j)
-            SET n.journal_id = $journal_id
-            """,
-            {"note_id": note_id, "journal_id": note_data.journal_id}
-        )
-        
-        # Update note count in journal
-        neo4j_graph.query(
-            """
-            MATCH (j:Journal {id: $journal_id})
-            SET j.note_count = COALESCE(j.note_count, 0) + 1
-            """,
-            {"journal_id": note_data.journal_id}
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Journal not found or you don't have access to it"
         )
     
+    embedding_worker.enqueue("note", note_id)
+    search_result_cache.bump(current_user.username)
+    
     return {
         "id": note_id,
         "title": note_data.title,
-        "content": note_data.content,
+        "content": note_content,
         "created_at": current_time,
         "updated_at": current_time,
         "tags": note_data.tags,
-        "journal_id": note_data.journal_id
+        "journal_id": result[0]["journal_id"]
     }
 
-@app.get("/api/notes", response_model=List[Note])
-async def get_notes(current_user: User = Depends(get_current_active_user)):
-    notes = neo4j_graph.query(
-        """
-        MATCH (n:Note)-[:CREATED_BY]->(u:User {username: $username})
-        RETURN n.id as id, n.title as title, n.content as content, 
-               n.created_at as created_at, n.updated_at as updated_at,
-               n.tags as tags, n.journal_id as journal_id
-        ORDER BY n.updated_at DESC
+@app.get("/api/notes", response_model=Union[NotePage, NoteSummaryPage])
+async def get_notes(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    view: str = Query("full", pattern=NOTE_VIEW_PATTERN),
+    current_user: User = Depends(get_current_active_user)
+):
+    cursor_updated_at, cursor_id = decode_cursor(cursor)
+    projection = NOTE_SUMMARY_PROJECTION if view == "summary" else NOTE_FULL_PROJECTION
+    
+    # Keyset pagination on (owner, updated_at, id): each page is one seek into
+    # note_owner_updated_at_id, whatever the size of the user's or anyone else's corpus
+    notes = await db.read(
+        f"""
+        MATCH (n:Note)
+        WHERE n.owner = $username {keyset_condition(cursor_updated_at)}
+        RETURN {projection}
+        ORDER BY n.updated_at DESC, n.id DESC
+        LIMIT $fetch_limit
         """,
-        {"username": current_user.username}
+        {
+            "username": current_user.username,
+            "cursor_updated_at": cursor_updated_at,
+            "cursor_id": cursor_id,
+            "fetch_limit": limit + 1
+        }
     )
     
-    result = []
-    for note in notes:
-        # Convert content from string/dict to NoteContent model
-        content_dict = deserialize_json_field(note["content"])
-            
-        note_content = NoteContent(**content_dict)
-        
-        result.append({
-            "id": note["id"],
-            "title": note["title"],
-            "content": note_content,
-            "created_at": note["created_at"],
-            "updated_at": note["updated_at"],
-            "tags": note["tags"] if note["tags"] else [],
-            "journal_id": note["journal_id"]
-        })
+    return FastJSONResponse(build_note_page(notes, limit, view))
+
+@app.get("/api/notes/{note_id}", response_model=Union[Note, NoteSummary])
+async def get_note(
+    note_id: str,
+    view: str = Query("full", pattern=NOTE_VIEW_PATTERN),
+    current_user: User = Depends(get_current_active_user)
+):
+    projection = NOTE_SUMMARY_PROJECTION if view == "summary" else NOTE_FULL_PROJECTION
+    result = await db.read(
+        f"""
+        MATCH (n:Note {{id: $note_id}})-[:CREATED_BY]->(u:User {{username: $username}})
+        RETURN {projection}
+        """,
+        {"note_id": note_id, "username": current_user.username}
+    )
+    
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Note not found or you don't have access to it"
+        )
     
-    return result
+    note = result[0]
+    
+    if view == "summary":
+        return FastJSONResponse(note_row_to_summary(note))
+    
+    return FastJSONResponse(note_row_to_response(note))
 
-@app.get("/api/notes/{note_id}", response_model=Note)
-async def get_note(note_id: str, current_user: User = Depends(get_current_active_user)):
-    result = neo4j_graph.query(
+@app.put("/api/notes/{note_id}", response_model=Note)
+async def update_note(note_id: str, note_update: NoteUpdate, current_user: User = Depends(get_current_active_user)):
+    # Update note fields
+    update_data = {}
+    if note_update.title:
+        update_data["title"] = note_update.title
+    
+    if note_update.content:
+        # Move inline media to the blob store, then serialize content to JSON string
+        note_content = await asyncio.to_thread(externalize_media, note_update.content)
+        update_data["content"] = codec.dumps(note_content.model_dump())
+        # Plain text copy lets list and search views skip the media in content
+        update_data["plain_text"] = note_update.content.text
+    
+    if note_update.tags is not None:
+        update_data["tags"] = note_update.tags
+    
+    # Apply the field changes, tag changes and any journal move in one write transaction
+    # and return the updated note. Moving into a journal the user doesn't own leaves the
+    # note untouched and reports journal_ok = false.
+    result = await db.write(
         """
         MATCH (n:Note {id: $note_id})-[:CREATED_BY]->(u:User {username: $username})
-        RETURN n.id as id, n.title as title, n.content as content, 
+        OPTIONAL MATCH (n)-[old_tag:HAS_TAG]->(:NoteTag)
+        WITH n, u, collect(old_tag) as old_tags
+        OPTIONAL MATCH (n)-[old_link:BELONGS_TO]->(old_journal:Journal {id: n.journal_id})
+        OPTIONAL MATCH (new_journal:Journal {id: $journal_id})-[:OWNED_BY]->(u)
+        WITH n, u, old_tags, old_link, old_journal, new_journal,
+             COALESCE(n.journal_id, '') <> COALESCE($journal_id, '') AS moving
+        WITH n, u, old_tags, old_link, old_journal, new_journal, moving,
+             NOT moving OR $journal_id IS NULL OR new_journal IS NOT NULL AS journal_ok
+        FOREACH (_ IN CASE WHEN journal_ok THEN [1] ELSE [] END |
+            SET n += $changes, n.updated_at = $timestamp
+        )
+        FOREACH (r IN CASE WHEN journal_ok AND $tags IS NOT NULL
+                           THEN [r IN old_tags WHERE NOT endNode(r).name IN $tags] ELSE [] END |
+            DELETE r
+        )
+        FOREACH (name IN CASE WHEN journal_ok THEN COALESCE($tags, []) ELSE [] END |
+            MERGE (t:NoteTag {username: u.username, name: name})
+            MERGE (n)-[:HAS_TAG]->(t)
+        )
+        FOREACH (_ IN CASE WHEN journal_ok AND moving AND old_link IS NOT NULL THEN [1] ELSE [] END |
+            DELETE old_link
+            SET old_journal.note_count = COALESCE(old_journal.note_count, 1) - 1
+        )
+        FOREACH (_ IN CASE WHEN journal_ok AND moving THEN [1] ELSE [] END |
+            SET n.journal_id = $journal_id
+        )
+        FOREACH (_ IN CASE WHEN journal_ok AND moving AND new_journal IS NOT NULL THEN [1] ELSE [] END |
+            CREATE (n)-[:BELONGS_TO]->(new_journal)
+            SET new_journal.note_count = COALESCE(new_journal.note_count, 0) + 1
+        )
+        RETURN journal_ok, n.id as id, n.title as title, n.content as content, 
                n.created_at as created_at, n.updated_at as updated_at,
                n.tags as tags, n.journal_id as journal_id
         """,
-        {"note_id": note_id, "username": current_user.username}
+        {
+            "note_id": note_id,
+            "username": current_user.username,
+            "journal_id": note_update.journal_id or None,
+            "timestamp": datetime.utcnow().isoformat(),
+            "changes": update_data,
+            "tags": note_update.tags
+        }
     )
     
     if not result:
@@ -874,33 +1047,50 @@ async def get_note(note_id: str, current_user: User = Depends(get_current_active
             detail="Note not found or you don't have access to it"
         )
     
-    note = result[0]
+    updated_note = result[0]
+    
+    if not updated_note["journal_ok"]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Journal not found or you don't have access to it"
+        )
+    
+    # Only the title and text feed the embedding
+    if "title" in update_data or "content" in update_data:
+        embedding_worker.enqueue("note", note_id)
+    
+    # Tag and journal changes show up in searches too
+    search_result_cache.bump(current_user.username)
     
     # Convert content from string/dict to NoteContent model
-    content_dict = deserialize_json_field(note["content"])
+    content_dict = deserialize_json_field(updated_note["content"])
         
     note_content = NoteContent(**content_dict)
     
     return {
-        "id": note["id"],
-        "title": note["title"],
+        "id": updated_note["id"],
+        "title": updated_note["title"],
         "content": note_content,
-        "created_at": note["created_at"],
-        "updated_at": note["updated_at"],
-        "tags": note["tags"] if note["tags"] else [],
-        "journal_id": note["journal_id"]
+        "created_at": updated_note["created_at"],
+        "updated_at": updated_note["updated_at"],
+        "tags": updated_note["tags"] if updated_note["tags"] else [],
+        "journal_id": updated_note["journal_id"]
     }
 
-@app.put("/api/notes/{note_id}", response_model=Note)
-async def update_note(note_id: str, note_update: NoteUpdate, current_user: User = Depends(get_current_active_user)):
-    # Verify note exists and belongs to user
-    import json  # Local import to ensure it's available
-    result = neo4j_graph.query(
+@app.delete("/api/notes/{note_id}")
+async def delete_note(note_id: str, current_user: User = Depends(get_current_active_user)):
+    # Delete the note and decrement its journal's note count in one transaction
+    result = await db.write(
         """
         MATCH (n:Note {id: $note_id})-[:CREATED_BY]->(u:User {username: $username})
-        RETURN n.id as id, n.title as title, n.content as content, 
-               n.created_at as created_at, n.updated_at as updated_at,
-               n.tags as tags, n.journal_id as journal_id
+        OPTIONAL MATCH (n)-[:BELONGS_TO]->(j:Journal)
+        WITH n, n.id as id, collect(j) as journals
+        OPTIONAL MATCH (c:NoteChunk)-[:CHUNK_OF]->(n)
+        WITH n, id, journals, collect(c) as chunks
+        FOREACH (c IN chunks | DETACH DELETE c)
+        DETACH DELETE n
+        FOREACH (j IN journals | SET j.note_count = COALESCE(j.note_count, 1) - 1)
+        RETURN id
         """,
         {"note_id": note_id, "username": current_user.username}
     )
@@ -911,161 +1101,9 @@ async def update_note(note_id: str, note_update: NoteUpdate, current_user: User
             detail="Note not found or you don't have access to it"
         )
     
-    current_note = result[0]
-    
-    # Update note fields
-    update_data = {}
-    if note_update.title:
-        update_data["title"] = note_update.title
-    
-    if note_update.content:
-        # Serialize content to JSON string
-        update_data["content"] = json.dumps(note_update.content.model_dump())
-    
-    if note_update.tags is not None:
-        update_data["tags"] = note_update.tags
-    
-    # Handle journal update if needed
-    old_journal_id = current_note["journal_id"]
-    new_journal_id = note_update.journal_id
-    
-    # Update note in Neo4j
-    update_cypher = """
-    MATCH (n:Note {id: $note_id})-[:CREATED_BY]->(u:User {username: $username})
-    SET n.updated_at = $timestamp
-    """
-    
-    # Add each field to update
-    for key, value in update_data.items():
-        update_cypher += f", n.{key} = ${key}"
-    
-    # Execute update query
-    neo4j_graph.query(
-        update_cypher,
-        {
-            "note_id": note_id,
-            "username": current_user.username,
-            "timestamp": datetime.utcnow().isoformat(),
-            **update_data
-        }
-    )
-    
-    # Handle journal relationship changes if needed
-    if new_journal_id != old_journal_id:
-        # Remove from old journal if it existed
-        if old_journal_id:
-            neo4j_graph.query(
-                """
-                MATCH (n:Note {id: $note_id})-[r:BELONGS_TO]->(j:Journal {id: $journal_id})
-                DELETE r
-                SET n.journal_id = null
-                WITH j
-                MATCH (j)
-                SET j.note_count = COALESCE(j.note_count, 1) - 1
-                """,
-                {"note_id": note_id, "journal_id": old_journal_id}
-            )
-        
-        # Add to new journal if specified
-        if new_journal_id:
-            # Verify journal exists and belongs to user
-            journal = neo4j_graph.query(
-                """
-                MATCH (j:Journal {id: $journal_id})-[:OWNED_BY]->(u:User {username: $username})
-                RETURN j
-                """,
-                {"journal_id": new_journal_id, "username": current_user.username}
-            )
-            
-            if not journal:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Journal not found or you don't have access to it"
-                )
-            
-            # Link note to new journal
-            neo4j_graph.query(
-                """
-                MATCH (n:Note {id: $note_id})
-                MATCH (j:Journal {id: $journal_id})
-                CREATE (n)-[:BELONGS_TO]->(j)
-                SET n.journal_id = $journal_id
-                WITH j
-                MATCH (j)
-                SET j.note_count = COALESCE(j.note_count, 0) + 1
-                """,
-                {"note_id": note_id, "journal_id": new_journal_id}
-            )
-            
-            update_data["journal_id"] = new_journal_id
-    
-    # Get updated note
-    updated_note = neo4j_graph.query(
-        """
-        MATCH (n:Note {id: $note_id})
-        RETURN n.id as id, n.title as title, n.content as content, 
-               n.created_at as created_at, n.updated_at as updated_at,
-               n.tags as tags, n.journal_id as journal_id
-        """,
-        {"note_id": note_id}
-    )[0]
-    
-    # Convert content from string/dict to NoteContent model
-    if isinstance(updated_note["content"], str):
-        import json
-        content_dict = json.loads(updated_note["content"])
-    else:
-        content_dict = updated_note["content"]
-        
-    note_content = NoteContent(**content_dict)
-    
-    return {
-        "id": updated_note["id"],
-        "title": updated_note["title"],
-        "content": note_content,
-        "created_at": updated_note["created_at"],
-        "updated_at": updated_note["updated_at"],
-        "tags": updated_note["tags"] if updated_note["tags"] else [],
-        "journal_id": updated_note["journal_id"]
-    }
-
-@app.delete("/api/notes/{note_id}")
-async def delete_note(note_id: str, current_user: User = Depends(get_current_active_user)):
-    # First, verify note exists and get its journal if any
-    result = neo4j_graph.query(
-        """
-        MATCH (n:Note {id: $note_id})-[:CREATED_BY]->(u:User {username: $username})
-        RETURN n.journal_id as journal_id
-        """,
-        {"note_id": note_id, "username": current_user.username}
-    )
-    
-    if not result:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Note not found or you don't have access to it"
-        )
-    
-    journal_id = result[0]["journal_id"]
-    
-    # Delete note
-    neo4j_graph.query(
-        """
-        MATCH (n:Note {id: $note_id})-[:CREATED_BY]->(u:User {username: $username})
-        DETACH DELETE n
-        """,
-        {"note_id": note_id, "username": current_user.username}
-    )
-    
-    # Update journal note count if note was in a journal
-    if journal_id:
-        neo4j_graph.query(
-            """
-            MATCH (j:Journal {id: $journal_id})
-            SET j.note_count = COALESCE(j.note_count, 1) - 1
-            """,
-            {"journal_id": journal_id}
-        )
+    embedding_worker.discard("note", note_id)
+    user_vector_indexes.discard(current_user.username, "note", [note_id])
+    search_result_cache.bump(current_user.username)
     
     return {"message": "Note deleted successfully"}
 
@@ -1076,10 +1114,10 @@ async def create_journal(journal_data: JournalCreate, current_user: User = Depen
     current_time = datetime.utcnow().isoformat()
     
     # Serialize template to JSON string if it's provided
-    template_json = json.dumps(journal_data.template or {})
+    template_json = codec.dumps(journal_data.template or {})
     
     # Create journal
-    neo4j_graph.query(
+    await db.write(
         """
         MATCH (u:User {username: $username})
         CREATE (j:Journal {
@@ -1104,6 +1142,9 @@ async def create_journal(journal_data: JournalCreate, current_user: User = Depen
         }
     )
     
+    embedding_worker.enqueue("journal", journal_id)
+    search_result_cache.bump(current_user.username)
+    
     return {
         "id": journal_id,
         "title": journal_data.title,
@@ -1116,7 +1157,7 @@ async def create_journal(journal_data: JournalCreate, current_user: User = Depen
 
 @app.get("/api/journals", response_model=List[Journal])
 async def get_journals(current_user: User = Depends(get_current_active_user)):
-    journals = neo4j_graph.query(
+    journals = await db.read(
         """
         MATCH (j:Journal)-[:OWNED_BY]->(u:User {username: $username})
         RETURN j.id as id, j.title as title, j.description as description,
@@ -1136,7 +1177,7 @@ async def get_journals(current_user: User = Depends(get_current_active_user)):
 
 @app.get("/api/journals/{journal_id}", response_model=Journal)
 async def get_journal(journal_id: str, current_user: User = Depends(get_current_active_user)):
-    result = neo4j_graph.query(
+    result = await db.read(
         """
         MATCH (j:Journal {id: $journal_id})-[:OWNED_BY]->(u:User {username: $username})
         RETURN j.id as id, j.title as title, j.description as description,
@@ -1160,10 +1201,19 @@ async def get_journal(journal_id: str, current_user: User = Depends(get_current_
     
     return journal
 
-@app.get("/api/journals/{journal_id}/notes", response_model=List[Note])
-async def get_journal_notes(journal_id: str, current_user: User = Depends(get_current_active_user)):
+@app.get("/api/journals/{journal_id}/notes", response_model=Union[NotePage, NoteSummaryPage])
+async def get_journal_notes(
+    journal_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    view: str = Query("full", pattern=NOTE_VIEW_PATTERN),
+    current_user: User = Depends(get_current_active_user)
+):
+    cursor_updated_at, cursor_id = decode_cursor(cursor)
+    projection = NOTE_SUMMARY_PROJECTION if view == "summary" else NOTE_FULL_PROJECTION
+    
     # Verify journal exists and belongs to user
-    journal = neo4j_graph.query(
+    journal = await db.read(
         """
         MATCH (j:Journal {id: $journal_id})-[:OWNED_BY]->(u:User {username: $username})
         RETURN j
@@ -1177,65 +1227,120 @@ async def get_journal_notes(journal_id: str, current_user: User = Depends(get_cu
             detail="Journal not found or you don't have access to it"
         )
     
-    # Get all notes in journal
-    notes = neo4j_graph.query(
-        """
-        MATCH (n:Note)-[:BELONGS_TO]->(j:Journal {id: $journal_id})
-        MATCH (j)-[:OWNED_BY]->(u:User {username: $username})
-        RETURN n.id as id, n.title as title, n.content as content, 
-               n.created_at as created_at, n.updated_at as updated_at,
-               n.tags as tags, n.journal_id as journal_id
-        ORDER BY n.updated_at DESC
+    # Get one page of notes in journal, seeking note_journal_updated_at_id
+    notes = await db.read(
+        f"""
+        MATCH (n:Note)
+        WHERE n.journal_id = $journal_id AND n.owner = $username {keyset_condition(cursor_updated_at)}
+        RETURN {projection}
+        ORDER BY n.updated_at DESC, n.id DESC
+        LIMIT $fetch_limit
         """,
-        {"journal_id": journal_id, "username": current_user.username}
+        {
+            "journal_id": journal_id,
+            "username": current_user.username,
+            "cursor_updated_at": cursor_updated_at,
+            "cursor_id": cursor_id,
+            "fetch_limit": limit + 1
+        }
     )
     
-    result = []
-    for note in notes:
-        # Convert content from string/dict to NoteContent model
-        content_dict = deserialize_json_field(note["content"])
-            
-        note_content = NoteContent(**content_dict)
-        
-        result.append({
-            "id": note["id"],
-            "title": note["title"],
-            "content": note_content,
-            "created_at": note["created_at"],
-            "updated_at": note["updated_at"],
-            "tags": note["tags"] if note["tags"] else [],
-            "journal_id": note["journal_id"]
-        })
+    return FastJSONResponse(build_note_page(notes, limit, view))
+
+def encode_cursor(updated_at: str, note_id: str) -> str:
+    """Opaque cursor pointing just after the given (updated_at, id) position."""
+    return base64.urlsafe_b64encode(json.dumps([updated_at, note_id]).encode()).decode()
+
+def keyset_condition(cursor_updated_at: Optional[str]) -> str:
+    """Cypher condition for rows after the cursor, as a range on updated_at so it can seek the index."""
+    if cursor_updated_at is None:
+        return ""
+    return """
+          AND n.updated_at <= $cursor_updated_at
+          AND (n.updated_at < $cursor_updated_at OR n.id < $cursor_id)"""
+
+def decode_cursor(cursor: Optional[str]):
+    if not cursor:
+        return None, None
+    try:
+        updated_at, note_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(updated_at, str) or not isinstance(note_id, str):
+            raise ValueError("cursor fields must be strings")
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+    return updated_at, note_id
+
+def make_excerpt(text: str, length: int = EXCERPT_LENGTH) -> str:
+    return text[:length] + "..." if len(text) > length else text
+
+def note_row_to_response(note):
+    # Content was validated as NoteContent when it was written, so only fill in defaults
+    content_dict = deserialize_json_field(note["content"])
+    
+    return {
+        "id": note["id"],
+        "title": note["title"],
+        "content": {
+            "text": content_dict.get("text", ""),
+            "images": content_dict.get("images") or [],
+            "audio": content_dict.get("audio"),
+        },
+        "created_at": note["created_at"],
+        "updated_at": note["updated_at"],
+        "tags": note["tags"] if note["tags"] else [],
+        "journal_id": note["journal_id"]
+    }
+
+def note_hit_text(note) -> str:
+    """A search hit's note text, parsing content only for notes written before plain_text existed."""
+    if note.get("text") is not None:
+        return note["text"]
+    content_dict = deserialize_json_field(note.get("legacy_content") or "{}")
+    return content_dict.get("text", "") if isinstance(content_dict, dict) else ""
+
+def note_row_to_summary(note):
+    text_head = note["text_head"]
+    if text_head is None:
+        # Note written before plain_text existed: fall back to parsing its content once
+        content_dict = deserialize_json_field(note["legacy_content"] or "{}")
+        text_head = content_dict.get("text", "") if isinstance(content_dict, dict) else ""
     
-    return result
+    return {
+        "id": note["id"],
+        "title": note["title"],
+        "excerpt": make_excerpt(text_head),
+        "created_at": note["created_at"],
+        "updated_at": note["updated_at"],
+        "tags": note["tags"] if note["tags"] else [],
+        "journal_id": note["journal_id"]
+    }
+
+def build_note_page(notes, limit: int, view: str = "full"):
+    """Convert up to limit + 1 note rows into a page; the extra row only signals that more exist."""
+    convert = note_row_to_summary if view == "summary" else note_row_to_response
+    result = [convert(note) for note in notes[:limit]]
+    
+    next_cursor = None
+    if len(notes) > limit:
+        last = notes[limit - 1]
+        next_cursor = encode_cursor(last["updated_at"], last["id"])
+    
+    return {"items": result, "next_cursor": next_cursor}
 
 def deserialize_json_field(field_value):
     """Convert a JSON string to a dictionary if it's a string, or return as is if it's already a dict."""
     if isinstance(field_value, str):
         try:
-            return json.loads(field_value)
-        except:
+            return codec.loads(field_value)
+        except ValueError:
             return field_value
     return field_value
 
 @app.put("/api/journals/{journal_id}", response_model=Journal)
 async def update_journal(journal_id: str, journal_update: JournalUpdate, current_user: User = Depends(get_current_active_user)):
-    # Verify journal exists and belongs to user
-    import json  # Local import to ensure it's available
-    result = neo4j_graph.query(
-        """
-        MATCH (j:Journal {id: $journal_id})-[:OWNED_BY]->(u:User {username: $username})
-        RETURN j
-        """,
-        {"journal_id": journal_id, "username": current_user.username}
-    )
-    
-    if not result:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Journal not found or you don't have access to it"
-        )
-    
     # Update journal fields
     update_data = {}
     if journal_update.title:
@@ -1246,39 +1351,37 @@ async def update_journal(journal_id: str, journal_update: JournalUpdate, current
     
     if journal_update.template is not None:
         # Serialize template to JSON string
-        update_data["template"] = json.dumps(journal_update.template)
-    
-    # Update journal in Neo4j
-    update_cypher = """
-    MATCH (j:Journal {id: $journal_id})-[:OWNED_BY]->(u:User {username: $username})
-    SET j.updated_at = $timestamp
-    """
+        update_data["template"] = codec.dumps(journal_update.template)
     
-    # Add each field to update
-    for key, value in update_data.items():
-        update_cypher += f", j.{key} = ${key}"
-    
-    # Execute update query
-    neo4j_graph.query(
-        update_cypher + " RETURN j",
+    # Update and re-read the journal in one write transaction
+    result = await db.write(
+        """
+        MATCH (j:Journal {id: $journal_id})-[:OWNED_BY]->(u:User {username: $username})
+        SET j += $changes, j.updated_at = $timestamp
+        RETURN j.id as id, j.title as title, j.description as description,
+               j.created_at as created_at, j.updated_at as updated_at,
+               COALESCE(j.note_count, 0) as note_count, j.template as template
+        """,
         {
             "journal_id": journal_id,
             "username": current_user.username,
             "timestamp": datetime.utcnow().isoformat(),
-            **update_data
+            "changes": update_data
         }
     )
     
-    # Get updated journal
-    updated_journal = neo4j_graph.query(
-        """
-        MATCH (j:Journal {id: $journal_id})
-        RETURN j.id as id, j.title as title, j.description as description,
-               j.created_at as created_at, j.updated_at as updated_at,
-               COALESCE(j.note_count, 0) as note_count, j.template as template
-        """,
-        {"journal_id": journal_id}
-    )[0]
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Journal not found or you don't have access to it"
+        )
+    
+    updated_journal = result[0]
+    
+    if "title" in update_data or "description" in update_data:
+        embedding_worker.enqueue("journal", journal_id)
+    
+    search_result_cache.bump(current_user.username)
     
     # Deserialize the template if it's stored as a JSON string
     if "template" in updated_journal and updated_journal["template"]:
@@ -1288,13 +1391,22 @@ async def update_journal(journal_id: str, journal_update: JournalUpdate, current
 
 @app.delete("/api/journals/{journal_id}")
 async def delete_journal(journal_id: str, delete_notes: bool = False, current_user: User = Depends(get_current_active_user)):
-    # Verify journal exists and belongs to user
-    result = neo4j_graph.query(
+    # Delete the journal and either delete or detach its notes in one transaction
+    result = await db.write(
         """
         MATCH (j:Journal {id: $journal_id})-[:OWNED_BY]->(u:User {username: $username})
-        RETURN j
+        OPTIONAL MATCH (n:Note)-[:BELONGS_TO]->(j)
+        OPTIONAL MATCH (c:NoteChunk)-[:CHUNK_OF]->(n)
+        WITH j, j.id as id, collect(DISTINCT n) as notes, collect(c) as chunks
+        WITH j, id, notes, chunks,
+             CASE WHEN $delete_notes THEN [n IN notes | n.id] ELSE [] END as deleted_note_ids
+        FOREACH (c IN CASE WHEN $delete_notes THEN chunks ELSE [] END | DETACH DELETE c)
+        FOREACH (n IN CASE WHEN $delete_notes THEN notes ELSE [] END | DETACH DELETE n)
+        FOREACH (n IN CASE WHEN $delete_notes THEN [] ELSE notes END | SET n.journal_id = null)
+        DETACH DELETE j
+        RETURN id, deleted_note_ids
         """,
-        {"journal_id": journal_id, "username": current_user.username}
+        {"journal_id": journal_id, "username": current_user.username, "delete_notes": delete_notes}
     )
     
     if not result:
@@ -1303,43 +1415,331 @@ async def delete_journal(journal_id: str, delete_notes: bool = False, current_us
             detail="Journal not found or you don't have access to it"
         )
     
-    if delete_notes:
-        # Delete all notes in journal
-        neo4j_graph.query(
+    embedding_worker.discard("journal", journal_id)
+    user_vector_indexes.discard(current_user.username, "journal", [journal_id])
+    # Notes deleted along with the journal must not be embedded or found in memory either
+    deleted_note_ids = result[0]["deleted_note_ids"]
+    for note_id in deleted_note_ids:
+        embedding_worker.discard("note", note_id)
+    user_vector_indexes.discard(current_user.username, "note", deleted_note_ids)
+    search_result_cache.bump(current_user.username)
+    
+    return {"message": "Journal deleted successfully"}
+
+# Media blob API Endpoints
+class BlobUploadResponse(BaseModel):
+    id: str
+    url: str
+    size: int
+    content_type: str
+
+def externalize_media_value(value: Optional[str]) -> Optional[str]:
+    """Move one inline base64 image/audio value into the blob store and return its reference URL."""
+    if not value:
+        return value
+    # Already a reference (possibly made absolute by the front-end): keep the canonical path
+    if len(value) <= 512:
+        reference = BLOB_REFERENCE_PATTERN.search(value)
+        if reference:
+            return BLOB_URL_PREFIX + reference.group(1)
+    decoded = decode_data_url(value)
+    if decoded is None:
+        return value
+    content_type, data = decoded
+    info = blob_store.put(data, content_type)
+    return BLOB_URL_PREFIX + info.digest
+
+def externalize_media(content: NoteContent) -> NoteContent:
+    """Return a copy of the content whose images and audio are blob references instead of inline base64."""
+    return NoteContent(
+        text=content.text,
+        images=[externalize_media_value(image) for image in content.images],
+        audio=externalize_media_value(content.audio)
+    )
+
+def parse_byte_range(range_header: str, size: int):
+    """Parse a single `bytes=start-end` range into inclusive offsets; None means serve the whole blob."""
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_text, _, end_text = spec.strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(0, size - int(end_text))
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, min(end, size - 1)
+
+@app.post("/api/blobs", response_model=BlobUploadResponse)
+async def upload_blob(file: UploadFile = File(...), current_user: User = Depends(get_current_active_user)):
+    data = await file.read(MAX_BLOB_BYTES + 1)
+    if len(data) > MAX_BLOB_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File exceeds the {MAX_BLOB_BYTES} byte limit"
+        )
+    
+    info = await asyncio.to_thread(blob_store.put, data, file.content_type or "application/octet-stream")
+    
+    return {
+        "id": info.digest,
+        "url": BLOB_URL_PREFIX + info.digest,
+        "size": info.size,
+        "content_type": info.content_type
+    }
+
+@app.get("/api/blobs/{digest}")
+async def download_blob(digest: str, request: Request):
+    """
+    Serve a media blob. Blobs are addressed by the SHA-256 of their bytes, so the URL
+    is only known to holders of the note and the response can be cached forever.
+    No auth header is required because <img> and <audio> tags can't send one.
+    """
+    info = await asyncio.to_thread(blob_store.stat, digest)
+    if info is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Blob not found"
+        )
+    
+    etag = f'"{info.digest}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Accept-Ranges": "bytes"
+    }
+    
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    start, end = 0, info.size - 1
+    status_code = status.HTTP_200_OK
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and info.size > 0 and (if_range is None or if_range == etag):
+        byte_range = parse_byte_range(range_header, info.size)
+        if byte_range is not None:
+            start, end = byte_range
+            status_code = status.HTTP_206_PARTIAL_CONTENT
+            headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+    
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        blob_store.iter_range(info.digest, start, end),
+        status_code=status_code,
+        media_type=info.content_type,
+        headers=headers
+    )
+
+@app.post("/api/migrate/externalize-media")
+async def migrate_externalize_media(
+    after_id: str = "",
+    batch_size: int = Query(100, ge=1, le=1000),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Admin endpoint that moves inline base64 images and audio out of existing notes into the blob store.
+
+    Migrates one page of notes per call, so no request runs long enough to time out; pass the
+    returned next_cursor back as after_id until it is null. An interrupted run resumes there.
+    """
+    # Check if user is admin
+    if current_user.username != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admin users can run migrations"
+        )
+    
+    notes = await db.read(
+        """
+        MATCH (n:Note)
+        WHERE n.id > $after_id
+        RETURN n.id as id, n.content as content, n.updated_at as updated_at
+        ORDER BY n.id
+        LIMIT $batch_size
+        """,
+        {"after_id": after_id, "batch_size": batch_size}
+    )
+    
+    rows = []
+    for note in notes:
+        content_dict = deserialize_json_field(note["content"])
+        if not isinstance(content_dict, dict):
+            continue
+        content = NoteContent(**content_dict)
+        externalized = await asyncio.to_thread(externalize_media, content)
+        if externalized != content:
+            rows.append({
+                "id": note["id"],
+                "content": codec.dumps(externalized.model_dump()),
+                "updated_at": note["updated_at"]
+            })
+    
+    notes_migrated = 0
+    if rows:
+        # Skip notes edited since they were read; a re-run picks them up
+        result = await db.write(
             """
-            MATCH (n:Note)-[:BELONGS_TO]->(j:Journal {id: $journal_id})
-            MATCH (j)-[:OWNED_BY]->(u:User {username: $username})
-            DETACH DELETE n
+            UNWIND $rows AS row
+            MATCH (n:Note {id: row.id})
+            WHERE n.updated_at = row.updated_at
+            SET n.content = row.content
+            RETURN count(n) as updated
             """,
-            {"journal_id": journal_id, "username": current_user.username}
+            {"rows": rows}
         )
-    else:
-        # Remove journal relationship from notes but keep notes
-        neo4j_graph.query(
+        notes_migrated = result[0]["updated"] if result else 0
+    
+    next_cursor = notes[-1]["id"] if len(notes) == batch_size else None
+    print(f"Media migration: scanned {len(notes)} notes after '{after_id}', migrated {notes_migrated}")
+    
+    return {
+        "message": "Inline media moved to the blob store" if next_cursor is None else "Page migrated; call again with after_id=next_cursor",
+        "notes_scanned": len(notes),
+        "notes_migrated": notes_migrated,
+        "next_cursor": next_cursor
+    }
+
+@app.post("/api/migrate/plain-text")
+async def migrate_plain_text(batch_size: int = Query(500, ge=1, le=5000), current_user: User = Depends(get_current_active_user)):
+    """Admin endpoint that fills in plain_text, the property keyword search indexes, for notes written before it existed."""
+    # Check if user is admin
+    if current_user.username != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admin users can run migrations"
+        )
+    
+    notes_scanned = 0
+    notes_migrated = 0
+    after_id = ""
+    
+    while True:
+        notes = await db.read(
             """
-            MATCH (n:Note)-[r:BELONGS_TO]->(j:Journal {id: $journal_id})
-            MATCH (j)-[:OWNED_BY]->(u:User {username: $username})
-            DELETE r
-            SET n.journal_id = null
+            MATCH (n:Note)
+            WHERE n.id > $after_id AND n.plain_text IS NULL
+            RETURN n.id as id, n.content as content, n.updated_at as updated_at
+            ORDER BY n.id
+            LIMIT $batch_size
+            """,
+            {"after_id": after_id, "batch_size": batch_size}
+        )
+        
+        if not notes:
+            break
+        
+        rows = []
+        for note in notes:
+            content_dict = deserialize_json_field(note["content"])
+            text = content_dict.get("text", "") if isinstance(content_dict, dict) else ""
+            rows.append({"id": note["id"], "plain_text": text or "", "updated_at": note["updated_at"]})
+        
+        # Skip notes edited since they were read; the edit already set plain_text
+        result = await db.write(
+            """
+            UNWIND $rows AS row
+            MATCH (n:Note {id: row.id})
+            WHERE n.updated_at = row.updated_at AND n.plain_text IS NULL
+            SET n.plain_text = row.plain_text
+            RETURN count(n) as updated
+            """,
+            {"rows": rows}
+        )
+        notes_migrated += result[0]["updated"] if result else 0
+        
+        notes_scanned += len(notes)
+        after_id = notes[-1]["id"]
+        print(f"Plain text migration: scanned {notes_scanned} notes, migrated {notes_migrated}")
+    
+    search_result_cache.clear()
+    
+    return {
+        "message": "Plain text populated for keyword search",
+        "notes_scanned": notes_scanned,
+        "notes_migrated": notes_migrated
+    }
+
+@app.post("/api/migrate/note-tags")
+async def migrate_note_tags(batch_size: int = Query(500, ge=1, le=5000), current_user: User = Depends(get_current_active_user)):
+    """Admin endpoint that links every note to NoteTag nodes matching its tags list. Safe to re-run."""
+    # Check if user is admin
+    if current_user.username != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admin users can run migrations"
+        )
+    
+    notes_scanned = 0
+    tags_linked = 0
+    after_id = ""
+    
+    while True:
+        # One page of notes by id; links missing tags and unlinks ones no longer in the list
+        result = await db.write(
+            """
+            MATCH (n:Note)-[:CREATED_BY]->(u:User)
+            WHERE n.id > $after_id
+            WITH n, u ORDER BY n.id LIMIT $batch_size
+            OPTIONAL MATCH (n)-[old_tag:HAS_TAG]->(:NoteTag)
+            WITH n, u, collect(old_tag) as old_tags
+            FOREACH (r IN [r IN old_tags WHERE NOT endNode(r).name IN COALESCE(n.tags, [])] |
+                DELETE r
+            )
+            FOREACH (name IN COALESCE(n.tags, []) |
+                MERGE (t:NoteTag {username: u.username, name: name})
+                MERGE (n)-[:HAS_TAG]->(t)
+            )
+            RETURN count(n) as notes, max(n.id) as last_id, sum(size(COALESCE(n.tags, []))) as tags
             """,
-            {"journal_id": journal_id, "username": current_user.username}
+            {"after_id": after_id, "batch_size": batch_size}
         )
+        
+        if not result or not result[0]["notes"]:
+            break
+        
+        notes_scanned += result[0]["notes"]
+        tags_linked += result[0]["tags"]
+        after_id = result[0]["last_id"]
+        print(f"Note tag migration: scanned {notes_scanned} notes, {tags_linked} tags linked")
     
-    # Delete journal
-    neo4j_graph.query(
+    # Tags no note uses any more
+    result = await db.write(
+        """
+        MATCH (t:NoteTag)
+        WHERE NOT EXISTS { (t)<-[:HAS_TAG]-() }
+        DELETE t
+        RETURN count(*) as removed
         """
-        MATCH (j:Journal {id: $journal_id})-[:OWNED_BY]->(u:User {username: $username})
-        DETACH DELETE j
-        """,
-        {"journal_id": journal_id, "username": current_user.username}
     )
     
-    return {"message": "Journal deleted successfully"}
+    search_result_cache.clear()
+    
+    return {
+        "message": "Note tags linked to tag nodes",
+        "notes_scanned": notes_scanned,
+        "tags_linked": tags_linked,
+        "unused_tags_removed": result[0]["removed"] if result else 0
+    }
 
 # AGNIS - Search and Question Answering API Endpoints
 class SearchQuery(BaseModel):
     query: str
 
+class SourceScore(BaseModel):
+    rank: int
+    score: float
+
 class SearchResult(BaseModel):
     id: str
     title: str
@@ -1347,10 +1747,21 @@ class SearchResult(BaseModel):
     score: float
     tags: List[str] = []
     type: str = "note"  # Add type field with default value "note"
+    highlights: List[List[int]] = []  # [start, end) offsets of matched terms in excerpt
+    sources: Dict[str, SourceScore] = {}  # Hybrid search: rank and score in each retrieval leg that found it
 
 class SearchResponse(BaseModel):
     results: List[SearchResult]
     total: int
+    degraded: List[str] = []  # Hybrid search legs that failed or ran out of time
+
+class TagCount(BaseModel):
+    name: str
+    count: int
+
+class TagListResponse(BaseModel):
+    tags: List[TagCount]
+    total: int
 
 class QuestionQuery(BaseModel):
     text: str
@@ -1362,442 +1773,545 @@ class QuestionResponse(BaseModel):
     sources: List[str] = []
     model: str = "llama3"
 
-# Load embedding model for semantic search
-embedding_model = HuggingFaceEmbeddings(
-    model_name="all-MiniLM-L6-v2", 
-    cache_folder="/embedding_model"
+# Load embedding model for semantic search. EMBEDDING_MODEL=sentence_transformer_onnx_int8
+# swaps in the quantized ONNX Runtime export of the same model; values only the
+# genai-stack services understand fall back to the default, which is what gets recorded
+EMBEDDING_MODEL = local_embedding_model(os.getenv("EMBEDDING_MODEL", SENTENCE_TRANSFORMER))
+# Concurrent search queries share forward passes through the broker; backfills
+# and the worker batch on their own and call the model (or sidecar) directly
+embedding_broker = load_shared_sentence_transformer(EMBEDDING_MODEL)
+embedding_model = embedding_broker.embeddings
+EMBEDDING_MODEL_ID = embedding_model_id(EMBEDDING_MODEL)
+# Load the model in the background at startup rather than on the first search
+EMBEDDING_PREWARM = os.getenv("EMBEDDING_PREWARM", "true").lower() == "true"
+print(f"Embedding model: {EMBEDDING_MODEL_ID}")
+
+# Vectors are stored per model version, each behind its own indexes. Changing
+# EMBEDDING_MODEL builds the new version in the background while searches keep
+# using the active one, and cuts them over once every note is embedded
+EMBEDDING_VERSION = embedding_version(EMBEDDING_MODEL, EMBEDDING_MODEL_ID, SENTENCE_TRANSFORMER_DIMENSION)
+embedding_versions = EmbeddingVersions(
+    db,
+    EMBEDDING_VERSION,
+    refresh_seconds=float(os.getenv("EMBEDDING_VERSION_REFRESH_SECONDS", "10"))
+)
+
+# Recently active users' vectors in process: semantic search's fallback when the
+# Neo4j vector index fails, or its primary engine with SEMANTIC_SEARCH_ENGINE=memory
+SEMANTIC_SEARCH_ENGINE = os.getenv("SEMANTIC_SEARCH_ENGINE", "neo4j")
+user_vector_indexes = UserVectorIndexes(
+    db,
+    max_users=int(os.getenv("VECTOR_INDEX_MAX_USERS", "64")),
+    ttl=float(os.getenv("VECTOR_INDEX_TTL_SECONDS", "600"))
+)
+vector_over_fetch = OverFetch(max_candidates=int(os.getenv("VECTOR_SEARCH_MAX_CANDIDATES", "1000")))
+
+# Keyword and vector retrieval run side by side for hybrid search and RAG, each
+# cut off at its budget; the vector leg's includes embedding the query
+hybrid_search = HybridSearch({
+    "keyword": float(os.getenv("HYBRID_SEARCH_KEYWORD_BUDGET_MS", "500")) / 1000,
+    "vector": float(os.getenv("HYBRID_SEARCH_VECTOR_BUDGET_MS", "2000")) / 1000,
+})
+
+# Brokers by EMBEDDING_MODEL value; a previous version's model is only loaded while it is still in use
+version_brokers = {EMBEDDING_MODEL: embedding_broker}
+
+def embeddings_for(version):
+    # Versions recorded before unsupported values were resolved may name a hosted model
+    model_name = version.model_name if version.model_name in SENTENCE_TRANSFORMER_MODELS else SENTENCE_TRANSFORMER
+    broker = version_brokers.get(model_name)
+    if broker is None:
+        broker = version_brokers[model_name] = load_shared_sentence_transformer(model_name, local=True)
+    return broker
+
+def normalize_query_text(text: str) -> str:
+    # Whitespace never reaches the tokenizer, so collapsing it can't change the embedding
+    return " ".join(text.split())
+
+async def embed_search_query(text: str, version) -> List[float]:
+    """Embed a search or RAG query with the model of the version being searched, reusing cached vectors."""
+    normalized = normalize_query_text(text)
+    key = (version.model_id, normalized)
+    embedding = query_embedding_cache.get(key)
+    if embedding is None:
+        # The broker's own thread, so queries don't wait behind backfill batches on embedding_executor
+        embedding = await embeddings_for(version).aembed_query(normalized)
+        query_embedding_cache.set(key, embedding)
+    return embedding
+
+# Dedicated threads for the embedding model, so backfills and the worker never
+# compete with request handlers for the default executor
+embedding_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("EMBEDDING_WORKER_THREADS", "1")),
+    thread_name_prefix="embedding"
+)
+
+# One pipeline and chunker per version, keyed with the active version they may copy vectors from
+version_pipelines = {}
+version_chunkers = {}
+
+def reuse_source(version):
+    # A version of the same model, e.g. the legacy one, already holds vectors a build can copy
+    active = embedding_versions.active
+    return active if active.key != version.key and active.model_id == version.model_id else None
+
+async def bump_owner_searches(version, kind: str, rows):
+    # New vectors change what searches of the active version find for their owners. Bumped
+    # even when nothing is cached, so a search already in flight can't cache stale results
+    if version.key != embedding_versions.active.key:
+        return
+    try:
+        owners = await db.read(OWNER_QUERIES[kind], {"ids": [row["id"] for row in rows]})
+    except Exception as e:
+        # Cached searches catch up when they expire
+        print(f"Could not invalidate cached searches: {e}")
+        return
+    for username in {owner["username"] for owner in owners}:
+        search_result_cache.bump(username)
+
+async def embeddings_written(version, kind: str, rows):
+    await user_vector_indexes.update(version, kind, rows)
+    await bump_owner_searches(version, kind, rows)
+
+def pipeline_for(version):
+    """Batched backfills into one version; size batches to the CPU with the docs/s it reports."""
+    reuse_from = reuse_source(version)
+    key = (version, reuse_from)
+    if key not in version_pipelines:
+        version_pipelines[key] = EmbeddingPipeline(
+            db,
+            embeddings_for(version).embeddings,
+            version,
+            batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "32")),
+            page_size=int(os.getenv("EMBEDDING_PAGE_SIZE", "256")),
+            executor=embedding_executor,
+            reuse_from=reuse_from,
+            on_write=functools.partial(embeddings_written, version)
+        )
+    return version_pipelines[key]
+
+def chunker_for(version):
+    """Long notes are also searched passage by passage."""
+    if version not in version_chunkers:
+        version_chunkers[version] = NoteChunker(
+            db,
+            embeddings_for(version).embeddings,
+            version,
+            chunk_size=int(os.getenv("NOTE_CHUNK_SIZE", "800")),
+            chunk_overlap=int(os.getenv("NOTE_CHUNK_OVERLAP", "100")),
+            batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "32")),
+            executor=embedding_executor,
+            on_write=functools.partial(bump_owner_searches, version)
+        )
+    return version_chunkers[version]
+
+# Writes are embedded into the active version and, during a build, the new one too
+versioned_embeddings = VersionedEmbeddings(embedding_versions, pipeline_for, chunker_for)
+
+# Bulk backfills and version builds run as a checkpointed background job, paced so
+# edits and searches keep priority
+embedding_migration = EmbeddingMigration(
+    db,
+    versioned_embeddings,
+    max_docs_per_second=float(os.getenv("EMBEDDING_MIGRATION_MAX_DOCS_PER_SECOND", "50"))
 )
 
+# Note and journal writes enqueue here; autosave bursts collapse into one embedding
+embedding_worker = EmbeddingWorker(
+    versioned_embeddings,
+    chunker=versioned_embeddings,
+    debounce_seconds=float(os.getenv("EMBEDDING_DEBOUNCE_SECONDS", "2")),
+    max_delay_seconds=float(os.getenv("EMBEDDING_MAX_DELAY_SECONDS", "30")),
+    max_attempts=int(os.getenv("EMBEDDING_MAX_ATTEMPTS", "5")),
+    retry_backoff_seconds=float(os.getenv("EMBEDDING_RETRY_BACKOFF_SECONDS", "2"))
+)
+
+# Shorter terms would expand to most of the index as prefixes, so they only match exactly
+MIN_PREFIX_LENGTH = 3
+
+def build_fulltext_query(text: str) -> str:
+    """Lucene query matching any term of the user's text, exactly or, for longer terms, as a prefix."""
+    clauses = []
+    # Split on non-word characters as the index's analyzer does, so "c++" is the term "c" and
+    # "e-mail" is "e" and "mail"; words hold no Lucene syntax, and lowercasing keeps bare
+    # AND/OR/NOT from being parsed as operators
+    for term in dict.fromkeys(re.findall(r"\w+", text.lower())):
+        clauses.append(f"({term} OR {term}*)" if len(term) >= MIN_PREFIX_LENGTH else term)
+    return " ".join(clauses)
+
+def highlight_excerpt(text: str, query: str, radius: int = 50):
+    """Excerpt of text around the first matching word, with [start, end) offsets of every match in it."""
+    words = sorted(set(re.findall(r"\w+", query.lower())), key=len, reverse=True)
+    if not text or not words:
+        return make_excerpt(text or ""), []
+    pattern = re.compile("|".join(re.escape(word) for word in words), re.IGNORECASE)
+    match = pattern.search(text)
+    if match is None:
+        return make_excerpt(text), []
+    
+    start = max(0, match.start() - radius)
+    end = min(len(text), match.end() + radius)
+    prefix = "..." if start > 0 else ""
+    suffix = "..." if end < len(text) else ""
+    window = text[start:end]
+    highlights = [[m.start() + len(prefix), m.end() + len(prefix)] for m in pattern.finditer(window)]
+    return prefix + window + suffix, highlights
+
+async def keyword_search_results(username: str, query: str, journals: bool = False, limit: int = 20):
+    """The user's notes (and optionally journals) matching the query's terms, in BM25 order."""
+    fulltext_query = build_fulltext_query(query)
+    if not fulltext_query:
+        return []
+    
+    # The index yields hits in BM25 order, so LIMIT stops reading once enough owned notes are found
+    reads = [db.read(
+        """
+        CALL db.index.fulltext.queryNodes('notes_fulltext', $fulltext_query) YIELD node, score
+        MATCH (node)-[:CREATED_BY]->(u:User {username: $username})
+        RETURN node.id as id, node.title as title, node.plain_text as text,
+               node.tags as tags, score, 'note' as type
+        LIMIT $limit
+        """,
+        {"username": username, "fulltext_query": fulltext_query, "limit": limit}
+    )]
+    if journals:
+        reads.append(db.read(
+            """
+            CALL db.index.fulltext.queryNodes('journals_fulltext', $fulltext_query) YIELD node, score
+            MATCH (node)-[:OWNED_BY]->(u:User {username: $username})
+            RETURN node.id as id, node.title as title, node.description as text,
+                   [] as tags, score, 'journal' as type
+            LIMIT $limit
+            """,
+            {"username": username, "fulltext_query": fulltext_query, "limit": limit}
+        ))
+    results = [result for rows in await asyncio.gather(*reads) for result in rows]
+    results.sort(key=lambda result: result["score"], reverse=True)
+    
+    search_results = []
+    for result in results[:limit]:
+        excerpt, highlights = highlight_excerpt(result["text"], query)
+        
+        search_results.append({
+            "id": result["id"],
+            "title": result["title"],
+            "excerpt": excerpt,
+            "highlights": highlights,
+            "score": result["score"],
+            "tags": result["tags"] if result["tags"] else [],
+            "type": result["type"]
+        })
+    return search_results
+
 # Full-text search endpoint
 @app.get("/api/search", response_model=SearchResponse)
 async def search_notes(query: str, current_user: User = Depends(get_current_active_user)):
     if not query or len(query.strip()) < 2:
-        return {"results": [], "total": 0}
-    
-    # Create case-insensitive regex pattern
-    pattern = re.compile(re.escape(query), re.IGNORECASE)
-    
-    # Search notes by title and content
-    results = neo4j_graph.query(
-        """
-        MATCH (n:Note)-[:CREATED_BY]->(u:User {username: $username})
-        WHERE n.title =~ $query_regex OR n.content =~ $query_regex
-        RETURN n.id as id, n.title as title, n.content as content, 
-               n.tags as tags, n.updated_at as updated_at,
-               CASE 
-                 WHEN n.title =~ $query_regex THEN 3
-                 ELSE 1
-               END as score
-        ORDER BY score DESC, n.updated_at DESC
-        LIMIT 20
-        """,
-        {"username": current_user.username, "query_regex": f"(?i).*{query}.*"}
+        return FastJSONResponse({"results": [], "total": 0})
+    
+    # Matching is case-insensitive, and so are the highlights
+    key = search_result_cache.key(current_user.username, "keyword", normalize_query_text(query).lower())
+    response = search_result_cache.get(key)
+    if response is None:
+        search_results = await keyword_search_results(current_user.username, query)
+        response = {"results": search_results, "total": len(search_results)}
+        search_result_cache.set(key, response)
+    return FastJSONResponse(response)
+
+# One vector index holds every user's nodes, so its nearest neighbours are
+# mostly other users'. Each query reports how many candidates it got and how
+# far down they scored, for vector_over_fetch to decide whether to ask for more
+OWNED_VECTOR_QUERIES = {
+    "note": """
+    CALL db.index.vector.queryNodes($index, $top_k, $query_embedding) YIELD node, score
+    OPTIONAL MATCH (node)-[:CREATED_BY]->(owner:User {username: $username})
+    WITH count(*) as fetched, min(score) as lowest,
+         collect(CASE WHEN owner IS NOT NULL AND score > $min_score
+                      THEN node {.id, .title, .tags, .updated_at, text: node.plain_text,
+                                 legacy_content: CASE WHEN node.plain_text IS NULL THEN node.content END,
+                                 score: score, type: 'note'} END) as owned
+    RETURN fetched, lowest, owned
+    """,
+    "journal": """
+    CALL db.index.vector.queryNodes($index, $top_k, $query_embedding) YIELD node, score
+    OPTIONAL MATCH (node)-[:OWNED_BY]->(owner:User {username: $username})
+    WITH count(*) as fetched, min(score) as lowest,
+         collect(CASE WHEN owner IS NOT NULL AND score > $min_score
+                      THEN node {.id, .title, .description, .updated_at, score: score, type: 'journal'} END) as owned
+    RETURN fetched, lowest, owned
+    """,
+    "note_chunk": """
+    CALL db.index.vector.queryNodes($index, $top_k, $query_embedding) YIELD node, score
+    OPTIONAL MATCH (node)-[:CHUNK_OF]->(n:Note)-[:CREATED_BY]->(owner:User {username: $username})
+    WITH count(*) as fetched, min(score) as lowest,
+         collect(CASE WHEN owner IS NOT NULL AND score > $min_score
+                      THEN {id: n.id, title: n.title, tags: n.tags, text: node.text, index: node.index, score: score} END) as owned
+    RETURN fetched, lowest, owned
+    """,
+}
+
+def distinct_notes(hits) -> int:
+    return len({hit["id"] for hit in hits})
+
+async def owned_vector_search(username: str, version, query_embedding: List[float], kind: str, k: int, min_score: float):
+    """The user's best matches from a version's vector index, best first, fetching past other users' nodes."""
+    async def fetch(top_k: int):
+        result = await db.read(
+            OWNED_VECTOR_QUERIES[kind],
+            {
+                "index": version.index_name(kind),
+                "username": username,
+                "query_embedding": query_embedding,
+                "top_k": top_k,
+                "min_score": min_score
+            }
+        )
+        return result[0] if result else {"fetched": 0, "lowest": None, "owned": []}
+
+    hits, complete = await vector_over_fetch.search(
+        fetch, k, min_score, count=distinct_notes if kind == "note_chunk" else len
     )
+    if not complete and kind != "note_chunk":
+        # Other users' nodes crowd out this user's even at the candidate cap: score theirs exactly
+        return await memory_vector_search(username, version, query_embedding, kind, k, min_score)
+    return hits
+
+async def search_note_passages(username: str, query_embedding: List[float], version, limit: int, min_score: float):
+    """The user's notes whose passages best match the query, ranked by their best passage."""
+    chunks = await owned_vector_search(username, version, query_embedding, "note_chunk", limit, min_score)
+    notes = {}
+    for chunk in chunks:
+        note = notes.get(chunk["id"])
+        if note is None:
+            if len(notes) == limit:
+                continue
+            note = notes[chunk["id"]] = {
+                "id": chunk["id"], "title": chunk["title"], "tags": chunk["tags"], "passages": [], "score": chunk["score"]
+            }
+        if len(note["passages"]) < PASSAGES_PER_NOTE:
+            note["passages"].append({"text": chunk["text"], "index": chunk["index"], "score": chunk["score"]})
+    return list(notes.values())
+
+# Notes and journals scored by the in-memory index, shaped like the vector index query results
+MEMORY_HIT_QUERIES = {
+    "note": """
+    UNWIND $hits AS hit
+    MATCH (node:Note {id: hit.id})-[:CREATED_BY]->(u:User {username: $username})
+    RETURN node.id as id, node.title as title, node.plain_text as text,
+           CASE WHEN node.plain_text IS NULL THEN node.content END as legacy_content,
+           node.tags as tags, node.updated_at as updated_at,
+           hit.score as score, 'note' as type
+    ORDER BY score DESC
+    """,
+    "journal": """
+    UNWIND $hits AS hit
+    MATCH (node:Journal {id: hit.id})-[:OWNED_BY]->(u:User {username: $username})
+    RETURN node.id as id, node.title as title, node.description as description,
+           node.updated_at as updated_at,
+           hit.score as score, 'journal' as type
+    ORDER BY score DESC
+    """,
+}
+
+async def memory_vector_search(username: str, version, query_embedding: List[float], kind: str, k: int, min_score: float):
+    """The user's best matching notes or journals, scored in process against their in-memory vectors."""
+    hits = await user_vector_indexes.search(username, version, kind, query_embedding, k, min_score)
+    if not hits:
+        return []
+    results = await db.read(
+        MEMORY_HIT_QUERIES[kind],
+        {"username": username, "hits": [{"id": item_id, "score": score} for item_id, score in hits]}
+    )
+    # Deleted since the index was loaded
+    found = {result["id"] for result in results}
+    user_vector_indexes.discard(username, kind, [item_id for item_id, _ in hits if item_id not in found])
+    return results
+
+async def semantic_search_results(username: str, query: str):
+    """The user's notes and journals closest in meaning to the query, best first."""
+    # Get query embedding, from the model of the version searches currently read
+    version = await embedding_versions.current()
+    query_embedding = await embed_search_query(query, version)
+    
+    note_results = journal_results = None
+    passage_results = []
+    if SEMANTIC_SEARCH_ENGINE == "memory":
+        note_results = await memory_vector_search(username, version, query_embedding, "note", 15, 0.5)
+        journal_results = await memory_vector_search(username, version, query_embedding, "journal", 10, 0.5)
+    
+    # Use Neo4j vector index for faster and more comprehensive searching
+    try:
+        if journal_results is None:
+            note_results = (await owned_vector_search(username, version, query_embedding, "note", 15, 0.5))[:15]
+            journal_results = (await owned_vector_search(username, version, query_embedding, "journal", 10, 0.5))[:10]
+        
+        # Passage hits find long notes by text past what the note-level embedding saw
+        passage_results = await search_note_passages(username, query_embedding, version, limit=15, min_score=0.5)
+    except Exception as e:
+        print(f"Error during vector search: {e}")
+        
+        if journal_results is None:
+            # Score the user's notes in memory instead of the vector index
+            print("Falling back to the in-memory vector index")
+            note_results = await memory_vector_search(username, version, query_embedding, "note", 15, 0.5)
+            journal_results = await memory_vector_search(username, version, query_embedding, "journal", 10, 0.5)
+    
+    # Process note results
+    note_hits = {}
+    for note in note_results:
+        note_hits[note["id"]] = {
+            "id": note["id"],
+            "title": note["title"],
+            "excerpt": make_excerpt(note_hit_text(note), 100),
+            "score": float(note["score"]),  # Convert to float for JSON serialization
+            "tags": note["tags"] if note["tags"] else [],
+            "type": note["type"]
+        }
     
-    search_results = []
-    for result in results:
-        # Get excerpt containing the search term
-        content_dict = deserialize_json_field(result["content"])
-        text_content = content_dict.get("text", "")
-        
-        # Find position of query in text
-        match = pattern.search(text_content)
-        if match:
-            start_pos = max(0, match.start() - 50)
-            end_pos = min(len(text_content), match.end() + 50)
-            excerpt = "..." + text_content[start_pos:end_pos] + "..."
-        else:
-            excerpt = text_content[:100] + "..." if len(text_content) > 100 else text_content
+    # A note found both ways keeps its better score, excerpted at the best passage
+    for note in passage_results:
+        hit = note_hits.get(note["id"])
+        if hit is None or note["score"] > hit["score"]:
+            note_hits[note["id"]] = {
+                "id": note["id"],
+                "title": note["title"],
+                "excerpt": make_excerpt(note["passages"][0]["text"]),
+                "score": float(note["score"]),
+                "tags": note["tags"] if note["tags"] else [],
+                "type": "note"
+            }
+    search_results = list(note_hits.values())
+    
+    # Process journal results
+    for journal in journal_results:
+        description = journal.get("description", "")
+        excerpt = description[:100] + "..." if len(description) > 100 else description
         
         search_results.append({
-            "id": result["id"],
-            "title": result["title"],
+            "id": journal["id"],
+            "title": journal["title"],
             "excerpt": excerpt,
-            "score": result["score"],
-            "tags": result["tags"] if result["tags"] else [],
-            "type": "note"  # Always set a default type for text search results
+            "score": float(journal["score"]),  # Convert to float for JSON serialization
+            "tags": [],  # Journals don't have tags
+            "type": journal["type"]
         })
     
-    return {"results": search_results, "total": len(search_results)}
+    # Sort by score and limit to top results
+    search_results.sort(key=lambda x: x["score"], reverse=True)
+    return search_results[:20]
 
 # Semantic search endpoint
 @app.get("/api/search/semantic", response_model=SearchResponse)
 async def semantic_search(query: str, current_user: User = Depends(get_current_active_user)):
     if not query or len(query.strip()) < 2:
-        return {"results": [], "total": 0}
-    
-    # Get query embedding
-    query_embedding = embedding_model.embed_query(query)
-    
-    # Use Neo4j vector index for faster and more comprehensive searching
-    try:
-        # Search notes using vector index
-        note_results = neo4j_graph.query(
-            """
-            CALL db.index.vector.queryNodes('notes_vector', $top_k, $query_embedding) YIELD node, score
-            MATCH (node)-[:CREATED_BY]->(u:User {username: $username})
-            WHERE score > 0.5  // Lower threshold for more results
-            RETURN node.id as id, node.title as title, node.content as content, 
-                   node.tags as tags, node.updated_at as updated_at,
-                   score, 'note' as type
-            ORDER BY score DESC
-            """,
-            {
-                "username": current_user.username,
-                "query_embedding": query_embedding,
-                "top_k": 15  # Increase for more comprehensive results
-            }
-        )
-        
-        # Search journals using vector index
-        journal_results = neo4j_graph.query(
-            """
-            CALL db.index.vector.queryNodes('journals_vector', $top_k, $query_embedding) YIELD node, score
-            MATCH (node)-[:OWNED_BY]->(u:User {username: $username})
-            WHERE score > 0.5  // Lower threshold for more results
-            RETURN node.id as id, node.title as title, node.description as description, 
-                   node.updated_at as updated_at,
-                   score, 'journal' as type
-            ORDER BY score DESC
-            """,
-            {
-                "username": current_user.username,
-                "query_embedding": query_embedding,
-                "top_k": 10  # Increase for more comprehensive results
-            }
-        )
-        
-        # Process note results
-        search_results = []
-        for note in note_results:
-            # Extract text content for excerpt
-            content_dict = deserialize_json_field(note["content"])
-            text_content = content_dict.get("text", "")
-            excerpt = text_content[:100] + "..." if len(text_content) > 100 else text_content
-            
-            search_results.append({
-                "id": note["id"],
-                "title": note["title"],
-                "excerpt": excerpt,
-                "score": float(note["score"]),  # Convert to float for JSON serialization
-                "tags": note["tags"] if note["tags"] else [],
-                "type": note["type"]
-            })
-        
-        # Process journal results
-        for journal in journal_results:
-            description = journal.get("description", "")
-            excerpt = description[:100] + "..." if len(description) > 100 else description
-            
-            search_results.append({
-                "id": journal["id"],
-                "title": journal["title"],
-                "excerpt": excerpt,
-                "score": float(journal["score"]),  # Convert to float for JSON serialization
-                "tags": [],  # Journals don't have tags
-                "type": journal["type"]
-            })
-        
-        # Sort by score and limit to top results
-        search_results.sort(key=lambda x: x["score"], reverse=True)
-        
-        return {"results": search_results[:20], "total": len(search_results[:20])}
-        
-    except Exception as e:
-        print(f"Error during vector search: {e}")
-        
-        # Fallback to old method if vector search fails
-        print("Falling back to manual similarity calculation")
-        
-        # Get all notes with their embeddings
-        notes = neo4j_graph.query(
-            """
-            MATCH (n:Note)-[:CREATED_BY]->(u:User {username: $username})
-            RETURN n.id as id, n.title as title, n.content as content, 
-                   n.tags as tags, n.updated_at as updated_at,
-                   n.embedding as embedding,
-                   'note' as type
-            """,
-            {"username": current_user.username}
-        )
-        
-        # Get all journals with their embeddings
-        journals = neo4j_graph.query(
-            """
-            MATCH (j:Journal)-[:OWNED_BY]->(u:User {username: $username})
-            RETURN j.id as id, j.title as title, j.description as description, 
-                   j.updated_at as updated_at, j.embedding as embedding,
-                   'journal' as type
-            """,
-            {"username": current_user.username}
-        )
-        
-        # Combine results for processing
-        all_items = notes + journals
-        
-        # Calculate similarity in Python
-        search_results = []
-        for item in all_items:
-            item_type = item.get("type", "note")
-            
-            if item_type == "note":
-                # Extract text content for excerpt
-                content_dict = deserialize_json_field(item["content"])
-                text_content = content_dict.get("text", "")
-                
-                # If note has no embedding yet, generate one on the fly
-                if not item.get("embedding"):
-                    note_text = f"{item['title']} {text_content}"
-                    item_embedding = embedding_model.embed_query(note_text)
-                    
-                    # Store this for future use
-                    neo4j_graph.query(
-                        """
-                        MATCH (n:Note {id: $item_id})
-                        SET n.embedding = $embedding
-                        """,
-                        {"item_id": item["id"], "embedding": item_embedding}
-                    )
-                else:
-                    item_embedding = item["embedding"]
-                
-                excerpt = text_content[:100] + "..." if len(text_content) > 100 else text_content
-                tags = item["tags"] if item["tags"] else []
-                
-            else:  # journal
-                # If journal has no embedding yet, generate one on the fly
-                description = item.get("description", "")
-                
-                if not item.get("embedding"):
-                    journal_text = f"{item['title']} {description}"
-                    item_embedding = embedding_model.embed_query(journal_text)
-                    
-                    # Store this for future use
-                    neo4j_graph.query(
-                        """
-                        MATCH (j:Journal {id: $item_id})
-                        SET j.embedding = $embedding
-                        """,
-                        {"item_id": item["id"], "embedding": item_embedding}
-                    )
-                else:
-                    item_embedding = item["embedding"]
-                
-                excerpt = description[:100] + "..." if len(description) > 100 else description
-                tags = []  # Journals don't have tags
-            
-            # Skip items without embeddings
-            if not item_embedding:
-                continue
-                
-            # Calculate cosine similarity
-            if isinstance(query_embedding, list):
-                query_vec = np.array(query_embedding)
-            else:
-                query_vec = query_embedding
-                
-            if isinstance(item_embedding, list):
-                item_vec = np.array(item_embedding)
-            else:
-                item_vec = item_embedding
-            
-            # Calculate dot product for similarity
-            similarity = np.dot(query_vec, item_vec) / (np.linalg.norm(query_vec) * np.linalg.norm(item_vec))
-            
-            # Only include results with reasonable similarity - threshold at 0.5
-            if similarity > 0.5:
-                search_results.append({
-                    "id": item["id"],
-                    "title": item["title"],
-                    "excerpt": excerpt,
-                    "score": float(similarity),  # Convert to float for JSON serialization
-                    "tags": tags,
-                    "type": item_type  # Include type in results
-                })
-        
-        # Sort by similarity score
-        search_results.sort(key=lambda x: x["score"], reverse=True)
-        
-        # Limit to top 20 results
-        return {"results": search_results[:20], "total": len(search_results[:20])}
+        return FastJSONResponse({"results": [], "total": 0})
+    
+    version = await embedding_versions.current()
+    key = search_result_cache.key(current_user.username, "semantic", version.key, normalize_query_text(query))
+    response = search_result_cache.get(key)
+    if response is None:
+        search_results = await semantic_search_results(current_user.username, query)
+        response = {"results": search_results, "total": len(search_results)}
+        search_result_cache.set(key, response)
+    return FastJSONResponse(response)
+
+# Hybrid search endpoint: keyword and vector retrieval in one round trip
+@app.get("/api/search/hybrid", response_model=SearchResponse)
+async def hybrid_search_endpoint(query: str, current_user: User = Depends(get_current_active_user)):
+    if not query or len(query.strip()) < 2:
+        return FastJSONResponse({"results": [], "total": 0})
+    
+    version = await embedding_versions.current()
+    key = search_result_cache.key(current_user.username, "hybrid", version.key, normalize_query_text(query))
+    response = search_result_cache.get(key)
+    if response is not None:
+        return FastJSONResponse(response)
+    
+    # Keyword first, so a result found both ways keeps its highlighted excerpt
+    results, degraded = await hybrid_search.search({
+        "keyword": lambda: keyword_search_results(current_user.username, query, journals=True),
+        "vector": lambda: semantic_search_results(current_user.username, query),
+    })
+    search_results = results[:20]
+    response = {"results": search_results, "total": len(search_results), "degraded": degraded}
+    # Partial results are retried next time rather than served for the whole TTL
+    if not degraded:
+        search_result_cache.set(key, response)
+    return FastJSONResponse(response)
 
 # Tag-based search endpoint
 @app.get("/api/search/tags", response_model=SearchResponse)
-async def tag_search(tags: str, current_user: User = Depends(get_current_active_user)):
+async def tag_search(
+    tags: str,
+    match: str = Query("any", pattern="^(any|all)$"),
+    current_user: User = Depends(get_current_active_user)
+):
     # Split tags by comma and strip whitespace
-    tag_list = [tag.strip() for tag in tags.split(",") if tag.strip()]
+    tag_list = list(dict.fromkeys(tag.strip() for tag in tags.split(",") if tag.strip()))
     
     if not tag_list:
-        return {"results": [], "total": 0}
+        return FastJSONResponse({"results": [], "total": 0})
     
-    # Search notes with any of the provided tags
-    results = neo4j_graph.query(
-        """
-        MATCH (n:Note)-[:CREATED_BY]->(u:User {username: $username})
-        WHERE any(tag IN n.tags WHERE tag IN $tag_list)
-        RETURN n.id as id, n.title as title, n.content as content, 
-               n.tags as tags, n.updated_at as updated_at
-        ORDER BY n.updated_at DESC
+    key = search_result_cache.key(current_user.username, "tags", match, tuple(sorted(tag_list)))
+    response = search_result_cache.get(key)
+    if response is not None:
+        return FastJSONResponse(response)
+    
+    # Notes reached from the user's tag nodes: any of the tags (union), or with
+    # match=all only notes carrying every one of them (intersection)
+    results = await db.read(
+        f"""
+        MATCH (t:NoteTag {{username: $username}})
+        WHERE t.name IN $tag_list
+        MATCH (n:Note)-[:HAS_TAG]->(t)
+        WITH n, count(t) as matching
+        WHERE $match = 'any' OR matching = size($tag_list)
+        RETURN {NOTE_SUMMARY_PROJECTION}, matching
+        ORDER BY matching DESC, n.updated_at DESC
         """,
-        {"username": current_user.username, "tag_list": tag_list}
+        {"username": current_user.username, "tag_list": tag_list, "match": match}
     )
     
     search_results = []
     for result in results:
-        # Extract text content for excerpt
-        content_dict = deserialize_json_field(result["content"])
-        text_content = content_dict.get("text", "")
-        excerpt = text_content[:100] + "..." if len(text_content) > 100 else text_content
-        
-        # Calculate matching tags for scoring
-        matching_tags = [tag for tag in result["tags"] if tag in tag_list]
-        
+        summary = note_row_to_summary(result)
         search_results.append({
-            "id": result["id"],
-            "title": result["title"],
-            "excerpt": excerpt,
-            "score": len(matching_tags),  # Score based on number of matching tags
-            "tags": result["tags"] if result["tags"] else [],
+            "id": summary["id"],
+            "title": summary["title"],
+            "excerpt": summary["excerpt"],
+            "score": result["matching"],  # Score based on number of matching tags
+            "tags": summary["tags"],
             "type": "note"  # Always set a default type
         })
     
-    # Sort by score (number of matching tags)
-    search_results.sort(key=lambda x: x["score"], reverse=True)
-    
-    return {"results": search_results, "total": len(search_results)}
+    response = {"results": search_results, "total": len(search_results)}
+    search_result_cache.set(key, response)
+    return FastJSONResponse(response)
 
-# Generate embeddings for notes (background task or on-demand)
-def generate_note_embeddings(note_id: str = None):
-    if note_id:
-        # Generate embedding for a specific note
-        note = neo4j_graph.query(
-            """
-            MATCH (n:Note {id: $note_id})
-            RETURN n.id as id, n.title as title, n.content as content
-            """,
-            {"note_id": note_id}
-        )
-        
-        if not note:
-            return
-        
-        note = note[0]
-        content_dict = deserialize_json_field(note["content"])
-        text_content = content_dict.get("text", "")
-        
-        # Include title in embedding to improve search relevance
-        embed_text = f"{note['title']} {text_content}"
-        
-        if embed_text.strip():
-            embedding = embedding_model.embed_query(embed_text)
-            
-            # Store embedding back to note
-            neo4j_graph.query(
-                """
-                MATCH (n:Note {id: $note_id})
-                SET n.embedding = $embedding
-                """,
-                {"note_id": note["id"], "embedding": embedding}
-            )
-    else:
-        # Generate embeddings for all notes without embeddings
-        notes = neo4j_graph.query(
-            """
-            MATCH (n:Note)
-            WHERE n.embedding IS NULL
-            RETURN n.id as id, n.title as title, n.content as content
-            LIMIT 100  // Process in batches
-            """
-        )
-        
-        for note in notes:
-            content_dict = deserialize_json_field(note["content"])
-            text_content = content_dict.get("text", "")
-            
-            # Include title in embedding to improve search relevance
-            embed_text = f"{note['title']} {text_content}"
-            
-            if embed_text.strip():
-                embedding = embedding_model.embed_query(embed_text)
-                
-                # Store embedding back to note
-                neo4j_graph.query(
-                    """
-                    MATCH (n:Note {id: $note_id})
-                    SET n.embedding = $embedding
-                    """,
-                    {"note_id": note["id"], "embedding": embedding}
-                )
-
-# Generate embeddings for journals
-def generate_journal_embeddings(journal_id: str = None):
-    if journal_id:
-        # Generate embedding for a specific journal
-        journal = neo4j_graph.query(
-            """
-            MATCH (j:Journal {id: $journal_id})
-            RETURN j.id as id, j.title as title, j.description as description
-            """,
-            {"journal_id": journal_id}
-        )
-        
-        if not journal:
-            return
-        
-        journal = journal[0]
-        description = journal.get("description", "")
-        
-        # Combine title and description for embedding
-        embed_text = f"{journal['title']} {description}"
-        
-        if embed_text.strip():
-            embedding = embedding_model.embed_query(embed_text)
-            
-            # Store embedding back to journal
-            neo4j_graph.query(
-                """
-                MATCH (j:Journal {id: $journal_id})
-                SET j.embedding = $embedding
-                """,
-                {"journal_id": journal["id"], "embedding": embedding}
-            )
-    else:
-        # Generate embeddings for all journals without embeddings
-        journals = neo4j_graph.query(
-            """
-            MATCH (j:Journal)
-            WHERE j.embedding IS NULL
-            RETURN j.id as id, j.title as title, j.description as description
-            LIMIT 100  // Process in batches
-            """
-        )
-        
-        for journal in journals:
-            description = journal.get("description", "")
-            
-            # Combine title and description for embedding
-            embed_text = f"{journal['title']} {description}"
-            
-            if embed_text.strip():
-                embedding = embedding_model.embed_query(embed_text)
-                
-                # Store embedding back to journal
-                neo4j_graph.query(
-                    """
-                    MATCH (j:Journal {id: $journal_id})
-                    SET j.embedding = $embedding
-                    """,
-                    {"journal_id": journal["id"], "embedding": embedding}
-                )
+# Tag facets: every tag the user has used, with how many notes carry it
+@app.get("/api/tags", response_model=TagListResponse)
+async def list_tags(current_user: User = Depends(get_current_active_user)):
+    # Counting a tag's HAS_TAG relationships reads its degree rather than the notes
+    results = await db.read(
+        """
+        MATCH (t:NoteTag {username: $username})
+        WITH t.name as name, COUNT { (t)<-[:HAS_TAG]-() } as count
+        WHERE count > 0
+        RETURN name, count
+        ORDER BY count DESC, name
+        """,
+        {"username": current_user.username}
+    )
+    return FastJSONResponse({"tags": results, "total": len(results)})
 
 # Hook into note creation/update to generate embeddings
-@app.post("/api/notes/embeddings/{note_id}")
+@app.post("/api/notes/embeddings/{note_id}", status_code=status.HTTP_202_ACCEPTED)
 async def create_note_embedding(note_id: str, current_user: User = Depends(get_current_active_user)):
     # Verify user owns the note
-    note = neo4j_graph.query(
+    note = await db.read(
         """
         MATCH (n:Note {id: $note_id})-[:CREATED_BY]->(u:User {username: $username})
-        RETURN n
+        RETURN n.id as id
         """,
         {"note_id": note_id, "username": current_user.username}
     )
@@ -1808,19 +2322,20 @@ async def create_note_embedding(note_id: str, current_user: User = Depends(get_c
             detail="Note not found or you don't have access to it"
         )
     
-    # Generate embedding in background (this is a simple implementation - in production use proper async tasks)
-    generate_note_embeddings(note_id)
+    # Note writes already enqueue their embedding; this re-checks it, and the content
+    # hash keeps it from re-encoding unchanged text
+    embedding_worker.enqueue("note", note_id)
     
-    return {"message": "Embedding generation started"}
+    return {"message": "Embedding generation queued"}
 
 # Hook into journal creation/update to generate embeddings
-@app.post("/api/journals/embeddings/{journal_id}")
+@app.post("/api/journals/embeddings/{journal_id}", status_code=status.HTTP_202_ACCEPTED)
 async def create_journal_embedding(journal_id: str, current_user: User = Depends(get_current_active_user)):
     # Verify user owns the journal
-    journal = neo4j_graph.query(
+    journal = await db.read(
         """
         MATCH (j:Journal {id: $journal_id})-[:OWNED_BY]->(u:User {username: $username})
-        RETURN j
+        RETURN j.id as id
         """,
         {"journal_id": journal_id, "username": current_user.username}
     )
@@ -1831,60 +2346,191 @@ async def create_journal_embedding(journal_id: str, current_user: User = Depends
             detail="Journal not found or you don't have access to it"
         )
     
-    # Generate embedding
-    generate_journal_embeddings(journal_id)
+    # Journal writes already enqueue their embedding; this re-checks it, and the content
+    # hash keeps it from re-encoding unchanged text
+    embedding_worker.enqueue("journal", journal_id)
     
-    return {"message": "Embedding generation started"}
+    return {"message": "Embedding generation queued"}
 
-@app.post("/api/migrate/generate-all-embeddings")
+@app.post("/api/migrate/generate-all-embeddings", status_code=status.HTTP_202_ACCEPTED)
 async def migrate_generate_all_embeddings(current_user: User = Depends(get_current_active_user)):
-    """Admin endpoint to generate embeddings for all notes that don't have them yet."""
-    # Check if user is admin
+    """Admin endpoint to generate embeddings for all notes, journals and passages that don't have them yet.
+
+    Starts (or reports) the background migration job; poll /api/migrate/embedding-jobs/{job_id} for progress.
+    """
+    return await start_embedding_migration(current_user)
+
+@app.post("/api/migrate/embedding-jobs", status_code=status.HTTP_202_ACCEPTED)
+async def start_embedding_migration(current_user: User = Depends(get_current_active_user)):
+    """Admin endpoint to start the resumable embedding backfill job, or return the one already running."""
     if current_user.username != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admin users can run migrations"
         )
     
-    # Start background task to generate embeddings
-    # In a real app, you would use a proper task queue like Celery
     try:
-        # Count notes without embeddings
-        result = neo4j_graph.query(
-            """
-            MATCH (n:Note)
-            WHERE n.embedding IS NULL
-            RETURN count(n) as missing_note_embeddings
-            """
-        )
-        
-        missing_notes_count = result[0]["missing_note_embeddings"] if result else 0
-        
-        # Count journals without embeddings
-        result = neo4j_graph.query(
-            """
-            MATCH (j:Journal)
-            WHERE j.embedding IS NULL
-            RETURN count(j) as missing_journal_embeddings
-            """
-        )
-        
-        missing_journals_count = result[0]["missing_journal_embeddings"] if result else 0
-        
-        # Start the embedding generation process
-        generate_note_embeddings()  # This will process notes in batches
-        generate_journal_embeddings()  # This will process journals in batches
-        
-        return {
-            "message": f"Started embedding generation for items without embeddings",
-            "notes_to_process": missing_notes_count,
-            "journals_to_process": missing_journals_count
-        }
+        job = await embedding_migration.start()
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error starting migration: {str(e)}"
         )
+    return {"message": "Embedding migration running in the background", "job": job}
+
+@app.get("/api/migrate/embedding-jobs/latest")
+async def get_latest_embedding_migration(current_user: User = Depends(get_current_active_user)):
+    """Admin endpoint reporting the progress and ETA of the most recent embedding migration."""
+    if current_user.username != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admin users can view migrations"
+        )
+    
+    job = await embedding_migration.latest()
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No embedding migration has been started"
+        )
+    return job
+
+@app.get("/api/migrate/embedding-jobs/{job_id}")
+async def get_embedding_migration(job_id: str, current_user: User = Depends(get_current_active_user)):
+    """Admin endpoint reporting the progress and ETA of an embedding migration."""
+    if current_user.username != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admin users can view migrations"
+        )
+    
+    job = await embedding_migration.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Migration job not found"
+        )
+    return job
+
+@app.post("/api/migrate/embedding-jobs/{job_id}/cancel")
+async def cancel_embedding_migration(job_id: str, current_user: User = Depends(get_current_active_user)):
+    """Admin endpoint to cancel an embedding migration; it stops after the page in progress."""
+    if current_user.username != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admin users can run migrations"
+        )
+    
+    job = await embedding_migration.cancel(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Migration job not found"
+        )
+    return job
+
+@app.get("/api/admin/embedding-versions")
+async def get_embedding_versions(current_user: User = Depends(get_current_active_user)):
+    """Admin endpoint listing embedding versions: the one searches use, the one being built, and retired ones."""
+    if current_user.username != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admin users can view embedding versions"
+        )
+    
+    await embedding_versions.load()
+    return {
+        "configured": EMBEDDING_VERSION.key,
+        "active": embedding_versions.active.key,
+        "building": embedding_versions.building.key if embedding_versions.building else None,
+        "versions": embedding_versions.describe(),
+        "migration": await embedding_migration.latest()
+    }
+
+@app.delete("/api/admin/embedding-versions/{key}", status_code=status.HTTP_202_ACCEPTED)
+async def drop_embedding_version(key: str, current_user: User = Depends(get_current_active_user)):
+    """Admin endpoint deleting a retired version's vectors, passages and indexes in the background."""
+    if current_user.username != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admin users can drop embedding versions"
+        )
+    
+    await embedding_versions.load()
+    version = embedding_versions.get(key)
+    if version is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Embedding version not found"
+        )
+    if version in embedding_versions.live():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Only retired embedding versions can be dropped"
+        )
+    
+    async def drop():
+        try:
+            await embedding_versions.drop(version)
+        except Exception as e:
+            print(f"Could not drop embedding version {key}: {str(e)}")
+    
+    run_in_background(drop())
+    return {"message": f"Dropping embedding version {key} in the background"}
+
+# Notes and journals in a RAG prompt
+RAG_CONTEXT_ITEMS = int(os.getenv("RAG_CONTEXT_ITEMS", "5"))
+
+async def rag_vector_results(username: str, text: str):
+    version = await embedding_versions.current()
+    query_embedding = await embed_search_query(text, version)
+
+    # Search note passages, so long notes match anywhere in their text and the
+    # prompt only gets the parts that matched
+    note_results = await search_note_passages(username, query_embedding, version, limit=3, min_score=0.3)
+    if not note_results:
+        # Notes that haven't been chunked yet - lower threshold for more results
+        note_results = (await owned_vector_search(username, version, query_embedding, "note", 3, 0.3))[:3]
+    journal_results = (await owned_vector_search(username, version, query_embedding, "journal", 2, 0.3))[:2]
+
+    results = [{**res, "type": "note"} for res in note_results] + journal_results
+    results.sort(key=lambda res: res["score"], reverse=True)
+    return results
+
+async def rag_keyword_results(username: str, text: str):
+    # Extract keywords from query (simple approach - words longer than 3 chars)
+    keywords = [word for word in text.split() if len(word) > 3]
+    if not keywords:
+        keywords = text.split()  # If no long words, just use all words
+    fulltext_query = build_fulltext_query(" ".join(keywords))
+    if not fulltext_query:
+        return []
+
+    note_results, journal_results = await asyncio.gather(
+        db.read(
+            """
+            CALL db.index.fulltext.queryNodes('notes_fulltext', $fulltext_query) YIELD node, score
+            MATCH (node)-[:CREATED_BY]->(u:User {username: $username})
+            RETURN node.id as id, node.title as title, node.plain_text as text,
+                   CASE WHEN node.plain_text IS NULL THEN node.content END as legacy_content,
+                   score, 'note' as type
+            LIMIT 3
+            """,
+            {"username": username, "fulltext_query": fulltext_query}
+        ),
+        db.read(
+            """
+            CALL db.index.fulltext.queryNodes('journals_fulltext', $fulltext_query) YIELD node, score
+            MATCH (node)-[:OWNED_BY]->(u:User {username: $username})
+            RETURN node.id as id, node.title as title, node.description as description, score, 'journal' as type
+            LIMIT 2
+            """,
+            {"username": username, "fulltext_query": fulltext_query}
+        )
+    )
+    results = note_results + journal_results
+    results.sort(key=lambda res: res["score"], reverse=True)
+    return results
 
 # Question Answering Endpoint (Streaming)
 @app.get("/api/query-stream")
@@ -1906,93 +2552,26 @@ async def query_stream(
         if rag:
             print("Performing RAG search...")
             try:
-                # Use semantic search to find relevant context
-                query_embedding = embedding_model.embed_query(text)
-
-                # Search notes using vector index - lower threshold for more results
-                note_results = neo4j_graph.query(
-                    """
-                    CALL db.index.vector.queryNodes('notes_vector', $top_k, $query_embedding) YIELD node, score
-                    MATCH (node)-[:CREATED_BY]->(u:User {username: $username})
-                    WHERE score > 0.3  // Lowered threshold significantly to get more results
-                    RETURN node.id as id, node.title as title, node.content as content, score
-                    ORDER BY score DESC
-                    LIMIT 3
-                    """,
-                    {
-                        "username": current_user.username,
-                        "query_embedding": query_embedding,
-                        "top_k": 10 # Ask for more results initially, then filter by score and limit
-                    }
-                )
-
-                # Search journals using vector index
-                journal_results = neo4j_graph.query(
-                    """
-                    CALL db.index.vector.queryNodes('journals_vector', $top_k, $query_embedding) YIELD node, score
-                    MATCH (node)-[:OWNED_BY]->(u:User {username: $username})
-                    WHERE score > 0.3  // Lowered threshold significantly to get more results
-                    RETURN node.id as id, node.title as title, node.description as description, score
-                    ORDER BY score DESC
-                    LIMIT 2
-                    """,
-                    {
-                        "username": current_user.username,
-                        "query_embedding": query_embedding,
-                        "top_k": 10
-                    }
-                )
-
+                # Keyword and vector retrieval side by side, fused, so RAG is grounded in
+                # exact term matches and related passages alike. Vector first, so a note
+                # found both ways brings its matching passages rather than its whole text
+                results, _ = await hybrid_search.search({
+                    "vector": lambda: rag_vector_results(current_user.username, text),
+                    "keyword": lambda: rag_keyword_results(current_user.username, text),
+                })
+                results = results[:RAG_CONTEXT_ITEMS]
+                note_results = [res for res in results if res["type"] == "note"]
+                journal_results = [res for res in results if res["type"] == "journal"]
                 print(f"Found {len(note_results)} note results and {len(journal_results)} journal results")
 
-                # If no results from vector search, fall back to keyword search
-                if not note_results and not journal_results:
-                    print("No vector search results, falling back to keyword search")
-                    
-                    # Extract keywords from query (simple approach - split by spaces and take words longer than 3 chars)
-                    keywords = [word for word in text.split() if len(word) > 3]
-                    if not keywords:
-                        keywords = text.split()  # If no long words, just use all words
-                    
-                    # Create regex pattern for keywords
-                    keyword_pattern = '|'.join(keywords)
-                    
-                    # Search notes by keyword
-                    note_results = neo4j_graph.query(
-                        """
-                        MATCH (n:Note)-[:CREATED_BY]->(u:User {username: $username})
-                        WHERE n.title =~ $pattern OR n.content =~ $pattern
-                        RETURN n.id as id, n.title as title, n.content as content, 
-                               1.0 as score
-                        LIMIT 3
-                        """,
-                        {
-                            "username": current_user.username, 
-                            "pattern": f"(?i).*({keyword_pattern}).*"
-                        }
-                    )
-                    
-                    # Search journals by keyword
-                    journal_results = neo4j_graph.query(
-                        """
-                        MATCH (j:Journal)-[:OWNED_BY]->(u:User {username: $username})
-                        WHERE j.title =~ $pattern OR j.description =~ $pattern
-                        RETURN j.id as id, j.title as title, j.description as description, 
-                               1.0 as score
-                        LIMIT 2
-                        """,
-                        {
-                            "username": current_user.username, 
-                            "pattern": f"(?i).*({keyword_pattern}).*"
-                        }
-                    )
-                    
-                    print(f"Keyword search found {len(note_results)} notes and {len(journal_results)} journals")
-
                 context_items = []
                 for res in note_results:
-                    content_dict = deserialize_json_field(res["content"])
-                    text_content = content_dict.get("text", "")
+                    if res.get("passages"):
+                        # Matched passages in reading order
+                        passages = sorted(res["passages"], key=lambda passage: passage["index"])
+                        text_content = "\n...\n".join(passage["text"] for passage in passages)
+                    else:
+                        text_content = note_hit_text(res)
                     context_items.append(f"Note Title: {res['title']}\nContent: {text_content}")
                     sources.append({"id": res["id"], "type": "note", "title": res["title"]})
 
@@ -2009,7 +2588,7 @@ async def query_stream(
                     print("No relevant RAG context found")
 
                 # Send sources info first
-                yield json.dumps({"type": "sources", "data": sources}) + "\n\n"
+                yield codec.dumps({"type": "sources", "data": sources}) + "\n\n"
 
             except Exception as e:
                 print(f"Error during RAG search: {e}")
@@ -2030,53 +2609,39 @@ async def query_stream(
             messages.append({"role": "user", "content": text})
 
         # Call Ollama API
-        ollama_url = os.getenv("OLLAMA_API_URL", "http://host.docker.internal:11434/api/chat")
-        payload = {
-            "model": os.getenv("OLLAMA_MODEL", "llama3"),
-            "messages": messages,
-            "stream": True
-        }
-
-        print(f"Sending request to Ollama: {ollama_url}")
+        print(f"Sending request to Ollama: {ollama_client.chat_url}")
         try:
-            response = requests.post(ollama_url, json=payload, stream=True, timeout=60) # Add timeout
-            response.raise_for_status()
-
             print("Streaming response from Ollama...")
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        chunk = json.loads(line)
-                        if chunk.get("done") is not True:
-                            message_chunk = chunk.get("message", {}).get("content", "")
-                            if message_chunk:
-                                yield json.dumps({"type": "answer", "content": message_chunk}) + "\n\n"
-                        else:
-                            final_info = chunk.get("total_duration")
-                            if final_info:
-                                yield json.dumps({"type": "final", "data": {"duration": final_info}}) + "\n\n"
-                            print("Ollama stream finished.")
-                            break
-                    except json.JSONDecodeError as json_err:
-                        print(f"Error decoding Ollama response line: {line}, Error: {json_err}")
-                    except Exception as e:
-                        print(f"Error processing Ollama stream chunk: {e}")
-                        yield json.dumps({"type": "error", "data": f"Error processing stream: {e}"}) + "\n\n"
-                        break # Stop streaming on processing error
-        except requests.exceptions.Timeout:
+            async for chunk in ollama_client.stream_chat(messages, timeout=60):
+                try:
+                    if chunk.get("done") is not True:
+                        message_chunk = chunk.get("message", {}).get("content", "")
+                        if message_chunk:
+                            yield codec.dumps({"type": "answer", "content": message_chunk}) + "\n\n"
+                    else:
+                        final_info = chunk.get("total_duration")
+                        if final_info:
+                            yield codec.dumps({"type": "final", "data": {"duration": final_info}}) + "\n\n"
+                        print("Ollama stream finished.")
+                        break
+                except Exception as e:
+                    print(f"Error processing Ollama stream chunk: {e}")
+                    yield codec.dumps({"type": "error", "data": f"Error processing stream: {e}"}) + "\n\n"
+                    break # Stop streaming on processing error
+        except OllamaTimeoutError:
              print(f"Error calling Ollama API: Timeout")
-             yield json.dumps({"type": "error", "data": "LLM service timed out."}) + "\n\n"
-        except requests.exceptions.RequestException as req_err:
+             yield codec.dumps({"type": "error", "data": "LLM service timed out."}) + "\n\n"
+        except OllamaError as req_err:
             print(f"Error calling Ollama API: {req_err}")
-            yield json.dumps({"type": "error", "data": f"Could not connect to LLM service: {req_err}"}) + "\n\n"
+            yield codec.dumps({"type": "error", "data": f"Could not connect to LLM service: {req_err}"}) + "\n\n"
         except Exception as e:
             print(f"An unexpected error occurred during Ollama streaming: {e}")
-            yield json.dumps({"type": "error", "data": f"An unexpected error occurred: {e}"}) + "\n\n"
+            yield codec.dumps({"type": "error", "data": f"An unexpected error occurred: {e}"}) + "\n\n"
         finally:
             # This block executes regardless of exceptions in the try block
             print("Closing event generator.")
             # Send a final event to signal the end cleanly
-            yield json.dumps({"type": "close", "data": "Stream ended"}) + "\n\n"
+            yield codec.dumps({"type": "close", "data": "Stream ended"}) + "\n\n"
 
     # Return the streaming response object
     return EventSourceResponse(event_generator(), media_type="text/event-stream")
@@ -2103,8 +2668,6 @@ async def generate_tags(request: TagGenerationRequest, current_user: User = Depe
     content_text = f"Title: {request.title}\nContent: {request.content}"
     
     # Use Ollama API for tag generation
-    ollama_url = os.getenv("OLLAMA_API_URL", "http://host.docker.internal:11434/api/chat")
-    
     # Create prompt for tag generation - improved to handle multiple languages
     system_prompt = """You are a helpful assistant specializing in generating relevant tags for notes.
     
@@ -2124,17 +2687,9 @@ async def generate_tags(request: TagGenerationRequest, current_user: User = Depe
         {"role": "user", "content": content_text}
     ]
     
-    payload = {
-        "model": os.getenv("OLLAMA_MODEL", "llama3"),
-        "messages": messages,
-        "stream": False,
-        "temperature": 0.1  # Low temperature for more predictable output
-    }
-    
     try:
-        response = requests.post(ollama_url, json=payload, timeout=30)
-        response.raise_for_status()
-        result = response.json()
+        # Low temperature for more predictable output
+        result = await ollama_client.chat(messages, temperature=0.1, timeout=30)
         
         if "message" in result and "content" in result["message"]:
             # Extract tags from response, handling potential formatting variations
@@ -2167,10 +2722,10 @@ async def generate_tags(request: TagGenerationRequest, current_user: User = Depe
         else:
             print("Unexpected response structure from LLM")
             return {"tags": ["note"]}  # Fallback 
-    except requests.exceptions.Timeout:
+    except OllamaTimeoutError:
         print("Timeout error generating tags")
         return {"tags": ["note"]}
-    except requests.exceptions.RequestException as e:
+    except OllamaError as e:
         print(f"Network error generating tags: {str(e)}")
         return {"tags": ["note"]}
     except Exception as e:
@@ -2196,7 +2751,7 @@ async def summarize_note(request: SummarizeNoteRequest, current_user: User = Dep
     print(f"Generating summary for note ID: {request.note_id}")
     
     # Verify the note exists and user has access to it
-    result = neo4j_graph.query(
+    result = await db.read(
         """
         MATCH (n:Note {id: $note_id})-[:CREATED_BY]->(u:User {username: $username})
         RETURN n.id as id, n.title as title, n.content as content
@@ -2224,8 +2779,6 @@ async def summarize_note(request: SummarizeNoteRequest, current_user: User = Dep
         }
     
     # Use Ollama API for summarization
-    ollama_url = os.getenv("OLLAMA_API_URL", "http://host.docker.internal:11434/api/chat")
-    
     # Create prompt for summarization
     system_prompt = f"""You are a helpful assistant that specializes in creating concise summaries.
     
@@ -2242,17 +2795,9 @@ async def summarize_note(request: SummarizeNoteRequest, current_user: User = Dep
         {"role": "user", "content": f"Note Title: {note['title']}\n\nNote Content: {text_content}"}
     ]
     
-    payload = {
-        "model": os.getenv("OLLAMA_MODEL", "llama3"),
-        "messages": messages,
-        "stream": False,
-        "temperature": 0.1  # Low temperature for more deterministic output
-    }
-    
     try:
-        response = requests.post(ollama_url, json=payload, timeout=30)
-        response.raise_for_status()
-        result = response.json()
+        # Low temperature for more deterministic output
+        result = await ollama_client.chat(messages, temperature=0.1, timeout=30)
         
         if "message" in result and "content" in result["message"]:
             summary = result["message"]["content"].strip()
@@ -2277,13 +2822,13 @@ async def summarize_note(request: SummarizeNoteRequest, current_user: User = Dep
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to generate summary: unexpected response format"
             )
-    except requests.exceptions.Timeout:
+    except OllamaTimeoutError:
         print("Timeout error generating summary")
         raise HTTPException(
             status_code=status.HTTP_504_GATEWAY_TIMEOUT,
             detail="Timeout while generating summary"
         )
-    except requests.exceptions.RequestException as e:
+    except OllamaError as e:
         print(f"Network error generating summary: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -2316,8 +2861,6 @@ async def generate_note_template(request: NoteTemplateRequest, current_user: Use
     details = request.details.strip() if request.details else ""
     
     # Use Ollama API for template generation
-    ollama_url = os.getenv("OLLAMA_API_URL", "http://host.docker.internal:11434/api/chat")
-    
     # Create prompt for template generation
     system_prompt = """You are a helpful assistant that specializes in creating structured note templates. 
     
@@ -2338,17 +2881,9 @@ async def generate_note_template(request: NoteTemplateRequest, current_user: Use
         {"role": "user", "content": f"Note Type: {note_type}\nAdditional Details: {details}"}
     ]
     
-    payload = {
-        "model": os.getenv("OLLAMA_MODEL", "llama3"),
-        "messages": messages,
-        "stream": False,
-        "temperature": 0.3  # Lower temperature for more structured output
-    }
-    
     try:
-        response = requests.post(ollama_url, json=payload, timeout=30)
-        response.raise_for_status()
-        result = response.json()
+        # Lower temperature for more structured output
+        result = await ollama_client.chat(messages, temperature=0.3, timeout=30)
         
         if "message" in result and "content" in result["message"]:
             content = result["message"]["content"].strip()
@@ -2378,13 +2913,13 @@ async def generate_note_template(request: NoteTemplateRequest, current_user: Use
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to generate template: unexpected response format"
             )
-    except requests.exceptions.Timeout:
+    except OllamaTimeoutError:
         print("Timeout error generating template")
         raise HTTPException(
             status_code=status.HTTP_504_GATEWAY_TIMEOUT,
             detail="Timeout while generating template"
         )
-    except requests.exceptions.RequestException as e:
+    except OllamaError as e:
         print(f"Network error generating template: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -2408,16 +2943,30 @@ async def reset_database(current_user: User = Depends(get_current_active_user)):
     # Allow any user to reset the database since data is stored locally
     
     try:
-        # Delete all notes (keeping relationships for cleanup)
-        neo4j_graph.query(
+        # Delete all notes and their passage chunks (keeping relationships for cleanup)
+        await db.write(
+            """
+            MATCH (c:NoteChunk)
+            DETACH DELETE c
+            """
+        )
+        await db.write(
             """
             MATCH (n:Note)
             DETACH DELETE n
             """
         )
         
+        # Tags belonged to the deleted notes' owners
+        await db.write(
+            """
+            MATCH (t:NoteTag)
+            DETACH DELETE t
+            """
+        )
+        
         # Delete all journals (keeping relationships for cleanup)
-        neo4j_graph.query(
+        await db.write(
             """
             MATCH (j:Journal)
             DETACH DELETE j
@@ -2425,7 +2974,7 @@ async def reset_database(current_user: User = Depends(get_current_active_user)):
         )
         
         # Delete all relationships that might be dangling after previous operations
-        neo4j_graph.query(
+        await db.write(
             """
             MATCH ()-[r:CREATED_BY|BELONGS_TO|OWNED_BY]->()
             DELETE r
@@ -2433,7 +2982,7 @@ async def reset_database(current_user: User = Depends(get_current_active_user)):
         )
         
         # Delete all user accounts except the current user
-        neo4j_graph.query(
+        await db.write(
             """
             MATCH (u:User)
             WHERE u.username <> $current_username
@@ -2442,8 +2991,15 @@ async def reset_database(current_user: User = Depends(get_current_active_user)):
             {"current_username": current_user.username}
         )
         
+        # Deleted users must not keep authenticating from the cache, and deleted
+        # notes and journals must not be searched in memory or embedded
+        invalidate_principal()
+        search_result_cache.clear()
+        user_vector_indexes.clear()
+        embedding_worker.clear()
+        
         # Re-initialize the database with sample data
-        initialize_database()
+        await initialize_database()
         
         print("Database reset successfully")
         return {"message": "Database has been reset successfully"}
@@ -2456,6 +3012,33 @@ async def reset_database(current_user: User = Depends(get_current_active_user)):
             detail=f"Failed to reset database: {str(e)}"
         )
 
+@app.get("/api/admin/metrics")
+async def get_metrics(current_user: User = Depends(get_current_active_user)):
+    """Admin endpoint exposing in-process cache and queue counters."""
+    if current_user.username != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admin users can view metrics"
+        )
+    
+    return {
+        "principal_cache": principal_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "embedding_worker": embedding_worker.stats(),
+        "embedding_pipeline": pipeline_for(embedding_versions.active).stats(),
+        "query_embedding_cache": query_embedding_cache.stats(),
+        "note_chunks": chunker_for(embedding_versions.active).stats(),
+        "embedding_broker": embedding_broker.stats(),
+        "embedding_versions": {
+            "active": embedding_versions.active.key,
+            "building": embedding_versions.building.key if embedding_versions.building else None
+        },
+        "vector_index": user_vector_indexes.stats(),
+        "vector_over_fetch": vector_over_fetch.stats(),
+        "hybrid_search": hybrid_search.stats(),
+        "search_result_cache": search_result_cache.stats()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8585)
@@ -0,0 +1,146 @@
+"""Note codec benchmark: stdlib json + pydantic round trip vs. the fast codec path.
+
+Builds a page of synthetic note rows (content stored as a JSON string, as in
+Neo4j) and times turning it into a response body two ways:
+
+  stdlib  json.loads per row, NoteContent(**content), response_model
+          validation and json.dumps (what the endpoints used to do)
+  codec   codec.loads per row, plain dicts and codec.dumps_bytes
+          (what FastJSONResponse does)
+
+    python benchmarks/codec_benchmark.py --page-size 50 --repeat 20
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import string
+import sys
+import time
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import BaseModel  # noqa: E402
+
+import codec  # noqa: E402
+
+# Text length and inline media per note size; "legacy" is a note from before the blob store
+SIZES = {
+    "small": {"text": 280, "images": 0, "image_bytes": 0},
+    "medium": {"text": 4_000, "images": 2, "image_bytes": 0},
+    "large": {"text": 60_000, "images": 4, "image_bytes": 0},
+    "legacy": {"text": 2_000, "images": 1, "image_bytes": 300_000},
+}
+
+
+class NoteContent(BaseModel):
+    text: str = ""
+    images: List[str] = []
+    audio: Optional[str] = None
+
+
+class Note(BaseModel):
+    id: str
+    title: str
+    content: NoteContent
+    created_at: str
+    updated_at: str
+    tags: List[str] = []
+    journal_id: Optional[str] = None
+
+
+class NotePage(BaseModel):
+    items: List[Note]
+    next_cursor: Optional[str] = None
+
+
+def random_text(rng, length):
+    words = []
+    total = 0
+    while total < length:
+        word = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10)))
+        if rng.random() < 0.02:
+            word += " naïve café ✓"
+        words.append(word)
+        total += len(word) + 1
+    return " ".join(words)[:length]
+
+
+def make_rows(rng, size, count):
+    spec = SIZES[size]
+    rows = []
+    for i in range(count):
+        if spec["image_bytes"]:
+            images = [
+                "data:image/png;base64," + base64.b64encode(rng.randbytes(spec["image_bytes"])).decode()
+                for _ in range(spec["images"])
+            ]
+        else:
+            images = [f"/api/blobs/{rng.getrandbits(256):064x}" for _ in range(spec["images"])]
+        content = {"text": random_text(rng, spec["text"]), "images": images, "audio": None}
+        rows.append({
+            "id": f"note-{i}",
+            "title": random_text(rng, 40),
+            "content": json.dumps(content),
+            "created_at": "2025-01-01T12:00:00",
+            "updated_at": "2025-01-02T12:00:00",
+            "tags": ["work", "ideas"],
+            "journal_id": None,
+        })
+    return rows
+
+
+def stdlib_page(rows):
+    items = []
+    for row in rows:
+        content = json.loads(row["content"])
+        items.append({**row, "content": NoteContent(**content)})
+    page = NotePage.model_validate({"items": items, "next_cursor": None})
+    return json.dumps(page.model_dump(mode="json")).encode()
+
+
+def codec_page(rows):
+    items = []
+    for row in rows:
+        content = codec.loads(row["content"])
+        items.append({
+            **row,
+            "content": {
+                "text": content.get("text", ""),
+                "images": content.get("images") or [],
+                "audio": content.get("audio"),
+            },
+        })
+    return codec.dumps_bytes({"items": items, "next_cursor": None})
+
+
+def best_of(fn, rows, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn(rows)
+        timings.append(time.perf_counter() - start)
+    return min(timings), len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"codec backend: {codec.BACKEND}, {args.page_size} notes per page, best of {args.repeat}")
+    print(f"{'size':<8}{'body KB':>10}{'stdlib ms':>11}{'codec ms':>10}{'speedup':>9}")
+    for size in SIZES:
+        rows = make_rows(rng, size, args.page_size)
+        slow, body_len = best_of(stdlib_page, rows, args.repeat)
+        fast, _ = best_of(codec_page, rows, args.repeat)
+        print(f"{size:<8}{body_len / 1024:>10.0f}{slow * 1000:>11.2f}{fast * 1000:>10.2f}{slow / fast:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
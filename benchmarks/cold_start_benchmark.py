@@ -0,0 +1,230 @@
+"""Backend cold start: seconds from process launch until it accepts traffic and until it is ready.
+
+Starts ``back-end.py`` from one or more git refs in a fresh process each and
+polls /api/hello (accepting traffic), then /readyz where the tree has it.
+Before readiness probes existed, the app only started listening once startup
+had finished, so for those trees ready equals accepting.
+
+With --fake-db, Neo4j is replaced by an in-memory stand-in that charges a
+fixed round-trip time per query and reports an existing schema, a populated
+database and --missing notes without embeddings. Without it, NEO4J_URI and
+friends must point at a real database. --random-weights stands in for
+all-MiniLM-L6-v2 when the Hugging Face hub is unreachable. Seconds include
+importing sentence-transformers, which is most of the model's load time.
+
+    python benchmarks/cold_start_benchmark.py --refs HEAD~1,WORKTREE --fake-db --random-weights --missing 200
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+import re
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import types
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def export_tree(ref):
+    if ref == "WORKTREE":
+        return ROOT
+    path = tempfile.mkdtemp(prefix="scribe-")
+    archive = subprocess.run(["git", "-C", ROOT, "archive", ref], check=True, capture_output=True).stdout
+    with tempfile.TemporaryFile() as f:
+        f.write(archive)
+        f.seek(0)
+        tarfile.open(fileobj=f).extractall(path)
+    return path
+
+
+class FakeNeo4j:
+    """Answers the startup queries of any version of back-end.py after one simulated round trip."""
+
+    def __init__(self, schema_names, missing, round_trip):
+        self.schema_names = schema_names
+        self.notes = [
+            {"id": f"note-{i:06d}", "title": f"Note {i}", "text": "benchmark note body " * 40,
+             "legacy_content": None, "embedding_hash": None, "chunks_hash": None, "chunk_hashes": []}
+            for i in range(missing)
+        ]
+        self.round_trip = round_trip
+        self.queries = 0
+
+    async def _answer(self, query, params):
+        await asyncio.sleep(self.round_trip)
+        self.queries += 1
+        params = params or {}
+        if query.lstrip().startswith("SHOW"):
+            return [{"name": name} for name in self.schema_names]
+        if "node_count" in query:
+            return [{"node_count": 1000}]
+        if "as missing" in query:
+            return [{"missing": bool(self.notes)}]
+        if "count(" in query and "as total" in query:
+            return [{"total": len(self.notes) if "Journal" not in query else 0}]
+        if "CREATE (j:MigrationJob" in query:
+            return [{"id": params["id"], "status": "running", "phase": params["phase"], "last_id": "",
+                     "processed": 0, "skipped": 0, "total": params["total"], "active_seconds": 0.0,
+                     "started_at": params["now"], "updated_at": params["now"], "finished_at": None,
+                     "error": None, "cancel_requested": False, "owner": params["owner"], "heartbeat_at": params["now"]}]
+        if "j.processed = j.processed" in query:
+            return [{"status": "running"}]
+        if "after_id" in params and "page_size" in params and "Journal" not in query:
+            rows = [n for n in self.notes if n["id"] > params["after_id"]]
+            return rows[:params["page_size"]]
+        return []
+
+    async def read(self, query, params=None):
+        return await self._answer(query, params)
+
+    async def write(self, query, params=None):
+        return await self._answer(query, params)
+
+    async def execute(self, query, params=None):
+        return await self._answer(query, params)
+
+    async def verify_connectivity(self):
+        await asyncio.sleep(self.round_trip)
+
+    async def close(self):
+        pass
+
+
+def random_minilm():
+    # As in embedding_pipeline_benchmark.py, which can't be imported here: it would put
+    # the working tree's modules on the path of the tree being measured
+    from sentence_transformers import SentenceTransformer, models
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    path = tempfile.mkdtemp(prefix="minilm-")
+    words = [f"word{i}" for i in range(5000)]
+    with open(os.path.join(path, "vocab.txt"), "w") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + words))
+    BertTokenizerFast(os.path.join(path, "vocab.txt")).save_pretrained(path)
+    config = BertConfig(
+        vocab_size=len(words) + 5, hidden_size=384, num_hidden_layers=6,
+        num_attention_heads=12, intermediate_size=1536, max_position_embeddings=512,
+    )
+    BertModel(config).save_pretrained(path)
+    transformer = models.Transformer(path, max_seq_length=256)
+    pooling = models.Pooling(transformer.get_word_embedding_dimension(), pooling_mode="mean")
+    return SentenceTransformer(modules=[transformer, pooling], device="cpu")
+
+
+def install_embedding_shim(random_weights):
+    # Same constructor as langchain_huggingface.HuggingFaceEmbeddings, backed by sentence-transformers directly
+    class HuggingFaceEmbeddings:
+        def __init__(self, model_name="all-MiniLM-L6-v2", cache_folder=None, model_kwargs=None, **kwargs):
+            from sentence_transformers import SentenceTransformer
+
+            self.model_name = model_name
+            if random_weights:
+                self.model = random_minilm()
+            else:
+                self.model = SentenceTransformer(model_name, cache_folder=cache_folder, **(model_kwargs or {}))
+
+        def embed_documents(self, texts):
+            return self.model.encode(list(texts), normalize_embeddings=False).tolist()
+
+        def embed_query(self, text):
+            return self.embed_documents([text])[0]
+
+    module = types.ModuleType("langchain_huggingface")
+    module.HuggingFaceEmbeddings = HuggingFaceEmbeddings
+    sys.modules["langchain_huggingface"] = module
+
+
+def serve(args):
+    os.chdir(args.serve)
+    # Only the measured tree's modules, never the checkout this script lives in
+    sys.path[0] = args.serve
+    os.environ.setdefault("NEO4J_URI", "neo4j://localhost:7687")
+    os.environ.setdefault("NEO4J_USERNAME", "neo4j")
+    os.environ.setdefault("NEO4J_PASSWORD", "password")
+    if args.random_weights or importlib.util.find_spec("langchain_huggingface") is None:
+        install_embedding_shim(args.random_weights)
+    if args.fake_db:
+        with open(os.path.join(args.serve, "back-end.py")) as f:
+            names = re.findall(r"CREATE (?:VECTOR |FULLTEXT )?(?:INDEX|CONSTRAINT) (\w+) IF NOT EXISTS", f.read())
+        fake = FakeNeo4j(names, args.missing, args.round_trip_ms / 1000)
+        import neo4j_repository
+
+        class FakeRepository:
+            def __new__(cls, *a, **k):
+                return fake
+
+        neo4j_repository.Neo4jRepository = FakeRepository
+
+    import uvicorn
+
+    spec = importlib.util.spec_from_file_location("backend", os.path.join(args.serve, "back-end.py"))
+    backend = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(backend)
+    uvicorn.run(backend.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def measure(tree, args, port):
+    command = [sys.executable, os.path.abspath(__file__), "--serve", tree, "--port", str(port),
+               "--missing", str(args.missing), "--round-trip-ms", str(args.round_trip_ms)]
+    command += ["--fake-db"] if args.fake_db else []
+    command += ["--random-weights"] if args.random_weights else []
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    accepting = ready = None
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1.0) as client:
+            while time.perf_counter() - start < args.timeout and process.poll() is None:
+                try:
+                    if accepting is None and client.get("/api/hello").status_code == 200:
+                        accepting = time.perf_counter() - start
+                    if accepting is not None:
+                        status = client.get("/readyz").status_code
+                        if status in (200, 404):
+                            # 404: a tree without readiness probes is ready once it listens
+                            ready = time.perf_counter() - start if status == 200 else accepting
+                            break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.05)
+    finally:
+        process.terminate()
+        process.wait()
+    return accepting, ready
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--refs", default="HEAD~1,WORKTREE", help="git refs to compare; WORKTREE is the checkout")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--missing", type=int, default=0, help="notes without embeddings at startup")
+    parser.add_argument("--round-trip-ms", type=float, default=2.0)
+    parser.add_argument("--fake-db", action="store_true")
+    parser.add_argument("--random-weights", action="store_true", help="don't download all-MiniLM-L6-v2")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--port", type=int, default=8685)
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    print(f"{args.missing} notes missing embeddings, {args.round_trip_ms} ms per database round trip, best of {args.runs}")
+    print(f"{'ref':<12}{'accepting s':>13}{'ready s':>10}")
+    for ref in args.refs.split(","):
+        tree = export_tree(ref)
+        runs = [measure(tree, args, args.port) for _ in range(args.runs)]
+        accepting = min((a for a, _ in runs if a is not None), default=None)
+        ready = min((r for _, r in runs if r is not None), default=None)
+        fmt = lambda value: f"{value:.2f}" if value is not None else "timeout"  # noqa: E731
+        print(f"{ref:<12}{fmt(accepting):>13}{fmt(ready):>10}")
+
+
+if __name__ == "__main__":
+    main()
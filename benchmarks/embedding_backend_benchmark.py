@@ -0,0 +1,152 @@
+"""Embedding backend benchmark: all-MiniLM-L6-v2 on PyTorch vs. its int8 ONNX Runtime export.
+
+Encodes a sample corpus (sentences from the README, windowed into notes of
+varying length) with both backends and reports throughput, how close the int8
+vectors are to the PyTorch ones, and how many of the PyTorch top-k neighbours
+the int8 model retrieves for the same queries. Needs sentence-transformers and
+optimum[onnxruntime].
+
+Without network access to the Hugging Face hub, --random-weights builds a
+model with the all-MiniLM-L6-v2 architecture and random weights, then exports
+and quantizes it locally. Speed is representative; the accuracy figures only
+show the pipeline works, since random weights say nothing about how a trained
+model's activations survive quantization.
+
+    python benchmarks/embedding_backend_benchmark.py --docs 512 --threads 4
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from embedding_models import QUANTIZED_ONNX_FILES, SENTENCE_TRANSFORMER_MODEL, default_onnx_file  # noqa: E402
+
+
+def sample_corpus(rng, count):
+    with open(os.path.join(ROOT, "README.md")) as f:
+        text = re.sub(r"[`*#|>\[\]()]", " ", f.read())
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", text) if len(s.split()) >= 4]
+    docs = []
+    for _ in range(count):
+        start = rng.randrange(len(sentences))
+        docs.append(" ".join(sentences[start:start + rng.choice([1, 2, 4, 8])]))
+    return docs
+
+
+def random_minilm(docs):
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    words = sorted({w for doc in docs for w in re.findall(r"\w+", doc.lower())})
+    path = tempfile.mkdtemp(prefix="minilm-")
+    with open(os.path.join(path, "vocab.txt"), "w") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + words))
+    BertTokenizerFast(os.path.join(path, "vocab.txt")).save_pretrained(path)
+    config = BertConfig(
+        vocab_size=len(words) + 5, hidden_size=384, num_hidden_layers=6,
+        num_attention_heads=12, intermediate_size=1536, max_position_embeddings=512,
+    )
+    BertModel(config).save_pretrained(path)
+    return path
+
+
+def load_models(model_name, threads, onnx_file, export):
+    import onnxruntime
+    import torch
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    if threads:
+        torch.set_num_threads(threads)
+    timings = {}
+    start = time.perf_counter()
+    torch_model = SentenceTransformer(model_name, device="cpu")
+    timings["torch"] = time.perf_counter() - start
+
+    if export:
+        # Rebuild the hub repo's quantized file of the same name
+        fp32 = SentenceTransformer(model_name, device="cpu", backend="onnx")
+        config = next(flag for flag, file_name in QUANTIZED_ONNX_FILES if file_name == onnx_file)
+        export_dynamic_quantized_onnx_model(fp32, config.replace("avx512f", "avx512"), model_name)
+
+    # Same options embedding_models.load_sentence_transformer passes
+    session_options = onnxruntime.SessionOptions()
+    if threads:
+        session_options.intra_op_num_threads = threads
+        session_options.inter_op_num_threads = 1
+    start = time.perf_counter()
+    onnx_model = SentenceTransformer(
+        model_name, device="cpu", backend="onnx",
+        model_kwargs={"file_name": onnx_file, "provider": "CPUExecutionProvider", "session_options": session_options},
+    )
+    timings["onnx-int8"] = time.perf_counter() - start
+    return {"torch": torch_model, "onnx-int8": onnx_model}, timings
+
+
+def encode(model, docs, batch_size):
+    start = time.perf_counter()
+    vectors = model.encode(docs, batch_size=batch_size, normalize_embeddings=True)
+    return np.asarray(vectors), time.perf_counter() - start
+
+
+def top_k(doc_vectors, query_vectors, k):
+    scores = query_vectors @ doc_vectors.T
+    return [set(row) for row in np.argsort(-scores, axis=1)[:, :k]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=0, help="0 keeps the library defaults")
+    parser.add_argument("--onnx-file", default=None, help="defaults to the export matching this CPU")
+    parser.add_argument("--random-weights", action="store_true", help="don't download all-MiniLM-L6-v2")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    docs = sample_corpus(rng, args.docs)
+    # Queries are a few words lifted from a note, like a user half-remembering it
+    queries = []
+    for doc in rng.sample(docs, min(args.queries, len(docs))):
+        words = doc.split()
+        start = rng.randrange(max(len(words) - 4, 1))
+        queries.append(" ".join(words[start:start + 5]))
+
+    model_name = random_minilm(docs + queries) if args.random_weights else SENTENCE_TRANSFORMER_MODEL
+    onnx_file = args.onnx_file or default_onnx_file()
+    models, load_seconds = load_models(model_name, args.threads, onnx_file, export=args.random_weights)
+
+    results = {}
+    for name, model in models.items():
+        model.encode(["warm up"] * args.batch_size, batch_size=args.batch_size)
+        doc_vectors, elapsed = encode(model, docs, args.batch_size)
+        query_vectors, _ = encode(model, queries, args.batch_size)
+        results[name] = (doc_vectors, query_vectors, elapsed)
+
+    print(f"{args.docs} docs, {len(queries)} queries, batch {args.batch_size}, threads {args.threads or 'default'}, {onnx_file}")
+    print(f"{'backend':<12}{'load s':>8}{'encode s':>10}{'docs/s':>9}{'dims':>6}")
+    for name, (doc_vectors, _, elapsed) in results.items():
+        print(f"{name:<12}{load_seconds[name]:>8.2f}{elapsed:>10.2f}{args.docs / elapsed:>9.1f}{doc_vectors.shape[1]:>6}")
+
+    reference_docs, reference_queries, reference_elapsed = results["torch"]
+    doc_vectors, query_vectors, elapsed = results["onnx-int8"]
+    cosines = np.sum(reference_docs * doc_vectors, axis=1)
+    reference_hits = top_k(reference_docs, reference_queries, args.k)
+    hits = top_k(doc_vectors, query_vectors, args.k)
+    overlap = np.mean([len(a & b) / args.k for a, b in zip(reference_hits, hits)])
+    print(f"speed-up {reference_elapsed / elapsed:.2f}x")
+    print(f"cosine(torch, onnx-int8): mean {cosines.mean():.4f}, min {cosines.min():.4f}")
+    print(f"top-{args.k} overlap with torch results: {overlap:.3f}")
+
+
+if __name__ == "__main__":
+    main()
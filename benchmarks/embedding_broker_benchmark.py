@@ -0,0 +1,85 @@
+"""Concurrent query embedding: one embed_query per request vs. the micro-batching broker.
+
+Fires bursts of concurrent search queries the way simultaneous requests to
+/api/search/semantic do and reports queries/s and latency percentiles. The
+baseline runs each embed_query on the default executor (the previous
+behaviour); the broker coalesces them into shared forward passes. See
+embedding_pipeline_benchmark.py for --random-weights.
+
+    python benchmarks/embedding_broker_benchmark.py --concurrency 1,8,32 --queries 256
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from embedding_broker import EmbeddingBroker  # noqa: E402
+from embedding_pipeline_benchmark import SentenceTransformerEmbeddings, make_words, random_minilm  # noqa: E402
+
+
+async def run(embed, queries, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(query):
+        async with semaphore:
+            start = time.perf_counter()
+            await embed(query)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(query) for query in queries))
+    return time.perf_counter() - start, latencies
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=256)
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--random-weights", action="store_true", help="don't download all-MiniLM-L6-v2")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    words = make_words(rng, 5000)
+    if args.random_weights:
+        model = random_minilm(words)
+    else:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer("all-MiniLM-L6-v2", device="cpu")
+    embeddings = SentenceTransformerEmbeddings(model)
+    embeddings.embed_documents(["warm up"])
+    # Distinct queries, so neither side is helped by the broker's de-duplication
+    queries = [" ".join(rng.choices(words, k=rng.randint(2, 8))) for _ in range(args.queries)]
+
+    print(f"{args.queries} queries, broker max batch {args.max_batch}, max wait {args.max_wait_ms} ms")
+    print(f"{'mode':<10}{'clients':>8}{'q/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'batches':>9}")
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        elapsed, latencies = asyncio.run(
+            run(lambda query: asyncio.to_thread(embeddings.embed_query, query), queries, concurrency)
+        )
+        print(f"{'direct':<10}{concurrency:>8}{len(queries) / elapsed:>9.1f}"
+              f"{percentile(latencies, 0.5) * 1000:>9.1f}{percentile(latencies, 0.95) * 1000:>9.1f}{len(queries):>9}")
+
+        broker = EmbeddingBroker(embeddings, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+        elapsed, latencies = asyncio.run(run(broker.aembed_query, queries, concurrency))
+        broker.close()
+        print(f"{'broker':<10}{concurrency:>8}{len(queries) / elapsed:>9.1f}"
+              f"{percentile(latencies, 0.5) * 1000:>9.1f}{percentile(latencies, 0.95) * 1000:>9.1f}{broker.batches:>9}")
+
+
+if __name__ == "__main__":
+    main()
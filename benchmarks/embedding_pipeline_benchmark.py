@@ -0,0 +1,138 @@
+"""Embedding backfill benchmark: one embed_query and one write per note vs. the batched pipeline.
+
+Uses an in-memory stand-in for Neo4j that charges a fixed round-trip time per
+query, so only the embedding model has to be available. Without network access
+to the Hugging Face hub, --random-weights builds a model with the
+all-MiniLM-L6-v2 architecture (6 layers, 384 dims) and random weights, which
+costs the same CPU time per token.
+
+    python benchmarks/embedding_pipeline_benchmark.py --notes 512 --batch-sizes 8,32,64
+"""
+import argparse
+import asyncio
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_pipeline import EmbeddingPipeline, embedding_text  # noqa: E402
+from embedding_versions import LEGACY_VERSION  # noqa: E402
+
+
+class FakeRepository:
+    """Serves note pages from memory; every query sleeps for one round trip."""
+
+    def __init__(self, notes, round_trip):
+        self.notes = sorted(notes, key=lambda n: n["id"])
+        self.round_trip = round_trip
+        self.writes = 0
+
+    async def read(self, query, params=None):
+        await asyncio.sleep(self.round_trip)
+        rows = [n for n in self.notes if n["id"] > params["after_id"]]
+        return rows[:params["page_size"]]
+
+    async def write(self, query, params=None):
+        await asyncio.sleep(self.round_trip)
+        self.writes += 1
+        return []
+
+
+class SentenceTransformerEmbeddings:
+    # Same calls HuggingFaceEmbeddings makes, without importing langchain
+    def __init__(self, model):
+        self.model = model
+
+    def embed_documents(self, texts):
+        return self.model.encode(texts, normalize_embeddings=True).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def make_words(rng, count):
+    return ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(count)]
+
+
+def random_minilm(words):
+    from sentence_transformers import SentenceTransformer, models
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    path = tempfile.mkdtemp(prefix="minilm-")
+    with open(os.path.join(path, "vocab.txt"), "w") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + sorted(set(words))))
+    BertTokenizerFast(os.path.join(path, "vocab.txt")).save_pretrained(path)
+    config = BertConfig(
+        vocab_size=len(set(words)) + 5, hidden_size=384, num_hidden_layers=6,
+        num_attention_heads=12, intermediate_size=1536, max_position_embeddings=512,
+    )
+    BertModel(config).save_pretrained(path)
+    transformer = models.Transformer(path, max_seq_length=256)
+    pooling = models.Pooling(transformer.get_word_embedding_dimension(), pooling_mode="mean")
+    return SentenceTransformer(modules=[transformer, pooling], device="cpu")
+
+
+def make_notes(rng, words, count):
+    notes = []
+    for i in range(count):
+        length = rng.choice([20, 60, 150, 300])
+        notes.append({
+            "id": f"note-{i:06d}",
+            "title": " ".join(rng.choices(words, k=4)),
+            "text": " ".join(rng.choices(words, k=length)),
+        })
+    return notes
+
+
+async def serial_backfill(repository, embeddings):
+    # What the lifespan backfill used to do
+    start = time.perf_counter()
+    for note in await repository.read("", {"after_id": "", "page_size": len(repository.notes)}):
+        embedding = embeddings.embed_query(embedding_text(note))
+        await repository.write("", {"note_id": note["id"], "embedding": embedding})
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=512)
+    parser.add_argument("--batch-sizes", default="8,32,64")
+    parser.add_argument("--page-size", type=int, default=256)
+    parser.add_argument("--round-trip-ms", type=float, default=2.0)
+    parser.add_argument("--random-weights", action="store_true", help="don't download all-MiniLM-L6-v2")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    words = make_words(rng, 5000)
+    if args.random_weights:
+        model = random_minilm(words)
+    else:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer("all-MiniLM-L6-v2", device="cpu")
+    embeddings = SentenceTransformerEmbeddings(model)
+    notes = make_notes(rng, words, args.notes)
+    round_trip = args.round_trip_ms / 1000
+    embeddings.embed_documents(["warm up"])
+
+    print(f"{args.notes} notes, {args.round_trip_ms} ms per database round trip")
+    print(f"{'mode':<14}{'time s':>9}{'docs/s':>9}{'writes':>8}")
+    repository = FakeRepository(notes, round_trip)
+    elapsed = asyncio.run(serial_backfill(repository, embeddings))
+    print(f"{'serial':<14}{elapsed:>9.2f}{args.notes / elapsed:>9.1f}{repository.writes:>8}")
+
+    for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+        repository = FakeRepository(notes, round_trip)
+        pipeline = EmbeddingPipeline(
+            repository, embeddings, LEGACY_VERSION, batch_size=batch_size, page_size=args.page_size
+        )
+        stats = asyncio.run(pipeline.embed_missing("note"))
+        print(f"{'batch ' + str(batch_size):<14}{stats.elapsed_seconds:>9.2f}{stats.docs_per_second:>9.1f}{repository.writes:>8}")
+
+
+if __name__ == "__main__":
+    main()
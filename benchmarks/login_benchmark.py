@@ -0,0 +1,95 @@
+"""Login burst benchmark: bcrypt on the event loop vs. the bounded worker pool.
+
+Runs a burst of concurrent password verifications while a probe coroutine
+issues cheap "requests" every few milliseconds, then reports login throughput
+and the latency the cheap requests saw. No database is needed.
+
+    python benchmarks/login_benchmark.py --logins 32 --workers 2
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passlib.context import CryptContext  # noqa: E402
+
+from password_hashing import PasswordHasher, PasswordHasherBusy  # noqa: E402
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def probe(latencies, stop, interval):
+    # A cheap request: should take ~interval unless the loop is blocked
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        latencies.append((time.perf_counter() - start - interval) * 1000)
+
+
+async def run(mode, logins, hashed, workers, max_pending, interval):
+    hasher = PasswordHasher(pwd_context, max_workers=workers, max_pending=max_pending)
+    latencies = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(latencies, stop, interval))
+    await asyncio.sleep(interval * 5)
+
+    async def login():
+        if mode == "inline":
+            return pwd_context.verify("correct horse", hashed)
+        return await hasher.verify("correct horse", hashed)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(login() for _ in range(logins)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await probe_task
+    hasher.shutdown()
+    ok = sum(1 for r in results if r is True)
+    rejected = sum(1 for r in results if isinstance(r, PasswordHasherBusy))
+    return {
+        "mode": mode,
+        "ok": ok,
+        "rejected": rejected,
+        "elapsed_s": elapsed,
+        "logins_per_s": ok / elapsed if elapsed else 0.0,
+        "probe_p50_ms": statistics.median(latencies) if latencies else 0.0,
+        "probe_p99_ms": percentile(latencies, 99),
+        "probe_max_ms": max(latencies) if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-pending", type=int, default=None, help="defaults to --logins (no rejections)")
+    parser.add_argument("--probe-interval-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    hashed = pwd_context.hash("correct horse")
+    max_pending = args.max_pending or args.logins
+    print(f"{args.logins} concurrent logins, {args.workers} workers, max_pending={max_pending}")
+    print(f"{'mode':<8}{'ok':>5}{'rej':>5}{'time s':>9}{'login/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for mode in ("inline", "pooled"):
+        r = asyncio.run(run(mode, args.logins, hashed, args.workers, max_pending, args.probe_interval_ms / 1000))
+        print(
+            f"{r['mode']:<8}{r['ok']:>5}{r['rejected']:>5}{r['elapsed_s']:>9.2f}{r['logins_per_s']:>9.1f}"
+            f"{r['probe_p50_ms']:>9.1f}{r['probe_p99_ms']:>9.1f}{r['probe_max_ms']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Tenant-aware vector search: recall@k of one user's notes from an index shared by every user.
+
+Builds notes for many synthetic users on shared topics (a note is its topic's
+centre plus noise, so users' notes interleave as real ones do) and queries
+each sampled user with a perturbed copy of one of their notes. The shared
+index is modelled as exact global nearest neighbours; Neo4j's HNSW index is
+approximate, so real recall is bounded by this. Strategies:
+
+  fixed     queryNodes with a fixed top_k, then filter to the user's notes
+            (what semantic search used to do: top_k = k)
+  overfetch vector_index.OverFetch: grow top_k until k owned hits are found,
+            up to --max-candidates
+  +exact    overfetch, falling back to an exact scan of the user's own
+            vectors when the cap is reached (what the backend does)
+
+Recall is against the user's exact top k above --min-score, reported overall
+and for the tenth of users with the fewest notes.
+
+    python benchmarks/tenant_vector_search_benchmark.py --users 200 --k 15
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_index import OverFetch, VectorMatrix, normalize  # noqa: E402
+
+
+def make_corpus(rng, users, mean_notes, topics, dimension, noise):
+    # Note counts vary a lot between users, as on a real instance
+    counts = np.maximum(rng.lognormal(np.log(mean_notes), 1.0, users).astype(int), 1)
+    centres = normalize(rng.standard_normal((topics, dimension)))
+    owners = np.repeat(np.arange(users), counts)
+    # Each user writes about a handful of topics
+    user_topics = rng.integers(0, topics, (users, 5))
+    note_topics = user_topics[owners, rng.integers(0, 5, len(owners))]
+    vectors = normalize(centres[note_topics] + noise * rng.standard_normal((len(owners), dimension)) / np.sqrt(dimension))
+    return owners, vectors
+
+
+def recall(found, expected):
+    return len(set(found) & set(expected)) / len(expected) if expected else 1.0
+
+
+async def run(args):
+    rng = np.random.default_rng(args.seed)
+    owners, vectors = make_corpus(rng, args.users, args.mean_notes, args.topics, args.dimension, args.noise)
+    ids = np.arange(len(owners))
+    sizes = np.bincount(owners, minlength=args.users)
+    small = set(np.argsort(sizes)[:max(args.users // 10, 1)].tolist())
+    print(
+        f"{args.users} users, {len(owners)} notes (median {int(np.median(sizes))}, max {sizes.max()} per user), "
+        f"k={args.k}, min score {args.min_score}, {args.queries_per_user} queries per user"
+    )
+
+    over_fetch = OverFetch(max_candidates=args.max_candidates)
+    results = {name: {"all": [], "small": []} for name in ("fixed", "overfetch", "+exact")}
+    for user in range(args.users):
+        own = ids[owners == user]
+        matrix = VectorMatrix.build(args.dimension, own.tolist(), vectors[own])
+        for _ in range(args.queries_per_user):
+            query = normalize(vectors[rng.choice(own)] + 0.5 * rng.standard_normal(args.dimension) / np.sqrt(args.dimension))
+            scores = vectors @ query
+            ranked = np.argsort(-scores)
+            expected = [item for item, _ in matrix.search(query, args.k, args.min_score)]
+
+            def owned(top_k):
+                candidates = ranked[:top_k]
+                return [int(item) for item in candidates if owners[item] == user and scores[item] > args.min_score][:args.k]
+
+            async def fetch(top_k):
+                candidates = ranked[:top_k]
+                return {
+                    "fetched": len(candidates),
+                    "lowest": float(scores[candidates[-1]]) if len(candidates) else None,
+                    "owned": [{"id": int(item), "score": float(scores[item])}
+                              for item in candidates if owners[item] == user and scores[item] > args.min_score],
+                }
+
+            hits, complete = await over_fetch.search(fetch, args.k, args.min_score)
+            adaptive = [hit["id"] for hit in hits[:args.k]]
+            exact = adaptive if complete else [item for item, _ in matrix.search(query, args.k, args.min_score)]
+            for name, found in (("fixed", owned(args.k)), ("overfetch", adaptive), ("+exact", exact)):
+                value = recall(found, expected)
+                results[name]["all"].append(value)
+                if user in small:
+                    results[name]["small"].append(value)
+
+    stats = over_fetch.stats()
+    print(f"{'strategy':<12}{'recall@k':>10}{'smallest 10%':>14}")
+    for name, values in results.items():
+        print(f"{name:<12}{np.mean(values['all']):>10.3f}{np.mean(values['small']):>14.3f}")
+    print(
+        f"overfetch: {stats['mean_rounds']} queries and {stats['mean_candidates']} candidates per search, "
+        f"{stats['incomplete']} of {stats['searches']} searches hit the {args.max_candidates} candidate cap"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--mean-notes", type=int, default=100, help="median notes per user")
+    parser.add_argument("--topics", type=int, default=50)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--noise", type=float, default=0.7)
+    parser.add_argument("--k", type=int, default=15)
+    parser.add_argument("--min-score", type=float, default=0.5)
+    parser.add_argument("--queries-per-user", type=int, default=3)
+    parser.add_argument("--max-candidates", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
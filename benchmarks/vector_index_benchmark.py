@@ -0,0 +1,99 @@
+"""Per-user vector search: the old per-note Python loop vs. the in-memory VectorMatrix.
+
+For each account size, builds that many random 384-dimensional note vectors
+and times one semantic search query two ways:
+
+  loop    np.array and two norms per note, then a full sort (what the
+          semantic search fallback used to do with vectors read from Neo4j)
+  matrix  VectorMatrix.search: one matrix-vector product over pre-normalized
+          float32 rows and an argpartition top-k
+
+Also reports how long building a user's matrix takes (the one-off cost of a
+user's first search) and the cost of an incremental upsert.
+
+    python benchmarks/vector_index_benchmark.py --sizes 1000,10000,100000 --queries 50
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_index import VectorMatrix  # noqa: E402
+
+
+def loop_search(ids, vectors, query, k, min_score):
+    # As the fallback did: Python lists from the driver, scored one note at a time
+    query = np.array(query)
+    scored = []
+    for item_id, vector in zip(ids, vectors):
+        vector = np.array(vector)
+        score = float(np.dot(query, vector) / (np.linalg.norm(query) * np.linalg.norm(vector)))
+        if score > min_score:
+            scored.append((item_id, score))
+    scored.sort(key=lambda hit: hit[1], reverse=True)
+    return scored[:k]
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return timings[len(timings) // 2] * 1000, timings[min(int(len(timings) * 0.95), len(timings) - 1)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="notes per user")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--loop-queries", type=int, default=5, help="the loop is slow; fewer queries for it")
+    parser.add_argument("--k", type=int, default=15)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{args.dimension} dimensions, top {args.k}, p50/p95 over {args.queries} queries ({args.loop_queries} for the loop)")
+    print(f"{'notes':>8}{'loop p50':>10}{'loop p95':>10}{'matrix p50':>12}{'matrix p95':>12}{'speedup':>9}{'build ms':>10}{'upsert us':>11}")
+    for size in (int(size) for size in args.sizes.split(",")):
+        ids = [f"note-{i:06d}" for i in range(size)]
+        vectors = rng.standard_normal((size, args.dimension)).astype(np.float32)
+        queries = rng.standard_normal((args.queries, args.dimension)).astype(np.float32)
+        # The driver hands back lists of floats
+        vector_lists = vectors.tolist()
+
+        start = time.perf_counter()
+        matrix = VectorMatrix.build(args.dimension, ids, vector_lists)
+        build = time.perf_counter() - start
+
+        loop_timings = []
+        for query in queries[:args.loop_queries].tolist():
+            start = time.perf_counter()
+            expected = loop_search(ids, vector_lists, query, args.k, -1.0)
+            loop_timings.append(time.perf_counter() - start)
+            found = matrix.search(query, args.k)
+            assert [hit[0] for hit in found] == [hit[0] for hit in expected]
+
+        matrix_timings = []
+        for query in queries.tolist():
+            start = time.perf_counter()
+            matrix.search(query, args.k)
+            matrix_timings.append(time.perf_counter() - start)
+
+        updates = rng.standard_normal((1000, args.dimension)).astype(np.float32).tolist()
+        start = time.perf_counter()
+        for i, vector in enumerate(updates):
+            matrix.upsert(f"new-{i}", vector)
+        upsert = (time.perf_counter() - start) / len(updates)
+
+        loop_p50, loop_p95 = percentiles(loop_timings)
+        matrix_p50, matrix_p95 = percentiles(matrix_timings)
+        print(
+            f"{size:>8}{loop_p50:>10.2f}{loop_p95:>10.2f}{matrix_p50:>12.3f}{matrix_p95:>12.3f}"
+            f"{loop_p50 / matrix_p50:>8.0f}x{build * 1000:>10.1f}{upsert * 1e6:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import base64
+import binascii
+import hashlib
+import json
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple
+
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+DATA_URL_PATTERN = re.compile(r"^data:(?P<content_type>[\w.+-]+/[\w.+-]+)?(?:;[^,]*)?;base64,", re.IGNORECASE)
+
+
+@dataclass
+class BlobInfo:
+    digest: str
+    size: int
+    content_type: str
+
+
+def decode_data_url(value: str) -> Optional[Tuple[str, bytes]]:
+    """Return (content_type, bytes) for a base64 data URL, None for anything else."""
+    match = DATA_URL_PATTERN.match(value)
+    if not match:
+        return None
+    content_type = match.group("content_type") or "application/octet-stream"
+    try:
+        return content_type, base64.b64decode(value[match.end():], validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+
+class BlobStore:
+    """Content-addressed, deduplicated media store on local disk.
+
+    Blobs are named by the SHA-256 of their bytes and sharded into two levels of
+    directories; a small JSON sidecar keeps the content type. Writes go through a
+    temporary file and an atomic rename, so readers never see partial blobs.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def put(self, data: bytes, content_type: str = "application/octet-stream") -> BlobInfo:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._atomic_write(path + ".json", json.dumps({"content_type": content_type, "size": len(data)}).encode())
+            self._atomic_write(path, data)
+        return BlobInfo(digest=digest, size=len(data), content_type=content_type)
+
+    def _atomic_write(self, path: str, data: bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def stat(self, digest: str) -> Optional[BlobInfo]:
+        if not DIGEST_PATTERN.match(digest):
+            return None
+        path = self._path(digest)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return None
+        content_type = "application/octet-stream"
+        try:
+            with open(path + ".json", "rb") as f:
+                content_type = json.load(f).get("content_type", content_type)
+        except (OSError, ValueError):
+            pass
+        return BlobInfo(digest=digest, size=size, content_type=content_type)
+
+    def iter_range(self, digest: str, start: int, end: int, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Yield bytes ``start..end`` (inclusive) of a blob."""
+        with open(self._path(digest), "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds.
+
+    ``on_remove(key, value)`` is called, outside the lock, for every entry that
+    leaves the cache: evicted, expired, replaced, invalidated or cleared.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 60.0,
+        timer: Callable[[], float] = time.monotonic,
+        on_remove: Optional[Callable[[Hashable, Any], None]] = None,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._on_remove = on_remove
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= self._timer():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                expired = value
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+        self._removed([(key, expired)])
+        return default
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """The live value for ``key`` without counting a lookup or refreshing its LRU position."""
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is None or entry[1] <= self._timer():
+            return default
+        return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        expires_at = self._timer() + (self.ttl if ttl is None else ttl)
+        removed = []
+        with self._lock:
+            previous = self._data.get(key)
+            if previous is not None and previous[0] is not value:
+                removed.append((key, previous[0]))
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                evicted_key, (evicted, _) = self._data.popitem(last=False)
+                removed.append((evicted_key, evicted))
+                self.evictions += 1
+        self._removed(removed)
+
+    def invalidate(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return False
+            self.invalidations += 1
+        self._removed([(key, entry[0])])
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            removed = [(key, value) for key, (value, _) in self._data.items()]
+            self.invalidations += len(self._data)
+            self._data.clear()
+        self._removed(removed)
+
+    def _removed(self, entries) -> None:
+        if self._on_remove is not None:
+            for key, value in entries:
+                self._on_remove(key, value)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+class VersionedCache:
+    """TTL cache of per-user results that are invalidated by bumping the user's content version.
+
+    Keys embed the user's version when they are made, so ``bump`` is O(1): a
+    user's older entries are never looked up again and age out of the LRU.
+    Take the key before computing a value, so a result computed while a write
+    bumps the version is stored under the stale version and never served.
+    """
+
+    def __init__(self, maxsize: int = 2048, ttl: float = 30.0, timer: Callable[[], float] = time.monotonic) -> None:
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl, timer=timer)
+        self._versions: Dict[Hashable, int] = {}
+        self.bumps = 0
+
+    def key(self, user: Hashable, *parts: Hashable) -> tuple:
+        return (user, self._versions.get(user, 0)) + parts
+
+    def get(self, key: tuple, default: Any = None) -> Any:
+        return self.entries.get(key, default)
+
+    def set(self, key: tuple, value: Any) -> None:
+        self.entries.set(key, value)
+
+    def bump(self, user: Hashable) -> None:
+        self._versions[user] = self._versions.get(user, 0) + 1
+        self.bumps += 1
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.entries.stats(), "users": len(self._versions), "version_bumps": self.bumps}
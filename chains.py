@@ -1,7 +1,6 @@
 from langchain_openai import OpenAIEmbeddings
 from langchain_ollama import OllamaEmbeddings
 from langchain_aws import BedrockEmbeddings
-from langchain_huggingface import HuggingFaceEmbeddings
 
 from langchain_openai import ChatOpenAI
 from langchain_ollama import ChatOllama
@@ -21,6 +20,8 @@ from langchain_core.prompts import (
 from typing import List, Any
 from utils import BaseLogger, extract_title_and_question, format_docs
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from embedding_models import SENTENCE_TRANSFORMER_DIMENSION, SENTENCE_TRANSFORMER_ONNX_INT8
+from embedding_broker import load_shared_sentence_transformer
 
 AWS_MODELS = (
     "ai21.jamba-instruct-v1:0",
@@ -51,11 +52,13 @@ def load_embedding_model(embedding_model_name: str, logger=BaseLogger(), config=
         embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
         dimension = 768
         logger.info("Embedding: Using Google Generative AI Embeddings")
+    elif embedding_model_name == SENTENCE_TRANSFORMER_ONNX_INT8:
+        embeddings = load_shared_sentence_transformer(SENTENCE_TRANSFORMER_ONNX_INT8)
+        dimension = SENTENCE_TRANSFORMER_DIMENSION
+        logger.info("Embedding: Using SentenceTransformer (ONNX Runtime, int8)")
     else:
-        embeddings = HuggingFaceEmbeddings(
-            model_name="all-MiniLM-L6-v2", cache_folder="/embedding_model"
-        )
-        dimension = 384
+        embeddings = load_shared_sentence_transformer()
+        dimension = SENTENCE_TRANSFORMER_DIMENSION
         logger.info("Embedding: Using SentenceTransformer")
     return embeddings, dimension
 
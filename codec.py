@@ -0,0 +1,50 @@
+import json
+from typing import Any
+
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library when orjson isn't installed
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def loads(data):
+        return orjson.loads(data)
+
+    def dumps_bytes(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_default)
+
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(obj, default=_default).decode()
+else:
+    def loads(data):
+        return json.loads(data)
+
+    def dumps_bytes(obj: Any) -> bytes:
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+    def dumps(obj: Any) -> str:
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":"))
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with the fast codec.
+
+    Returning one directly from an endpoint also skips FastAPI's response_model
+    validation, which is only worth doing for payloads built from rows that were
+    already validated when they were written.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
@@ -0,0 +1,257 @@
+"""Micro-batching for embedding calls, in process or as a shared sidecar service.
+
+Run ``python embedding_broker.py`` to serve the configured sentence-transformer
+over HTTP; processes started with ``EMBEDDING_SERVICE_URL`` pointing at it embed
+through the sidecar instead of loading their own copy of the model.
+"""
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from langchain_core.embeddings import Embeddings
+
+from embedding_models import (
+    SENTENCE_TRANSFORMER,
+    LazyEmbeddings,
+    embedding_model_id,
+    embedding_threads,
+    load_sentence_transformer,
+    local_embedding_model,
+)
+
+_Request = Tuple[List[str], Future, float]  # (texts, result, enqueued at)
+
+
+class EmbeddingBroker(Embeddings):
+    """Coalesces concurrent embedding calls into batched forward passes.
+
+    Every call is queued for one model thread, which waits up to
+    ``max_wait_ms`` after the oldest queued call for others to arrive, or until
+    ``max_batch`` texts are pending, then encodes them all with a single
+    ``embed_documents`` call and resolves each caller's future. Identical texts
+    in a batch are encoded once. When the previous batch held a single call
+    the wait is skipped, so a lone caller pays no batching latency. Sync
+    callers block on their future from any thread; async callers await it
+    without tying up an executor thread.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_batch: int = 32, max_wait_ms: float = 5.0) -> None:
+        self.embeddings = embeddings
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._last_batch_requests = 0
+        self.requests = 0
+        self.texts = 0
+        self.encoded = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.failed_batches = 0
+        self.wait_seconds = 0.0
+
+    def _submit(self, texts: List[str]) -> Future:
+        future: Future = Future()
+        if not texts:
+            future.set_result([])
+            return future
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="embedding-broker", daemon=True)
+                self._thread.start()
+        self._queue.put((list(texts), future, time.perf_counter()))
+        return future
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._submit(texts).result()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._submit([text]).result()[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.wrap_future(self._submit(texts))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def close(self) -> None:
+        """Finish the queued calls and stop the model thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _run(self) -> None:
+        while True:
+            request = self._queue.get()
+            if request is None:
+                return
+            batch = [request]
+            size = len(request[0])
+            # A lone caller last time means there is nobody to wait for. Otherwise
+            # the wait is measured from the oldest call, so a backlog built up
+            # during the previous batch is flushed without waiting again
+            deadline = request[2] + (self.max_wait if self._last_batch_requests > 1 else 0.0)
+            stopping = False
+            while size < self.max_batch:
+                try:
+                    request = self._queue.get(timeout=max(deadline - time.perf_counter(), 0.0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+                size += len(request[0])
+            self._process(batch)
+            if stopping:
+                return
+
+    def _process(self, batch: List[_Request]) -> None:
+        now = time.perf_counter()
+        # Callers that gave up (cancelled awaits) are dropped before encoding
+        live = [(texts, future) for texts, future, enqueued_at in batch if future.set_running_or_notify_cancel()]
+        for _, _, enqueued_at in batch:
+            self.wait_seconds += now - enqueued_at
+        self.requests += len(batch)
+        self._last_batch_requests = len(batch)
+        if not live:
+            return
+
+        unique = list(dict.fromkeys(text for texts, _ in live for text in texts))
+        try:
+            vectors = self.embeddings.embed_documents(unique)
+        except Exception as e:
+            self.failed_batches += 1
+            for _, future in live:
+                future.set_exception(e)
+            return
+
+        by_text = {text: list(vector) for text, vector in zip(unique, vectors)}
+        for texts, future in live:
+            future.set_result([by_text[text] for text in texts])
+        self.texts += sum(len(texts) for texts, _ in live)
+        self.encoded += len(unique)
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(unique))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "requests": self.requests,
+            "texts": self.texts,
+            "encoded": self.encoded,
+            "batches": self.batches,
+            "mean_batch_size": round(self.encoded / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "failed_batches": self.failed_batches,
+            "mean_wait_ms": round(self.wait_seconds / self.requests * 1000, 3) if self.requests else 0.0,
+        }
+
+
+class RemoteEmbeddings(Embeddings):
+    """Embeddings served by an embedding sidecar (``python embedding_broker.py``)."""
+
+    def __init__(self, base_url: str, timeout: float = 30.0) -> None:
+        self.embed_url = base_url.rstrip("/") + "/embed"
+        self.timeout = timeout
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        if self._client is None:
+            self._client = httpx.Client(timeout=self.timeout)
+        response = self._client.post(self.embed_url, json={"texts": list(texts)})
+        response.raise_for_status()
+        return response.json()["embeddings"]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        # Created lazily so the client binds to the running event loop
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(timeout=self.timeout)
+        response = await self._async_client.post(self.embed_url, json={"texts": list(texts)})
+        response.raise_for_status()
+        return response.json()["embeddings"]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.aclose()
+        if self._client is not None:
+            self._client.close()
+
+
+def broker_from_env(embeddings: Embeddings) -> EmbeddingBroker:
+    return EmbeddingBroker(
+        embeddings,
+        max_batch=int(os.getenv("EMBEDDING_BROKER_MAX_BATCH", "32")),
+        max_wait_ms=float(os.getenv("EMBEDDING_BROKER_MAX_WAIT_MS", "5")),
+    )
+
+
+def load_shared_sentence_transformer(embedding_model_name: str = SENTENCE_TRANSFORMER, local: bool = False) -> EmbeddingBroker:
+    """The local sentence-transformer behind a broker, or the sidecar at EMBEDDING_SERVICE_URL if one is set.
+
+    The sidecar serves the configured EMBEDDING_MODEL only; ``local`` loads
+    another model in process, such as the one a previous embedding version used.
+    """
+    service_url = os.getenv("EMBEDDING_SERVICE_URL")
+    if service_url and not local:
+        return broker_from_env(RemoteEmbeddings(service_url))
+    # Loaded on first use or by warm(), so importing the app doesn't wait for the model
+    return broker_from_env(
+        LazyEmbeddings(lambda: load_sentence_transformer(embedding_model_name, threads=embedding_threads()))
+    )
+
+
+def create_app():
+    from fastapi import FastAPI
+    from pydantic import BaseModel
+
+    from codec import FastJSONResponse
+
+    embedding_model_name = local_embedding_model(os.getenv("EMBEDDING_MODEL", SENTENCE_TRANSFORMER))
+    model_id = embedding_model_id(embedding_model_name)
+    broker = broker_from_env(load_sentence_transformer(embedding_model_name, threads=embedding_threads()))
+    print(f"Embedding service: {model_id}")
+
+    class EmbedRequest(BaseModel):
+        texts: List[str]
+
+    app = FastAPI(title="Project Scribe embedding service", default_response_class=FastJSONResponse)
+
+    @app.post("/embed")
+    async def embed(request: EmbedRequest):
+        return {"model_id": model_id, "embeddings": await broker.aembed_documents(request.texts)}
+
+    @app.get("/healthz")
+    async def healthz():
+        return {"status": "ok", "model_id": model_id}
+
+    @app.get("/stats")
+    async def stats():
+        return broker.stats()
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(create_app(), host="0.0.0.0", port=int(os.getenv("EMBEDDING_SERVICE_PORT", "8586")))
@@ -0,0 +1,143 @@
+import os
+import platform
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+# EMBEDDING_MODEL values served by the local sentence-transformer
+SENTENCE_TRANSFORMER = "sentence_transformer"
+SENTENCE_TRANSFORMER_ONNX_INT8 = "sentence_transformer_onnx_int8"
+
+SENTENCE_TRANSFORMER_MODELS = (SENTENCE_TRANSFORMER, SENTENCE_TRANSFORMER_ONNX_INT8)
+
+SENTENCE_TRANSFORMER_MODEL = "all-MiniLM-L6-v2"
+SENTENCE_TRANSFORMER_DIMENSION = 384
+
+# Dynamically quantized exports shipped in the sentence-transformers/all-MiniLM-L6-v2 repo,
+# best first; each needs the CPU flag it is keyed on
+QUANTIZED_ONNX_FILES = (
+    ("avx512_vnni", "onnx/model_qint8_avx512_vnni.onnx"),
+    ("avx512f", "onnx/model_qint8_avx512.onnx"),
+    ("avx2", "onnx/model_quint8_avx2.onnx"),
+)
+ARM_ONNX_FILE = "onnx/model_qint8_arm64.onnx"
+
+
+def default_onnx_file() -> str:
+    """The quantized export built for this CPU's instruction set."""
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return ARM_ONNX_FILE
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = set(next((line for line in f if line.startswith("flags")), "").split())
+    except OSError:
+        flags = set()
+    for flag, file_name in QUANTIZED_ONNX_FILES:
+        if flag in flags:
+            return file_name
+    return QUANTIZED_ONNX_FILES[-1][1]
+
+
+def local_embedding_model(embedding_model_name: Optional[str]) -> str:
+    """The EMBEDDING_MODEL value the local sentence-transformer will actually serve.
+
+    EMBEDDING_MODEL is shared with the genai-stack services, which also accept
+    hosted models (openai, ollama, ...); those fall back to the PyTorch model,
+    and callers record this value rather than the configured one.
+    """
+    if embedding_model_name in SENTENCE_TRANSFORMER_MODELS:
+        return embedding_model_name
+    if embedding_model_name:
+        print(
+            f"EMBEDDING_MODEL={embedding_model_name} is not served by the local sentence-transformer; "
+            f"using {SENTENCE_TRANSFORMER} ({SENTENCE_TRANSFORMER_MODEL})"
+        )
+    return SENTENCE_TRANSFORMER
+
+
+def embedding_threads() -> Optional[int]:
+    """Threads the embedding model may use, from EMBEDDING_THREADS (unset or 0 keeps the library default)."""
+    threads = int(os.getenv("EMBEDDING_THREADS", "0"))
+    return threads if threads > 0 else None
+
+
+def load_sentence_transformer(
+    embedding_model_name: str = SENTENCE_TRANSFORMER,
+    model_name: str = SENTENCE_TRANSFORMER_MODEL,
+    cache_folder: str = "/embedding_model",
+    onnx_file: Optional[str] = None,
+    threads: Optional[int] = None,
+) -> Any:
+    """Load all-MiniLM-L6-v2 on PyTorch, or its int8 ONNX Runtime export for SENTENCE_TRANSFORMER_ONNX_INT8.
+
+    Both produce 384-dimensional vectors, so existing embeddings and the
+    vector indexes stay valid when switching between them.
+    """
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    model_kwargs: Dict[str, Any] = {}
+    if embedding_model_name == SENTENCE_TRANSFORMER_ONNX_INT8:
+        import onnxruntime
+
+        session_options = onnxruntime.SessionOptions()
+        if threads:
+            session_options.intra_op_num_threads = threads
+            session_options.inter_op_num_threads = 1
+        model_kwargs["device"] = "cpu"
+        model_kwargs["backend"] = "onnx"
+        model_kwargs["model_kwargs"] = {
+            "file_name": onnx_file or os.getenv("EMBEDDING_ONNX_FILE") or default_onnx_file(),
+            "provider": "CPUExecutionProvider",
+            "session_options": session_options,
+        }
+    elif threads:
+        import torch
+
+        torch.set_num_threads(threads)
+    return HuggingFaceEmbeddings(model_name=model_name, cache_folder=cache_folder, model_kwargs=model_kwargs)
+
+
+def embedding_model_id(embedding_model_name: str, model_name: str = SENTENCE_TRANSFORMER_MODEL) -> str:
+    """Identifier stored in embedding hashes; the quantized model gets its own so its vectors are tracked apart."""
+    if embedding_model_name == SENTENCE_TRANSFORMER_ONNX_INT8:
+        return f"{model_name}:onnx-int8"
+    return model_name
+
+
+class LazyEmbeddings(Embeddings):
+    """Loads the model on first use, or ahead of time with ``warm``, instead of at import.
+
+    Loading happens once even when several threads need the model at the same
+    moment; the first forward pass is run as part of loading, so ``loaded``
+    means the model is ready to serve at full speed.
+    """
+
+    def __init__(self, loader: Callable[[], Embeddings]) -> None:
+        self._loader = loader
+        self._model: Optional[Embeddings] = None
+        self._lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def warm(self) -> Embeddings:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    model = self._loader()
+                    model.embed_query("warm up")
+                    self.load_seconds = time.perf_counter() - start
+                    print(f"Embedding model loaded in {self.load_seconds:.1f}s")
+                    self._model = model
+        return self._model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.warm().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.warm().embed_query(text)
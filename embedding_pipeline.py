@@ -0,0 +1,319 @@
+import asyncio
+import hashlib
+import time
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import codec
+from embedding_versions import EmbeddingVersion
+from neo4j_repository import Neo4jRepository
+
+# Candidate reads per kind and scope, formatted with a version's property
+# names. Pages are keyed on id so that rows skipped for having no text are
+# never read twice. "all" builds a version: every document's hash is checked
+# and only stale ones are re-encoded.
+SOURCE_QUERIES = {
+    "note": {
+        "missing": """
+        MATCH (n:Note)
+        WHERE n.%(embedding)s IS NULL AND n.id > $after_id
+        RETURN n.id as id, n.title as title, n.plain_text as text,
+               CASE WHEN n.plain_text IS NULL THEN n.content END as legacy_content,
+               n.%(hash)s as embedding_hash%(reuse)s
+        ORDER BY n.id
+        LIMIT $page_size
+        """,
+        "all": """
+        MATCH (n:Note)
+        WHERE n.id > $after_id
+        RETURN n.id as id, n.title as title, n.plain_text as text,
+               CASE WHEN n.plain_text IS NULL THEN n.content END as legacy_content,
+               n.%(hash)s as embedding_hash%(reuse)s
+        ORDER BY n.id
+        LIMIT $page_size
+        """,
+        "ids": """
+        UNWIND $ids AS note_id
+        MATCH (n:Note {id: note_id})
+        WHERE n.id > $after_id
+        RETURN n.id as id, n.title as title, n.plain_text as text,
+               CASE WHEN n.plain_text IS NULL THEN n.content END as legacy_content,
+               n.%(hash)s as embedding_hash%(reuse)s
+        ORDER BY n.id
+        LIMIT $page_size
+        """,
+    },
+    "journal": {
+        "missing": """
+        MATCH (n:Journal)
+        WHERE n.%(embedding)s IS NULL AND n.id > $after_id
+        RETURN n.id as id, n.title as title, n.description as text,
+               n.%(hash)s as embedding_hash%(reuse)s
+        ORDER BY n.id
+        LIMIT $page_size
+        """,
+        "all": """
+        MATCH (n:Journal)
+        WHERE n.id > $after_id
+        RETURN n.id as id, n.title as title, n.description as text,
+               n.%(hash)s as embedding_hash%(reuse)s
+        ORDER BY n.id
+        LIMIT $page_size
+        """,
+        "ids": """
+        UNWIND $ids AS journal_id
+        MATCH (n:Journal {id: journal_id})
+        WHERE n.id > $after_id
+        RETURN n.id as id, n.title as title, n.description as text,
+               n.%(hash)s as embedding_hash%(reuse)s
+        ORDER BY n.id
+        LIMIT $page_size
+        """,
+    },
+}
+
+# Another version's vector and hash, read so a build can copy what that version
+# already encoded with the same model instead of encoding it again
+REUSE_COLUMNS = """,
+               n.%(embedding)s as reuse_embedding, n.%(hash)s as reuse_hash"""
+
+WRITE_QUERIES = {
+    "note": """
+    UNWIND $rows AS row
+    MATCH (n:Note {id: row.id})
+    SET n.%(embedding)s = row.embedding, n.%(hash)s = row.embedding_hash
+    """,
+    "journal": """
+    UNWIND $rows AS row
+    MATCH (j:Journal {id: row.id})
+    SET j.%(embedding)s = row.embedding, j.%(hash)s = row.embedding_hash
+    """,
+}
+
+
+def version_properties(version: EmbeddingVersion) -> Dict[str, str]:
+    return {"embedding": version.embedding_property, "hash": version.hash_property}
+
+
+def build_source_query(kind: str, scope: str, version: EmbeddingVersion, reuse_from: Optional[EmbeddingVersion] = None) -> str:
+    reuse = REUSE_COLUMNS % version_properties(reuse_from) if reuse_from is not None else ""
+    return SOURCE_QUERIES[kind][scope] % {**version_properties(version), "reuse": reuse}
+
+
+def body_text(row: Dict[str, Any]) -> str:
+    """A note's plain text or a journal's description."""
+    text = row.get("text")
+    if text is None and row.get("legacy_content"):
+        # Note written before plain_text existed
+        try:
+            content = codec.loads(row["legacy_content"])
+        except ValueError:
+            content = {}
+        text = content.get("text", "") if isinstance(content, dict) else ""
+    return text or ""
+
+
+def embedding_text(row: Dict[str, Any]) -> str:
+    """The text a note or journal is embedded from: its title followed by its body."""
+    return f"{row.get('title') or ''} {body_text(row)}"
+
+
+def embedding_hash(model_id: str, text: str) -> str:
+    """Fingerprint of an embedding's input, so unchanged text under the same model is not re-encoded."""
+    return hashlib.sha256(f"{model_id}\n{text}".encode()).hexdigest()
+
+
+@dataclass
+class PipelineStats:
+    kind: str
+    documents: int = 0
+    skipped: int = 0
+    unchanged: int = 0
+    reused: int = 0
+    batches: int = 0
+    embed_seconds: float = 0.0
+    write_seconds: float = 0.0
+    # Keyset position reached, and whether the source ran out before max_pages
+    last_id: str = ""
+    exhausted: bool = False
+    started_at: float = field(default_factory=time.perf_counter)
+    elapsed_seconds: float = 0.0
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.documents / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "documents": self.documents,
+            "skipped": self.skipped,
+            "unchanged": self.unchanged,
+            "reused": self.reused,
+            "batches": self.batches,
+            "embed_seconds": round(self.embed_seconds, 3),
+            "write_seconds": round(self.write_seconds, 3),
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "docs_per_second": round(self.docs_per_second, 1),
+        }
+
+
+class EmbeddingPipeline:
+    """Embeds notes and journals in batches and writes them back with one query per batch.
+
+    Candidates are read in keyset pages of ``page_size`` rows, encoded with
+    ``embed_documents`` in length-sorted chunks of ``batch_size`` on
+    ``executor``, and stored with a single ``UNWIND $rows`` write. The write
+    of one batch overlaps with encoding the next. Vectors go to ``version``'s
+    properties; with ``reuse_from``, documents whose text that version already
+    encoded with the same model are copied over rather than encoded again.
+    ``on_write`` is awaited with every batch of rows once it is stored.
+    """
+
+    def __init__(
+        self,
+        repository: Neo4jRepository,
+        embeddings: Any,
+        version: EmbeddingVersion,
+        batch_size: int = 32,
+        page_size: int = 256,
+        executor: Optional[Executor] = None,
+        reuse_from: Optional[EmbeddingVersion] = None,
+        on_write: Optional[Callable[[str, List[Dict[str, Any]]], Awaitable[None]]] = None,
+    ) -> None:
+        self.repository = repository
+        self.embeddings = embeddings
+        self.version = version
+        self.model_id = version.model_id
+        self.reuse_from = reuse_from
+        self.on_write = on_write
+        self.source_queries = {
+            kind: {scope: build_source_query(kind, scope, version, reuse_from) for scope in queries}
+            for kind, queries in SOURCE_QUERIES.items()
+        }
+        self.write_queries = {kind: query % version_properties(version) for kind, query in WRITE_QUERIES.items()}
+        self.batch_size = batch_size
+        self.page_size = max(page_size, batch_size)
+        # None means the event loop's default thread pool
+        self.executor = executor
+        self.embedded = 0
+        self.avoided = 0
+        self.reused = 0
+
+    async def embed_missing(self, kind: str, after_id: str = "", max_pages: Optional[int] = None) -> PipelineStats:
+        """Embed notes or journals that have no embedding yet, resuming after ``after_id``.
+
+        With ``max_pages`` it stops early; ``last_id`` and ``exhausted`` on the
+        returned stats tell the caller where to continue.
+        """
+        return await self._run(kind, self.source_queries[kind]["missing"], {}, after_id, max_pages)
+
+    async def embed_all(self, kind: str, after_id: str = "", max_pages: Optional[int] = None) -> PipelineStats:
+        """Bring every note or journal's embedding up to date, resuming after ``after_id``; used to build a version."""
+        return await self._run(kind, self.source_queries[kind]["all"], {}, after_id, max_pages)
+
+    async def embed_ids(self, kind: str, ids: List[str]) -> PipelineStats:
+        """(Re-)embed the given notes or journals."""
+        return await self._run(kind, self.source_queries[kind]["ids"], {"ids": list(ids)})
+
+    async def _write(self, kind: str, rows: List[Dict[str, Any]], stats: PipelineStats) -> None:
+        start = time.perf_counter()
+        await self.repository.write(self.write_queries[kind], {"rows": rows})
+        stats.write_seconds += time.perf_counter() - start
+        if self.on_write is not None:
+            await self.on_write(kind, rows)
+
+    async def _run(
+        self,
+        kind: str,
+        source_query: str,
+        params: Dict[str, Any],
+        after_id: str = "",
+        max_pages: Optional[int] = None,
+    ) -> PipelineStats:
+        stats = PipelineStats(kind=kind, last_id=after_id)
+        pending_write: Optional[asyncio.Task] = None
+        pages = 0
+        try:
+            while max_pages is None or pages < max_pages:
+                page = await self.repository.read(
+                    source_query, {**params, "after_id": after_id, "page_size": self.page_size}
+                )
+                if not page:
+                    stats.exhausted = True
+                    break
+                pages += 1
+                after_id = page[-1]["id"]
+
+                candidates = []
+                copied = []
+                for row in page:
+                    text = embedding_text(row)
+                    if not text.strip():
+                        stats.skipped += 1
+                        continue
+                    text_hash = embedding_hash(self.model_id, text)
+                    if text_hash == row.get("embedding_hash"):
+                        # Only tags or journal membership changed since the last embedding
+                        stats.unchanged += 1
+                        self.avoided += 1
+                        continue
+                    if row.get("reuse_embedding") is not None and text_hash == row.get("reuse_hash"):
+                        # Same model and text in the version being copied from
+                        copied.append({"id": row["id"], "embedding": row["reuse_embedding"], "embedding_hash": text_hash})
+                        continue
+                    candidates.append((row["id"], text, text_hash))
+
+                if copied:
+                    if pending_write is not None:
+                        await pending_write
+                    pending_write = asyncio.create_task(self._write(kind, copied, stats))
+                    stats.reused += len(copied)
+                    self.reused += len(copied)
+
+                # Similar lengths in a batch means less padding for the transformer
+                candidates.sort(key=lambda candidate: len(candidate[1]))
+                for i in range(0, len(candidates), self.batch_size):
+                    batch = candidates[i:i + self.batch_size]
+                    start = time.perf_counter()
+                    vectors = await asyncio.get_running_loop().run_in_executor(
+                        self.executor, self.embeddings.embed_documents, [text for _, text, _ in batch]
+                    )
+                    stats.embed_seconds += time.perf_counter() - start
+
+                    if pending_write is not None:
+                        await pending_write
+                    rows = [
+                        {"id": doc_id, "embedding": list(vector), "embedding_hash": text_hash}
+                        for (doc_id, _, text_hash), vector in zip(batch, vectors)
+                    ]
+                    pending_write = asyncio.create_task(self._write(kind, rows, stats))
+                    stats.documents += len(batch)
+                    self.embedded += len(batch)
+                    stats.batches += 1
+
+                stats.elapsed_seconds = time.perf_counter() - stats.started_at
+                if stats.documents:
+                    print(f"Embedding pipeline: {stats.documents} {kind}s embedded, {stats.docs_per_second:.1f} docs/s")
+
+                if len(page) < self.page_size:
+                    stats.exhausted = True
+                    break
+        finally:
+            if pending_write is not None:
+                await pending_write
+            stats.last_id = after_id
+            stats.elapsed_seconds = time.perf_counter() - stats.started_at
+        return stats
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.embedded + self.avoided
+        return {
+            "model_id": self.model_id,
+            "version": self.version.key,
+            "embedded": self.embedded,
+            "reused": self.reused,
+            "avoided": self.avoided,
+            "avoided_rate": self.avoided / lookups if lookups else 0.0,
+        }
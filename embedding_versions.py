@@ -0,0 +1,283 @@
+"""Embedding model versions, so the model can change without taking search down.
+
+Each version keeps its vectors in properties of its own (``embedding_<key>``,
+``embedding_hash_<key>``, ``chunks_hash_<key>`` and ``NoteChunk`` nodes tagged
+with ``version``) behind vector indexes declared with its dimension and
+similarity function. Vectors stored before versioning existed are the
+``legacy`` version, in the unsuffixed properties and indexes.
+
+An ``EmbeddingVersion`` node records each version's status: searches read the
+``active`` one, writes go to it and to the one ``building`` in the background,
+and the build job swaps them in one transaction once its backfill completes.
+"""
+import re
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from neo4j_repository import Neo4jRepository
+
+LEGACY_KEY = "legacy"
+
+# kind -> (base index name, label)
+VECTOR_INDEXES = {
+    "note": ("notes_vector", "Note"),
+    "journal": ("journals_vector", "Journal"),
+    "note_chunk": ("note_chunks_vector", "NoteChunk"),
+}
+
+VERSION_FIELDS = """
+v.key as key, v.model_name as model_name, v.model_id as model_id, v.dimension as dimension,
+v.similarity as similarity, v.status as status, v.created_at as created_at,
+v.activated_at as activated_at, v.retired_at as retired_at
+"""
+
+
+@dataclass(frozen=True)
+class EmbeddingVersion:
+    key: str
+    # EMBEDDING_MODEL value that loads the model, e.g. sentence_transformer_onnx_int8
+    model_name: str
+    model_id: str
+    dimension: int
+    similarity: str = "cosine"
+
+    @property
+    def suffix(self) -> str:
+        return "" if self.key == LEGACY_KEY else f"_{self.key}"
+
+    @property
+    def embedding_property(self) -> str:
+        return f"embedding{self.suffix}"
+
+    @property
+    def hash_property(self) -> str:
+        return f"embedding_hash{self.suffix}"
+
+    @property
+    def chunks_hash_property(self) -> str:
+        return f"chunks_hash{self.suffix}"
+
+    def index_name(self, kind: str) -> str:
+        return VECTOR_INDEXES[kind][0] + self.suffix
+
+    def chunk_filter(self, variable: str) -> str:
+        """Cypher condition selecting this version's NoteChunk nodes."""
+        if self.key == LEGACY_KEY:
+            return f"{variable}.version IS NULL"
+        return f"{variable}.version = '{self.key}'"
+
+
+def version_key(model_id: str, dimension: int) -> str:
+    # Only [a-z0-9_], since it is spliced into property and index names
+    return re.sub(r"[^a-z0-9]+", "_", model_id.lower()).strip("_") + f"_{dimension}"
+
+
+def embedding_version(model_name: str, model_id: str, dimension: int, similarity: str = "cosine") -> EmbeddingVersion:
+    return EmbeddingVersion(version_key(model_id, dimension), model_name, model_id, dimension, similarity)
+
+
+# What every note and journal was embedded with before versions existed
+LEGACY_VERSION = EmbeddingVersion(LEGACY_KEY, "sentence_transformer", "all-MiniLM-L6-v2", 384)
+
+
+class EmbeddingVersions:
+    """The active embedding version, and the one being built to replace it.
+
+    Read from the ``EmbeddingVersion`` nodes and re-read every
+    ``refresh_seconds``, so every worker process follows a cutover made by
+    whichever process ran the build job.
+    """
+
+    def __init__(self, repository: Neo4jRepository, configured: EmbeddingVersion, refresh_seconds: float = 10.0) -> None:
+        self.repository = repository
+        self.configured = configured
+        self.refresh_seconds = refresh_seconds
+        # Until ensure() has run, assume the configured version is all there is
+        self.active = configured
+        self.building: Optional[EmbeddingVersion] = None
+        self._versions: Dict[str, Dict[str, Any]] = {}
+        self._loaded_at: Optional[float] = None
+
+    async def ensure(self) -> None:
+        """Register the configured version: active on a fresh database, otherwise built in the background."""
+        result = await self.repository.read(
+            """
+            RETURN EXISTS { MATCH (v:EmbeddingVersion) } as registered,
+                   EXISTS { MATCH (n:Note) WHERE n.embedding IS NOT NULL } OR
+                   EXISTS { MATCH (j:Journal) WHERE j.embedding IS NOT NULL } as legacy
+            """
+        )
+        if result and not result[0]["registered"] and result[0]["legacy"]:
+            await self._merge(LEGACY_VERSION, "active")
+
+        now = time.time()
+        await self._merge(self.configured, None)
+        # A build for a model that is no longer configured is abandoned
+        await self.repository.write(
+            """
+            MATCH (v:EmbeddingVersion {status: 'building'})
+            WHERE v.key <> $key
+            SET v.status = 'retired', v.retired_at = $now
+            """,
+            {"key": self.configured.key, "now": now}
+        )
+        await self.load()
+        for version in self.live():
+            await self.create_indexes(version)
+        if self.building is not None:
+            print(f"Embedding version {self.building.key} is building; searches use {self.active.key} until it completes")
+        else:
+            print(f"Embedding version: {self.active.key}")
+
+    async def _merge(self, version: EmbeddingVersion, status: Optional[str]) -> None:
+        # Unique on key, so concurrent workers can't register a version twice. Without
+        # a given status it becomes active only if nothing else is, and a retired
+        # version that is configured again is rebuilt; content hashes keep what is
+        # still current from being re-encoded
+        await self.repository.write(
+            """
+            MERGE (v:EmbeddingVersion {key: $key})
+            ON CREATE SET v.model_name = $model_name, v.model_id = $model_id, v.dimension = $dimension,
+                          v.similarity = $similarity, v.created_at = $now,
+                          v.status = COALESCE($status, CASE WHEN EXISTS { MATCH (:EmbeddingVersion {status: 'active'}) }
+                                                            THEN 'building' ELSE 'active' END)
+            ON MATCH SET v.status = CASE WHEN v.status = 'retired' AND $status IS NULL THEN 'building' ELSE v.status END
+            SET v.activated_at = COALESCE(v.activated_at, CASE WHEN v.status = 'active' THEN $now END)
+            """,
+            {**asdict(version), "status": status, "now": time.time()}
+        )
+
+    async def load(self) -> None:
+        rows = await self.repository.read("MATCH (v:EmbeddingVersion) RETURN " + VERSION_FIELDS)
+        self._versions = {row["key"]: row for row in rows}
+        self._loaded_at = time.monotonic()
+        active = building = None
+        for row in rows:
+            if row["status"] == "active":
+                active = self._version(row)
+            elif row["status"] == "building":
+                building = self._version(row)
+        if active is not None:
+            self.active = active
+        self.building = building
+
+    async def refresh(self) -> None:
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_seconds:
+            try:
+                await self.load()
+            except Exception as e:
+                # Keep serving the last known versions
+                print(f"Could not refresh embedding versions: {e}")
+                self._loaded_at = time.monotonic()
+
+    async def current(self) -> EmbeddingVersion:
+        """The version searches read."""
+        await self.refresh()
+        return self.active
+
+    async def write_targets(self) -> List[EmbeddingVersion]:
+        """The versions every note and journal write is embedded into."""
+        await self.refresh()
+        return self.live()
+
+    def live(self) -> List[EmbeddingVersion]:
+        return [self.active] + ([self.building] if self.building is not None else [])
+
+    def get(self, key: str) -> Optional[EmbeddingVersion]:
+        row = self._versions.get(key)
+        return self._version(row) if row is not None else None
+
+    @staticmethod
+    def _version(row: Dict[str, Any]) -> EmbeddingVersion:
+        return EmbeddingVersion(row["key"], row["model_name"], row["model_id"], row["dimension"], row["similarity"])
+
+    async def create_indexes(self, version: EmbeddingVersion) -> None:
+        for kind, (_, label) in VECTOR_INDEXES.items():
+            await self.repository.execute(
+                """
+                CREATE VECTOR INDEX %s IF NOT EXISTS
+                FOR (x:%s) ON (x.%s)
+                OPTIONS {indexConfig: {`vector.dimensions`: %d, `vector.similarity_function`: '%s'}}
+                """ % (version.index_name(kind), label, version.embedding_property, version.dimension, version.similarity)
+            )
+
+    async def activate(self, version: EmbeddingVersion) -> bool:
+        """Cut searches over to a fully built version, retiring the active one in the same transaction."""
+        now = time.time()
+        result = await self.repository.write(
+            """
+            MATCH (new:EmbeddingVersion {key: $key, status: 'building'})
+            OPTIONAL MATCH (old:EmbeddingVersion {status: 'active'})
+            SET new.status = 'active', new.activated_at = $now
+            FOREACH (o IN CASE WHEN old IS NULL THEN [] ELSE [old] END |
+                SET o.status = 'retired', o.retired_at = $now)
+            RETURN new.key as key
+            """,
+            {"key": version.key, "now": now}
+        )
+        await self.load()
+        if result:
+            print(f"Embedding version {version.key} is now active")
+        return bool(result)
+
+    async def drop(self, version: EmbeddingVersion) -> None:
+        """Delete a retired version's indexes, vectors and passages."""
+        for kind in VECTOR_INDEXES:
+            await self.repository.execute("DROP INDEX %s IF EXISTS" % version.index_name(kind))
+        properties = {"embedding": version.embedding_property, "hash": version.hash_property}
+        for label in ("Note", "Journal"):
+            await self.repository.execute(
+                """
+                MATCH (x:%s) WHERE x.%s IS NOT NULL OR x.%s IS NOT NULL
+                CALL { WITH x REMOVE x.%s, x.%s } IN TRANSACTIONS OF 1000 ROWS
+                """ % (label, properties["embedding"], properties["hash"], properties["embedding"], properties["hash"])
+            )
+        await self.repository.execute(
+            """
+            MATCH (n:Note) WHERE n.%s IS NOT NULL
+            CALL { WITH n REMOVE n.%s } IN TRANSACTIONS OF 1000 ROWS
+            """ % (version.chunks_hash_property, version.chunks_hash_property)
+        )
+        await self.repository.execute(
+            """
+            MATCH (c:NoteChunk) WHERE %s
+            CALL { WITH c DETACH DELETE c } IN TRANSACTIONS OF 1000 ROWS
+            """ % version.chunk_filter("c")
+        )
+        await self.repository.write(
+            "MATCH (v:EmbeddingVersion {key: $key, status: 'retired'}) DELETE v", {"key": version.key}
+        )
+        await self.load()
+        print(f"Embedding version {version.key} dropped")
+
+    def describe(self) -> List[Dict[str, Any]]:
+        return sorted(self._versions.values(), key=lambda row: row.get("created_at") or 0.0)
+
+
+class VersionedEmbeddings:
+    """Embeds note and journal writes into every live version: dual writes while a new one is built.
+
+    Stands in for the pipeline and chunker the embedding worker calls, with
+    one of each per version from ``pipeline_for`` and ``chunker_for``.
+    """
+
+    def __init__(self, versions: EmbeddingVersions, pipeline_for: Callable, chunker_for: Callable) -> None:
+        self.versions = versions
+        self.pipeline_for = pipeline_for
+        self.chunker_for = chunker_for
+
+    async def embed_ids(self, kind: str, ids: List[str]):
+        stats = None
+        for version in await self.versions.write_targets():
+            result = await self.pipeline_for(version).embed_ids(kind, ids)
+            # The active version's stats, which is what searches see
+            stats = stats or result
+        return stats
+
+    async def sync_ids(self, ids: List[str]):
+        stats = None
+        for version in await self.versions.write_targets():
+            result = await self.chunker_for(version).sync_ids(ids)
+            stats = stats or result
+        return stats
@@ -0,0 +1,176 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from embedding_pipeline import EmbeddingPipeline
+from note_chunks import NoteChunker
+
+JobKey = Tuple[str, str]  # (kind, id)
+
+
+class EmbeddingWorker:
+    """In-process background queue for note and journal embeddings.
+
+    ``enqueue`` is cheap and never blocks the request. Repeated enqueues of the
+    same (kind, id) within ``debounce_seconds`` collapse into one job, so an
+    autosave burst costs one embedding. A job is delayed at most
+    ``max_delay_seconds`` past its first enqueue, even while edits keep coming.
+    Due jobs are embedded in batches through the pipeline, whose executor
+    keeps the model off the event loop; notes are then re-chunked if a
+    ``chunker`` is given. A failed batch is requeued with exponential backoff
+    from ``retry_backoff_seconds``, and an id is given up on after
+    ``max_attempts`` failures.
+    """
+
+    def __init__(
+        self,
+        pipeline: EmbeddingPipeline,
+        chunker: Optional[NoteChunker] = None,
+        debounce_seconds: float = 2.0,
+        max_delay_seconds: float = 30.0,
+        max_batch: int = 64,
+        max_attempts: int = 5,
+        retry_backoff_seconds: float = 2.0,
+        max_retry_delay_seconds: float = 300.0,
+        timer: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.pipeline = pipeline
+        self.chunker = chunker
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max(max_delay_seconds, debounce_seconds)
+        self.max_batch = max_batch
+        self.max_attempts = max(max_attempts, 1)
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.max_retry_delay_seconds = max_retry_delay_seconds
+        self._timer = timer
+        # key -> (first enqueued at, due at); only touched from the event loop thread
+        self._pending: Dict[JobKey, Tuple[float, float]] = {}
+        # key -> failed attempts so far, until it is embedded or given up on
+        self._attempts: Dict[JobKey, int] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.enqueued = 0
+        self.coalesced = 0
+        self.processed = 0
+        self.retried = 0
+        self.failed = 0
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+
+    def enqueue(self, kind: str, item_id: str) -> None:
+        now = self._timer()
+        key = (kind, item_id)
+        self.enqueued += 1
+        if key in self._pending:
+            self.coalesced += 1
+            first, _ = self._pending[key]
+        else:
+            first = now
+        self._pending[key] = (first, min(now + self.debounce_seconds, first + self.max_delay_seconds))
+        self._wakeup.set()
+
+    def discard(self, kind: str, item_id: str) -> None:
+        self._pending.pop((kind, item_id), None)
+        self._attempts.pop((kind, item_id), None)
+
+    def clear(self) -> None:
+        """Drop every queued job, e.g. after the notes and journals they refer to are gone."""
+        self._pending.clear()
+        self._attempts.clear()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, flush: bool = True) -> None:
+        """Stop the worker, first embedding whatever is still queued if ``flush``."""
+        if self._task is not None:
+            # A flag rather than cancel(): wait_for can swallow a cancellation that
+            # races with the wakeup event
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        if flush and self._pending:
+            await self._process(list(self._pending))
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            now = self._timer()
+            due = [key for key, (_, due_at) in self._pending.items() if due_at <= now]
+            if due:
+                await self._process(due[:self.max_batch])
+                continue
+
+            self._wakeup.clear()
+            timeout = min((due_at for _, due_at in self._pending.values()), default=now + 60.0) - now
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(timeout, 0.0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _process(self, keys: List[JobKey]) -> None:
+        by_kind: Dict[str, List[str]] = defaultdict(list)
+        first_enqueued: Dict[JobKey, float] = {}
+        for key in keys:
+            entry = self._pending.pop(key, None)
+            if entry is not None:
+                by_kind[key[0]].append(key[1])
+                first_enqueued[key] = entry[0]
+
+        for kind, ids in by_kind.items():
+            try:
+                await self.pipeline.embed_ids(kind, ids)
+                if kind == "note" and self.chunker is not None:
+                    await self.chunker.sync_ids(ids)
+            except Exception as e:
+                print(f"Embedding worker: failed to embed {len(ids)} {kind}s: {e}")
+                self._retry(kind, ids, first_enqueued)
+                continue
+            now = self._timer()
+            self.processed += len(ids)
+            for item_id in ids:
+                self._attempts.pop((kind, item_id), None)
+                lag = now - first_enqueued[(kind, item_id)]
+                self.last_lag_seconds = lag
+                self.max_lag_seconds = max(self.max_lag_seconds, lag)
+
+    def _retry(self, kind: str, ids: List[str], first_enqueued: Dict[JobKey, float]) -> None:
+        now = self._timer()
+        given_up = 0
+        for item_id in ids:
+            key = (kind, item_id)
+            attempts = self._attempts.get(key, 0) + 1
+            if attempts >= self.max_attempts:
+                self._attempts.pop(key, None)
+                given_up += 1
+                continue
+            self._attempts[key] = attempts
+            # An edit made meanwhile already requeued it
+            if key not in self._pending:
+                delay = min(self.retry_backoff_seconds * 2 ** (attempts - 1), self.max_retry_delay_seconds)
+                self._pending[key] = (first_enqueued[key], now + delay)
+                self.retried += 1
+        if given_up:
+            self.failed += given_up
+            print(f"Embedding worker: giving up on {given_up} {kind}s after {self.max_attempts} attempts")
+
+    def stats(self) -> Dict[str, Any]:
+        now = self._timer()
+        oldest = min((first for first, _ in self._pending.values()), default=None)
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "queue_depth": len(self._pending),
+            "oldest_pending_seconds": round(now - oldest, 3) if oldest is not None else 0.0,
+            "debounce_seconds": self.debounce_seconds,
+            "enqueued": self.enqueued,
+            "coalesced": self.coalesced,
+            "processed": self.processed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "last_lag_seconds": round(self.last_lag_seconds, 3),
+            "max_lag_seconds": round(self.max_lag_seconds, 3),
+        }
@@ -9,6 +9,25 @@ interface SettingsState {
   reducedMotion: boolean;
 }
 
+// Wrap the highlighted ranges of a search excerpt in <mark>
+const renderExcerpt = (result: SearchResult) => {
+  const highlights = result.highlights || [];
+  if (highlights.length === 0) {
+    return result.excerpt;
+  }
+  const parts: React.ReactNode[] = [];
+  let position = 0;
+  highlights.forEach(([start, end], index) => {
+    if (start > position) {
+      parts.push(result.excerpt.slice(position, start));
+    }
+    parts.push(<mark key={index} className="bg-yellow-100">{result.excerpt.slice(start, end)}</mark>);
+    position = end;
+  });
+  parts.push(result.excerpt.slice(position));
+  return parts;
+};
+
 export interface AGNISSidebarProps {
   notes: any[];
   onNoteSelected: (noteId: string) => void;
@@ -23,7 +42,7 @@ const AGNISSidebar: React.FC<AGNISSidebarProps> = ({
   onSettingsChange
 }) => {
   const [searchQuery, setSearchQuery] = useState("");
-  const [searchType, setSearchType] = useState<"text" | "semantic" | "tags">("text");
+  const [searchType, setSearchType] = useState<"text" | "semantic" | "hybrid" | "tags">("text");
   const [searchResults, setSearchResults] = useState<SearchResult[]>([]);
   const [isSearching, setIsSearching] = useState(false);
   const [showSearchResults, setShowSearchResults] = useState(false);
@@ -159,6 +178,9 @@ const AGNISSidebar: React.FC<AGNISSidebarProps> = ({
       } else if (searchType === "semantic") {
         const response = await AGNISService.searchSemantic(searchQuery);
         results = response.data.results;
+      } else if (searchType === "hybrid") {
+        const response = await AGNISService.searchHybrid(searchQuery);
+        results = response.data.results;
       } else if (searchType === "tags") {
         const response = await AGNISService.searchByTags(searchQuery);
         results = response.data.results;
@@ -472,6 +494,16 @@ const AGNISSidebar: React.FC<AGNISSidebarProps> = ({
                 />
                 <span className="ml-1 text-sm text-gray-700">Semantic</span>
               </label>
+              <label className="inline-flex items-center">
+                <input
+                  type="radio"
+                  className="form-radio"
+                  name="searchType"
+                  checked={searchType === "hybrid"}
+                  onChange={() => setSearchType("hybrid")}
+                />
+                <span className="ml-1 text-sm text-gray-700">Hybrid</span>
+              </label>
               <label className="inline-flex items-center">
                 <input
                   type="radio"
@@ -499,7 +531,7 @@ const AGNISSidebar: React.FC<AGNISSidebarProps> = ({
                       onClick={() => onNoteSelected(result.id)}
                     >
                       <h4 className="font-medium text-blue-600">{result.title}</h4>
-                      <p className="text-sm text-gray-600 line-clamp-2">{result.excerpt}</p>
+                      <p className="text-sm text-gray-600 line-clamp-2">{renderExcerpt(result)}</p>
                       <div className="flex flex-wrap mt-1">
                         {result.tags && result.tags.map((tag) => (
                           <span key={tag} className="inline-flex items-center px-2 py-0.5 rounded text-xs font-medium bg-blue-100 text-blue-800 mr-1 mb-1">
@@ -27,6 +27,9 @@ function DashboardPage() {
   const [userData, setUserData] = useState<UserData | null>(null);
   const [error, setError] = useState<string | null>(null);
   const [notes, setNotes] = useState<Note[]>([]);
+  // Cursor for the next page of the current note list; null once it is fully loaded
+  const [notesCursor, setNotesCursor] = useState<string | null>(null);
+  const [isLoadingMoreNotes, setIsLoadingMoreNotes] = useState(false);
   const [journals, setJournals] = useState<Journal[]>([]);
   const [activeTab, setActiveTab] = useState<'notes' | 'journals'>('notes');
   const [selectedNote, setSelectedNote] = useState<Note | null>(null);
@@ -119,10 +122,11 @@ function DashboardPage() {
         console.log('User data received:', userResponse.data);
         setUserData(userResponse.data);
 
-        // Fetch notes
+        // Fetch the first page of notes; later pages load on demand
         const notesResponse = await NoteService.getNotes();
         console.log(`Retrieved ${notesResponse.data.length} notes`);
         setNotes(notesResponse.data);
+        setNotesCursor(notesResponse.nextCursor);
 
         // Fetch journals
         const journalsResponse = await NoteService.getJournals();
@@ -154,6 +158,7 @@ function DashboardPage() {
       setIsLoading(true);
       const response = await NoteService.getJournalNotes(journalId);
       setNotes(response.data);
+      setNotesCursor(response.nextCursor);
       setIsLoading(false);
       return response.data;
     } catch (err) {
@@ -163,6 +168,27 @@ function DashboardPage() {
     }
   };
 
+  const loadMoreNotes = async () => {
+    if (!notesCursor) return;
+    try {
+      setIsLoadingMoreNotes(true);
+      const response = selectedJournal
+        ? await NoteService.getJournalNotes(selectedJournal.id, notesCursor)
+        : await NoteService.getNotes(notesCursor);
+      // Notes created since the first page was loaded are already at the top of the list
+      setNotes(prevNotes => [
+        ...prevNotes,
+        ...response.data.filter(note => !prevNotes.some(n => n.id === note.id))
+      ]);
+      setNotesCursor(response.nextCursor);
+    } catch (err) {
+      console.error('Failed to load more notes:', err);
+      setError('Failed to load more notes. Please try again.');
+    } finally {
+      setIsLoadingMoreNotes(false);
+    }
+  };
+
   // Note CRUD operations
   const createNote = async (title: string, content: NoteContent, tags: string[]) => {
     try {
@@ -289,6 +315,7 @@ function DashboardPage() {
         if (!deleteNotes) {
           const notesResponse = await NoteService.getNotes();
           setNotes(notesResponse.data);
+          setNotesCursor(notesResponse.nextCursor);
         }
       }
       
@@ -311,6 +338,7 @@ function DashboardPage() {
     // Fetch all notes
     const notesResponse = await NoteService.getNotes();
     setNotes(notesResponse.data);
+    setNotesCursor(notesResponse.nextCursor);
   };
 
   // Debug function to check note structure
@@ -325,10 +353,18 @@ function DashboardPage() {
   }, [selectedNote]);
 
   // Select a note based on the ID (for AGNIS search results)
-  const handleNoteSelected = (noteId: string) => {
+  const handleNoteSelected = async (noteId: string) => {
     const note = notes.find(n => n.id === noteId);
     if (note) {
       setSelectedNote(note);
+      return;
+    }
+    // Search results can point past the pages loaded so far
+    try {
+      const response = await NoteService.getNote(noteId);
+      setSelectedNote(response.data);
+    } catch (err) {
+      console.error('Failed to load note:', err);
     }
   };
 
@@ -498,6 +534,15 @@ function DashboardPage() {
                     ))}
                   </ul>
                 )}
+                {notesCursor && (
+                  <button
+                    onClick={loadMoreNotes}
+                    disabled={isLoadingMoreNotes}
+                    className="w-full p-3 text-sm text-blue-600 hover:bg-gray-50 dark:text-blue-400 dark:hover:bg-gray-700 disabled:opacity-50"
+                  >
+                    {isLoadingMoreNotes ? 'Loading...' : 'Load more notes'}
+                  </button>
+                )}
               </div>
             </div>
 
@@ -36,11 +36,24 @@ export interface SearchResult {
   excerpt: string;
   score: number;
   tags: string[];
+  highlights?: [number, number][]; // [start, end) offsets of matched terms in excerpt
+  sources?: Record<string, { rank: number; score: number }>; // Hybrid search: rank and score per retrieval leg
 }
 
 export interface SearchResponse {
   results: SearchResult[];
   total: number;
+  degraded?: string[]; // Hybrid search legs that failed or ran out of time
+}
+
+export interface TagCount {
+  name: string;
+  count: number;
+}
+
+export interface TagListResponse {
+  tags: TagCount[];
+  total: number;
 }
 
 export interface QuestionResponse {
@@ -72,9 +85,19 @@ const AGNISService = {
     return apiClient.get(`/api/search/semantic?query=${encodeURIComponent(query)}`);
   },
   
-  // Tag search
-  searchByTags: (query: string): Promise<AxiosResponse<SearchResponse>> => {
-    return apiClient.get(`/api/search/tags?query=${encodeURIComponent(query)}`);
+  // Hybrid search: full-text and semantic results fused into one ranking
+  searchHybrid: (query: string): Promise<AxiosResponse<SearchResponse>> => {
+    return apiClient.get(`/api/search/hybrid?query=${encodeURIComponent(query)}`);
+  },
+  
+  // Tag search: comma-separated tags, notes with any of them or with match "all" every one
+  searchByTags: (query: string, match: "any" | "all" = "any"): Promise<AxiosResponse<SearchResponse>> => {
+    return apiClient.get(`/api/search/tags?tags=${encodeURIComponent(query)}&match=${match}`);
+  },
+  
+  // The user's tags with how many notes carry each
+  listTags: (): Promise<AxiosResponse<TagListResponse>> => {
+    return apiClient.get(`/api/tags`);
   },
   
   // Question answering with streaming response
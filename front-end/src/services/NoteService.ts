@@ -1,4 +1,4 @@
-import axios from 'axios';
+import axios, { AxiosResponse } from 'axios';
 
 // Use the same URL pattern as AuthService
 const API_URL = window.location.hostname === 'localhost' || window.location.hostname === '127.0.0.1' 
@@ -32,8 +32,8 @@ apiClient.interceptors.request.use(
 // Types
 export interface NoteContent {
   text: string;
-  images?: string[]; // Base64 encoded images
-  audio?: string; // Base64 encoded audio
+  images?: string[]; // /api/blobs/<sha256> references, or base64 data URLs before saving
+  audio?: string; // Same as images
 }
 
 export interface Note {
@@ -46,6 +46,11 @@ export interface Note {
   journal_id?: string;
 }
 
+export interface NotePage {
+  items: Note[];
+  next_cursor?: string | null;
+}
+
 export interface NoteCreateRequest {
   title: string;
   content: NoteContent;
@@ -82,62 +87,52 @@ export interface JournalUpdateRequest {
   template?: Record<string, string>;
 }
 
+// Media is stored on the backend as /api/blobs/<sha256> paths; make them loadable from the UI origin
+const resolveMediaUrl = (url: string) => (url.startsWith('/api/blobs/') ? `${API_URL}${url}` : url);
+
+// Ensure a note has the required properties and loadable media URLs
+const processNote = (note: Note): Note => ({
+  ...note,
+  content: {
+    text: note.content.text || '',
+    images: (note.content.images || []).map(resolveMediaUrl),
+    audio: note.content.audio ? resolveMediaUrl(note.content.audio) : note.content.audio
+  },
+  tags: note.tags || []
+});
+
+const processNoteResponse = (response: AxiosResponse<Note>) => {
+  return {
+    ...response,
+    data: processNote(response.data)
+  };
+};
+
+// One page of a paginated note list; pass nextCursor back to load the page after it
+const getNotePage = (url: string, cursor?: string | null) => {
+  return apiClient.get<NotePage>(url, { params: cursor ? { cursor } : undefined }).then(response => ({
+    ...response,
+    data: response.data.items.map(processNote),
+    nextCursor: response.data.next_cursor || null
+  }));
+};
+
 // Note API methods
-const getNotes = () => {
-  return apiClient.get<Note[]>('/api/notes').then(response => {
-    // Ensure all notes have the required properties
-    const processedNotes = response.data.map(note => ({
-      ...note,
-      content: {
-        text: note.content.text || '',
-        images: note.content.images || [],
-        audio: note.content.audio
-      },
-      tags: note.tags || []
-    }));
-    return {
-      ...response,
-      data: processedNotes
-    };
-  });
+const getNotes = (cursor?: string | null) => {
+  return getNotePage('/api/notes', cursor);
 };
 
 const getNote = (id: string) => {
-  return apiClient.get<Note>(`/api/notes/${id}`).then(response => {
-    const processedNote = {
-      ...response.data,
-      content: {
-        text: response.data.content.text || '',
-        images: response.data.content.images || [],
-        audio: response.data.content.audio
-      },
-      tags: response.data.tags || []
-    };
-    return {
-      ...response,
-      data: processedNote
-    };
-  });
+  return apiClient.get<Note>(`/api/notes/${id}`).then(processNoteResponse);
 };
 
+// The back-end queues embedding generation for every note and journal write
 const createNote = (noteData: NoteCreateRequest) => {
-  return apiClient.post<Note>('/api/notes', noteData).then(response => {
-    // Trigger embedding generation in the background
-    apiClient.post(`/api/notes/embeddings/${response.data.id}`)
-      .catch(err => console.error('Failed to generate embeddings:', err));
-    return response;
-  });
+  return apiClient.post<Note>('/api/notes', noteData).then(processNoteResponse);
 };
 
 const updateNote = (id: string, noteData: NoteUpdateRequest) => {
-  return apiClient.put<Note>(`/api/notes/${id}`, noteData).then(response => {
-    // Trigger embedding generation in the background only if content was updated
-    if (noteData.content) {
-      apiClient.post(`/api/notes/embeddings/${id}`)
-        .catch(err => console.error('Failed to generate embeddings:', err));
-    }
-    return response;
-  });
+  return apiClient.put<Note>(`/api/notes/${id}`, noteData).then(processNoteResponse);
 };
 
 const deleteNote = (id: string) => {
@@ -153,41 +148,16 @@ const getJournal = (id: string) => {
   return apiClient.get<Journal>(`/api/journals/${id}`);
 };
 
-const getJournalNotes = (id: string) => {
-  return apiClient.get<Note[]>(`/api/journals/${id}/notes`).then(response => {
-    // Ensure all notes have the required properties
-    const processedNotes = response.data.map(note => ({
-      ...note,
-      content: {
-        text: note.content.text || '',
-        images: note.content.images || [],
-        audio: note.content.audio
-      },
-      tags: note.tags || []
-    }));
-    return {
-      ...response,
-      data: processedNotes
-    };
-  });
+const getJournalNotes = (id: string, cursor?: string | null) => {
+  return getNotePage(`/api/journals/${id}/notes`, cursor);
 };
 
 const createJournal = (journalData: JournalCreateRequest) => {
-  return apiClient.post<Journal>('/api/journals', journalData).then(response => {
-    // Trigger embedding generation in the background
-    apiClient.post(`/api/journals/embeddings/${response.data.id}`)
-      .catch(err => console.error('Failed to generate embeddings for journal:', err));
-    return response;
-  });
+  return apiClient.post<Journal>('/api/journals', journalData);
 };
 
 const updateJournal = (id: string, journalData: JournalUpdateRequest) => {
-  return apiClient.put<Journal>(`/api/journals/${id}`, journalData).then(response => {
-    // Generate embeddings for journal after update
-    apiClient.post(`/api/journals/embeddings/${id}`)
-      .catch(err => console.error('Failed to generate embeddings for journal:', err));
-    return response;
-  });
+  return apiClient.put<Journal>(`/api/journals/${id}`, journalData);
 };
 
 const deleteJournal = (id: string, deleteNotes: boolean = false) => {
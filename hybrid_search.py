@@ -0,0 +1,86 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+# Constant from the reciprocal rank fusion paper: large enough that a
+# first place in one ranking doesn't outweigh agreement between several
+RRF_K = 60
+
+
+def result_key(result: Dict[str, Any]) -> Tuple[str, str]:
+    # Notes and journals have separate id spaces
+    return result.get("type", "note"), result["id"]
+
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[Dict[str, Any]]], k: int = RRF_K) -> List[Dict[str, Any]]:
+    """Fuse best-first rankings into one, scoring each result by sum(1 / (k + rank)) over the rankings it is in.
+
+    Results are deduplicated by type and id. The first ranking a result
+    appears in supplies its fields, and ``sources`` records its rank and
+    original score in every ranking.
+    """
+    fused: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for source, results in rankings.items():
+        seen = set()
+        for rank, result in enumerate(results, start=1):
+            key = result_key(result)
+            if key in seen:
+                continue
+            seen.add(key)
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = {**result, "score": 0.0, "sources": {}}
+            entry["score"] += 1.0 / (k + rank)
+            entry["sources"][source] = {"rank": rank, "score": float(result["score"])}
+    return sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)
+
+
+class HybridSearch:
+    """Runs retrieval legs concurrently, each within its own latency budget, and fuses their rankings.
+
+    A leg that fails or overruns its budget is cancelled and contributes
+    nothing, so one slow index degrades the results instead of the latency.
+    """
+
+    def __init__(self, budgets: Dict[str, float], rrf_k: int = RRF_K) -> None:
+        self.budgets = budgets
+        self.rrf_k = rrf_k
+        self.legs: Dict[str, Dict[str, Any]] = {
+            name: {"calls": 0, "timeouts": 0, "errors": 0, "seconds": 0.0} for name in budgets
+        }
+
+    async def _leg(self, name: str, run: Callable[[], Awaitable[List[Dict[str, Any]]]]) -> Tuple[List[Dict[str, Any]], bool]:
+        stats = self.legs[name]
+        stats["calls"] += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(run(), timeout=self.budgets[name]), True
+        except asyncio.TimeoutError:
+            stats["timeouts"] += 1
+            print(f"Hybrid search: {name} exceeded its {self.budgets[name]:.2f}s budget")
+        except Exception as e:
+            stats["errors"] += 1
+            print(f"Hybrid search: {name} failed: {e}")
+        finally:
+            stats["seconds"] += time.perf_counter() - start
+        return [], False
+
+    async def search(self, legs: Dict[str, Callable[[], Awaitable[List[Dict[str, Any]]]]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """The fused results, and the names of legs that timed out or failed."""
+        names = list(legs)
+        outcomes = await asyncio.gather(*(self._leg(name, legs[name]) for name in names))
+        rankings = {name: results for name, (results, _) in zip(names, outcomes)}
+        degraded = [name for name, (_, ok) in zip(names, outcomes) if not ok]
+        return reciprocal_rank_fusion(rankings, self.rrf_k), degraded
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "budget_ms": round(self.budgets[name] * 1000, 1),
+                "calls": stats["calls"],
+                "timeouts": stats["timeouts"],
+                "errors": stats["errors"],
+                "mean_ms": round(stats["seconds"] / stats["calls"] * 1000, 3) if stats["calls"] else 0.0,
+            }
+            for name, stats in self.legs.items()
+        }
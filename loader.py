@@ -52,14 +52,17 @@ def load_high_score_so_data() -> None:
 
 
 def insert_so_data(data: dict) -> None:
-    # Calculate embedding values for questions and answers
+    # Calculate embedding values for questions and answers in one batched call
+    items, texts = [], []
     for q in data["items"]:
         question_text = q["title"] + "\n" + q["body_markdown"]
-        q["embedding"] = embeddings.embed_query(question_text)
+        items.append(q)
+        texts.append(question_text)
         for a in q["answers"]:
-            a["embedding"] = embeddings.embed_query(
-                question_text + "\n" + a["body_markdown"]
-            )
+            items.append(a)
+            texts.append(question_text + "\n" + a["body_markdown"])
+    for item, embedding in zip(items, embeddings.embed_documents(texts)):
+        item["embedding"] = embedding
 
     # Cypher, the query language of Neo4j, is used to import the data
     # https://neo4j.com/docs/getting-started/cypher-intro/
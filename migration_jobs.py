@@ -0,0 +1,279 @@
+import asyncio
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from embedding_versions import EmbeddingVersion, VersionedEmbeddings
+from neo4j_repository import Neo4jRepository
+
+# Run in this order; each phase walks its candidates by id from the checkpoint
+PHASES = ("note", "journal", "note_chunks")
+
+# Per scope: "missing" fills gaps in a version, "all" builds a new one
+COUNT_QUERIES = {
+    "missing": {
+        "note": "MATCH (n:Note) WHERE n.%(embedding)s IS NULL RETURN count(n) as total",
+        "journal": "MATCH (j:Journal) WHERE j.%(embedding)s IS NULL RETURN count(j) as total",
+        "note_chunks": "MATCH (n:Note) WHERE n.%(chunks_hash)s IS NULL RETURN count(n) as total",
+    },
+    "all": {
+        "note": "MATCH (n:Note) RETURN count(n) as total",
+        "journal": "MATCH (j:Journal) RETURN count(j) as total",
+        "note_chunks": "MATCH (n:Note) RETURN count(n) as total",
+    },
+}
+
+JOB_FIELDS = """
+j.id as id, j.status as status, j.version as version, j.scope as scope,
+j.phase as phase, j.last_id as last_id,
+j.processed as processed, j.skipped as skipped, j.total as total,
+j.active_seconds as active_seconds, j.started_at as started_at,
+j.updated_at as updated_at, j.finished_at as finished_at, j.error as error,
+j.cancel_requested as cancel_requested, j.owner as owner, j.heartbeat_at as heartbeat_at
+"""
+
+
+class EmbeddingMigration:
+    """Backfills note, journal and passage embeddings as a persistent background job.
+
+    The job is a ``MigrationJob`` node. After every page the runner stores the
+    phase and last id it reached, so a restarted process resumes there instead
+    of starting over. Only one job runs at a time. The running process holds a
+    lease (``owner`` plus a heartbeat) so another worker only takes over a job
+    whose runner has stopped renewing it. Cancellation is a flag on the node,
+    honoured at the next page boundary from any process. Pages are small and
+    paced to ``max_docs_per_second`` so interactive embedding isn't starved.
+
+    While a new embedding version is building, the job builds it: every
+    document is checked against that version, and once all are current it
+    becomes the active version searches use. Otherwise the job fills in what
+    the active version is missing.
+    """
+
+    def __init__(
+        self,
+        repository: Neo4jRepository,
+        embeddings: VersionedEmbeddings,
+        max_docs_per_second: float = 50.0,
+        pages_per_step: int = 1,
+        lease_seconds: float = 120.0,
+    ) -> None:
+        self.repository = repository
+        self.embeddings = embeddings
+        self.versions = embeddings.versions
+        self.max_docs_per_second = max_docs_per_second
+        self.pages_per_step = pages_per_step
+        self.lease_seconds = lease_seconds
+        self.owner = str(uuid.uuid4())
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> Dict[str, Any]:
+        """Start a job, or take over the unfinished one if its runner is gone. Returns the job."""
+        job = await self._claim()
+        if job is None:
+            current = await self.latest()
+            if current is not None and current["status"] == "running":
+                # Still owned by a live runner, here or in another worker
+                return current
+            await self.versions.load()
+            version = self.versions.building or self.versions.active
+            scope = "all" if self.versions.building is not None else "missing"
+            properties = {"embedding": version.embedding_property, "chunks_hash": version.chunks_hash_property}
+            totals = {}
+            for phase in PHASES:
+                result = await self.repository.read(COUNT_QUERIES[scope][phase] % properties)
+                totals[phase] = result[0]["total"] if result else 0
+            now = time.time()
+            # Checked and created in one transaction: the lock node's write lock serializes
+            # concurrent starts, so only one of them finds no running job and creates one
+            result = await self.repository.write(
+                """
+                MERGE (lock:MigrationLock {kind: 'embeddings'})
+                SET lock.locked_at = $now
+                WITH lock
+                OPTIONAL MATCH (running:MigrationJob {kind: 'embeddings', status: 'running'})
+                WITH running ORDER BY running.started_at DESC LIMIT 1
+                FOREACH (_ IN CASE WHEN running IS NULL THEN [1] ELSE [] END |
+                    CREATE (:MigrationJob {
+                        id: $id, kind: 'embeddings', status: 'running', version: $version, scope: $scope,
+                        phase: $phase, last_id: '', processed: 0, skipped: 0, total: $total, active_seconds: 0.0,
+                        started_at: $now, updated_at: $now, cancel_requested: false,
+                        owner: $owner, heartbeat_at: $now
+                    })
+                )
+                WITH COALESCE(running.id, $id) as job_id, running IS NULL as created
+                MATCH (j:MigrationJob {id: job_id})
+                RETURN created, """ + JOB_FIELDS,
+                {
+                    "id": str(uuid.uuid4()), "version": version.key, "scope": scope, "phase": PHASES[0],
+                    "total": sum(totals.values()), "now": now, "owner": self.owner
+                }
+            )
+            job = result[0]
+            if not job.pop("created"):
+                # Another worker started one first
+                return self.progress(job)
+        self._launch(job)
+        return self.progress(job)
+
+    async def resume(self) -> Optional[Dict[str, Any]]:
+        """Pick up an unfinished job at startup, if there is one nobody else is running."""
+        job = await self._claim()
+        if job is None:
+            return None
+        print(f"Resuming embedding migration {job['id']} at {job['phase']} after '{job['last_id']}'")
+        self._launch(job)
+        return self.progress(job)
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        result = await self.repository.write(
+            """
+            MATCH (j:MigrationJob {id: $id})
+            SET j.cancel_requested = true,
+                j.status = CASE WHEN j.status = 'running' AND j.owner IS NULL THEN 'cancelled' ELSE j.status END
+            RETURN """ + JOB_FIELDS,
+            {"id": job_id}
+        )
+        return self.progress(result[0]) if result else None
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        result = await self.repository.read(
+            "MATCH (j:MigrationJob {id: $id}) RETURN " + JOB_FIELDS, {"id": job_id}
+        )
+        return self.progress(result[0]) if result else None
+
+    async def latest(self) -> Optional[Dict[str, Any]]:
+        result = await self.repository.read(
+            "MATCH (j:MigrationJob {kind: 'embeddings'}) RETURN " + JOB_FIELDS + " ORDER BY started_at DESC LIMIT 1"
+        )
+        return self.progress(result[0]) if result else None
+
+    async def stop(self) -> None:
+        """Stop running at the next page and hand the lease back, so a restart resumes at once."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.repository.write(
+            """
+            MATCH (j:MigrationJob {owner: $owner})
+            WHERE j.status = 'running'
+            SET j.owner = null, j.heartbeat_at = null
+            """,
+            {"owner": self.owner}
+        )
+
+    def progress(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        job = dict(job)
+        # Candidates skipped for having no text count as done
+        done = (job.get("processed") or 0) + (job.get("skipped") or 0)
+        total = job.get("total") or 0
+        active = job.get("active_seconds") or 0.0
+        rate = done / active if active else 0.0
+        remaining = max(total - done, 0)
+        job["percent"] = round(min(100.0 * done / total, 100.0), 1) if total else 100.0
+        job["docs_per_second"] = round(rate, 2)
+        job["eta_seconds"] = round(remaining / rate, 1) if rate and job["status"] == "running" else None
+        job.pop("owner", None)
+        return job
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        # Under the same lock as start(), so two workers can't both take over a stale job
+        now = time.time()
+        result = await self.repository.write(
+            """
+            MERGE (lock:MigrationLock {kind: 'embeddings'})
+            SET lock.locked_at = $now
+            WITH lock
+            MATCH (j:MigrationJob {kind: 'embeddings', status: 'running'})
+            WHERE j.owner IS NULL OR j.owner = $owner OR j.heartbeat_at < $stale
+            WITH j ORDER BY j.started_at DESC LIMIT 1
+            SET j.owner = $owner, j.heartbeat_at = $now
+            RETURN """ + JOB_FIELDS,
+            {"owner": self.owner, "now": now, "stale": now - self.lease_seconds}
+        )
+        return result[0] if result else None
+
+    def _launch(self, job: Dict[str, Any]) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(job))
+
+    async def _step(self, version: EmbeddingVersion, scope: str, phase: str, after_id: str):
+        if phase == "note_chunks":
+            chunker = self.embeddings.chunker_for(version)
+            sync = chunker.sync_all if scope == "all" else chunker.sync_missing
+            stats = await sync(after_id, max_pages=self.pages_per_step)
+            return stats.notes + stats.unchanged, 0, stats.last_id, stats.exhausted
+        pipeline = self.embeddings.pipeline_for(version)
+        embed = pipeline.embed_all if scope == "all" else pipeline.embed_missing
+        stats = await embed(phase, after_id, max_pages=self.pages_per_step)
+        return stats.documents + stats.unchanged + stats.reused, stats.skipped, stats.last_id, stats.exhausted
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        phase = job["phase"]
+        after_id = job["last_id"] or ""
+        scope = job.get("scope") or "missing"
+        try:
+            await self.versions.load()
+            # Jobs from before versioning filled in the active version
+            version = self.versions.get(job["version"]) if job.get("version") else self.versions.active
+            if version is None:
+                raise ValueError(f"embedding version {job['version']} no longer exists")
+            if scope == "all" and version != self.versions.building:
+                raise ValueError(f"embedding version {version.key} is no longer being built")
+            while phase is not None:
+                start = time.perf_counter()
+                processed, skipped, after_id, exhausted = await self._step(version, scope, phase, after_id)
+                if exhausted:
+                    next_index = PHASES.index(phase) + 1
+                    phase = PHASES[next_index] if next_index < len(PHASES) else None
+                    after_id = ""
+                elapsed = time.perf_counter() - start
+
+                # Checkpoint and heartbeat in one round trip, which also reports cancellation
+                result = await self.repository.write(
+                    """
+                    MATCH (j:MigrationJob {id: $id, owner: $owner})
+                    SET j.phase = COALESCE($phase, j.phase), j.last_id = $last_id,
+                        j.processed = j.processed + $processed, j.skipped = j.skipped + $skipped,
+                        j.active_seconds = j.active_seconds + $elapsed,
+                        j.updated_at = $now, j.heartbeat_at = $now,
+                        j.status = CASE WHEN j.cancel_requested THEN 'cancelled'
+                                        WHEN $phase IS NULL THEN 'completed' ELSE j.status END,
+                        j.finished_at = CASE WHEN j.cancel_requested OR $phase IS NULL THEN $now END
+                    RETURN j.status as status
+                    """,
+                    {
+                        "id": job_id, "owner": self.owner, "phase": phase, "last_id": after_id,
+                        "processed": processed, "skipped": skipped, "elapsed": elapsed, "now": time.time()
+                    }
+                )
+                if not result:
+                    print(f"Embedding migration {job_id}: lease lost, stopping")
+                    return
+                if result[0]["status"] != "running":
+                    print(f"Embedding migration {job_id} {result[0]['status']}")
+                    if result[0]["status"] == "completed" and scope == "all":
+                        # Everything is embedded with the new version: cut searches over to it
+                        await self.versions.activate(version)
+                    return
+
+                # Pace to max_docs_per_second so backfill doesn't crowd out interactive embedding
+                if self.max_docs_per_second > 0 and processed:
+                    await asyncio.sleep(max(processed / self.max_docs_per_second - elapsed, 0.0))
+                else:
+                    await asyncio.sleep(0)
+        except Exception as e:
+            print(f"Embedding migration {job_id} failed: {e}")
+            await self.repository.write(
+                """
+                MATCH (j:MigrationJob {id: $id, owner: $owner})
+                SET j.status = 'failed', j.error = $error, j.finished_at = $now, j.updated_at = $now
+                """,
+                {"id": job_id, "owner": self.owner, "error": str(e), "now": time.time()}
+            )
@@ -0,0 +1,61 @@
+from typing import Any, Dict, List, Optional
+
+from neo4j import AsyncGraphDatabase, READ_ACCESS, WRITE_ACCESS
+
+
+class Neo4jRepository:
+    """Async data-access layer over a pooled Neo4j driver.
+
+    Reads and writes go through managed transactions (``execute_read`` /
+    ``execute_write``), so transient errors are retried by the driver and, on a
+    cluster, reads are routed to followers while writes go to the leader.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        username: str,
+        password: str,
+        database: str = "neo4j",
+        max_connection_pool_size: int = 50,
+        connection_acquisition_timeout: float = 30.0,
+        max_transaction_retry_time: float = 15.0,
+    ) -> None:
+        self.database = database
+        self._driver = AsyncGraphDatabase.driver(
+            url,
+            auth=(username, password),
+            max_connection_pool_size=max_connection_pool_size,
+            connection_acquisition_timeout=connection_acquisition_timeout,
+            max_transaction_retry_time=max_transaction_retry_time,
+        )
+
+    @staticmethod
+    async def _run(tx, query: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        result = await tx.run(query, params)
+        return await result.data()
+
+    async def read(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        async with self._driver.session(
+            database=self.database, default_access_mode=READ_ACCESS
+        ) as session:
+            return await session.execute_read(self._run, query, params or {})
+
+    async def write(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        async with self._driver.session(
+            database=self.database, default_access_mode=WRITE_ACCESS
+        ) as session:
+            return await session.execute_write(self._run, query, params or {})
+
+    async def execute(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        # Auto-commit transaction, needed for schema statements and
+        # `CALL { ... } IN TRANSACTIONS`, which can't run in a managed transaction.
+        async with self._driver.session(database=self.database) as session:
+            result = await session.run(query, params or {})
+            return await result.data()
+
+    async def verify_connectivity(self) -> None:
+        await self._driver.verify_connectivity()
+
+    async def close(self) -> None:
+        await self._driver.close()
@@ -0,0 +1,244 @@
+import asyncio
+import time
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from embedding_pipeline import body_text, embedding_hash, embedding_text
+from embedding_versions import LEGACY_KEY, EmbeddingVersion
+from neo4j_repository import Neo4jRepository
+
+# Notes whose chunks may be stale, with the hashes of the chunks they already
+# have, formatted with a version's property names and chunk filter
+CHUNK_SOURCE_QUERIES = {
+    "missing": """
+    MATCH (n:Note)
+    WHERE n.%(chunks_hash)s IS NULL AND n.id > $after_id
+    WITH n ORDER BY n.id LIMIT $page_size
+    OPTIONAL MATCH (c:NoteChunk)-[:CHUNK_OF]->(n)
+    WHERE %(chunk_filter)s
+    RETURN n.id as id, n.title as title, n.plain_text as text,
+           CASE WHEN n.plain_text IS NULL THEN n.content END as legacy_content,
+           n.%(chunks_hash)s as chunks_hash, collect(c.hash) as chunk_hashes
+    ORDER BY id
+    """,
+    "all": """
+    MATCH (n:Note)
+    WHERE n.id > $after_id
+    WITH n ORDER BY n.id LIMIT $page_size
+    OPTIONAL MATCH (c:NoteChunk)-[:CHUNK_OF]->(n)
+    WHERE %(chunk_filter)s
+    RETURN n.id as id, n.title as title, n.plain_text as text,
+           CASE WHEN n.plain_text IS NULL THEN n.content END as legacy_content,
+           n.%(chunks_hash)s as chunks_hash, collect(c.hash) as chunk_hashes
+    ORDER BY id
+    """,
+    "ids": """
+    UNWIND $ids AS note_id
+    MATCH (n:Note {id: note_id})
+    WHERE n.id > $after_id
+    WITH n ORDER BY n.id LIMIT $page_size
+    OPTIONAL MATCH (c:NoteChunk)-[:CHUNK_OF]->(n)
+    WHERE %(chunk_filter)s
+    RETURN n.id as id, n.title as title, n.plain_text as text,
+           CASE WHEN n.plain_text IS NULL THEN n.content END as legacy_content,
+           n.%(chunks_hash)s as chunks_hash, collect(c.hash) as chunk_hashes
+    ORDER BY id
+    """,
+}
+
+# Drop chunks whose text is gone, create the new ones and renumber the rest.
+# Kept chunks are matched by hash and keep their stored embedding. Other
+# versions' chunks of the note are left alone.
+CHUNK_WRITE_QUERY = """
+UNWIND $notes AS note
+MATCH (n:Note {id: note.id})
+SET n.%(chunks_hash)s = note.chunks_hash, n.chunk_count = size(note.chunks)
+WITH n, note
+OPTIONAL MATCH (old:NoteChunk)-[:CHUNK_OF]->(n)
+WHERE %(old_filter)s AND NOT old.hash IN [chunk IN note.chunks | chunk.hash]
+DETACH DELETE old
+WITH DISTINCT n, note
+UNWIND note.chunks AS chunk
+MERGE (c:NoteChunk {note_id: n.id, hash: chunk.hash%(version_key)s})
+ON CREATE SET c.id = randomUUID(), c.text = chunk.text
+SET c.index = chunk.index,
+    c.%(embedding)s = COALESCE(chunk.embedding, c.%(embedding)s)
+MERGE (c)-[:CHUNK_OF]->(n)
+"""
+
+
+def chunk_query_properties(version: EmbeddingVersion) -> Dict[str, str]:
+    return {
+        "chunks_hash": version.chunks_hash_property,
+        "embedding": version.embedding_property,
+        "chunk_filter": version.chunk_filter("c"),
+        "old_filter": version.chunk_filter("old"),
+        # Legacy chunks predate the version property
+        "version_key": "" if version.key == LEGACY_KEY else ", version: '%s'" % version.key,
+    }
+
+
+@dataclass
+class ChunkStats:
+    notes: int = 0
+    unchanged: int = 0
+    chunks_embedded: int = 0
+    chunks_reused: int = 0
+    last_id: str = ""
+    exhausted: bool = False
+    started_at: float = field(default_factory=time.perf_counter)
+    elapsed_seconds: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "notes": self.notes,
+            "unchanged": self.unchanged,
+            "chunks_embedded": self.chunks_embedded,
+            "chunks_reused": self.chunks_reused,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+        }
+
+
+class NoteChunker:
+    """Keeps each note's NoteChunk passages and their embeddings in sync with its text.
+
+    The embedding model only sees the first ~256 word pieces of its input, so
+    long notes are split into overlapping passages that are embedded and
+    searched on their own. A chunk is identified by the hash of its version
+    and its text, so an edit re-embeds only the passages it touched. Every
+    ``version`` has its own set of chunks. ``on_write`` is awaited with every
+    batch of re-chunked notes once it is stored.
+    """
+
+    def __init__(
+        self,
+        repository: Neo4jRepository,
+        embeddings: Any,
+        version: EmbeddingVersion,
+        chunk_size: int = 800,
+        chunk_overlap: int = 100,
+        batch_size: int = 32,
+        page_size: int = 64,
+        executor: Optional[Executor] = None,
+        on_write: Optional[Callable[[str, List[Dict[str, Any]]], Awaitable[None]]] = None,
+    ) -> None:
+        self.repository = repository
+        self.embeddings = embeddings
+        self.version = version
+        self.model_id = version.model_id
+        # Legacy chunks were keyed by model id alone; a version's key also names its
+        # dimension, and keeps its hashes apart from legacy chunks of the same model
+        self.hash_namespace = version.model_id if version.key == LEGACY_KEY else version.key
+        properties = chunk_query_properties(version)
+        self.source_queries = {scope: query % properties for scope, query in CHUNK_SOURCE_QUERIES.items()}
+        self.write_query = CHUNK_WRITE_QUERY % properties
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len
+        )
+        self.batch_size = batch_size
+        self.page_size = page_size
+        self.executor = executor
+        self.on_write = on_write
+        self.chunks_embedded = 0
+        self.chunks_reused = 0
+
+    def split(self, title: str, text: str) -> List[Dict[str, Any]]:
+        chunks = []
+        seen = set()
+        for chunk_text in self.splitter.split_text(text or ""):
+            # The title gives every passage the note's topic
+            chunk_hash = embedding_hash(self.hash_namespace, f"{title}\n{chunk_text}")
+            if chunk_hash in seen:
+                continue
+            seen.add(chunk_hash)
+            chunks.append({"index": len(chunks), "text": chunk_text, "hash": chunk_hash, "embedding": None})
+        return chunks
+
+    async def sync_missing(self, after_id: str = "", max_pages: Optional[int] = None) -> ChunkStats:
+        """Chunk notes that have never been chunked, resuming after ``after_id``, for at most ``max_pages`` pages."""
+        return await self._run(self.source_queries["missing"], {}, after_id, max_pages)
+
+    async def sync_all(self, after_id: str = "", max_pages: Optional[int] = None) -> ChunkStats:
+        """Bring every note's chunks up to date, resuming after ``after_id``; used to build a version."""
+        return await self._run(self.source_queries["all"], {}, after_id, max_pages)
+
+    async def sync_ids(self, ids: List[str]) -> ChunkStats:
+        """Re-chunk the given notes, embedding only passages that changed."""
+        return await self._run(self.source_queries["ids"], {"ids": list(ids)})
+
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            batch = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.embeddings.embed_documents, texts[i:i + self.batch_size]
+            )
+            vectors.extend(list(vector) for vector in batch)
+        return vectors
+
+    async def _run(
+        self, source_query: str, params: Dict[str, Any], after_id: str = "", max_pages: Optional[int] = None
+    ) -> ChunkStats:
+        stats = ChunkStats()
+        pages = 0
+        while max_pages is None or pages < max_pages:
+            page = await self.repository.read(source_query, {**params, "after_id": after_id, "page_size": self.page_size})
+            if not page:
+                stats.exhausted = True
+                break
+            pages += 1
+            after_id = page[-1]["id"]
+
+            notes = []
+            to_embed = []
+            for row in page:
+                # Same fingerprint as the note-level embedding: title, text and model
+                note_hash = embedding_hash(self.model_id, embedding_text(row))
+                if note_hash == row["chunks_hash"]:
+                    stats.unchanged += 1
+                    continue
+                title = row.get("title") or ""
+                chunks = self.split(title, body_text(row))
+                existing = set(row["chunk_hashes"])
+                for chunk in chunks:
+                    if chunk["hash"] in existing:
+                        stats.chunks_reused += 1
+                    else:
+                        to_embed.append((chunk, f"{title}\n{chunk['text']}"))
+                notes.append({"id": row["id"], "chunks_hash": note_hash, "chunks": chunks})
+
+            if to_embed:
+                vectors = await self._embed([text for _, text in to_embed])
+                for (chunk, _), vector in zip(to_embed, vectors):
+                    chunk["embedding"] = vector
+                stats.chunks_embedded += len(to_embed)
+
+            if notes:
+                await self.repository.write(self.write_query, {"notes": notes})
+                stats.notes += len(notes)
+                if self.on_write is not None:
+                    await self.on_write("note", notes)
+
+            if len(page) < self.page_size:
+                stats.exhausted = True
+                break
+
+        stats.last_id = after_id
+        self.chunks_embedded += stats.chunks_embedded
+        self.chunks_reused += stats.chunks_reused
+        stats.elapsed_seconds = time.perf_counter() - stats.started_at
+        if stats.notes:
+            print(
+                f"Note chunks: {stats.notes} notes re-chunked, {stats.chunks_embedded} passages embedded, "
+                f"{stats.chunks_reused} reused"
+            )
+        return stats
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version.key,
+            "chunks_embedded": self.chunks_embedded,
+            "chunks_reused": self.chunks_reused,
+        }
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import random
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+# Status codes worth retrying: Ollama returns 503 while a model is still loading
+RETRYABLE_STATUS_CODES = {502, 503, 504}
+
+
+class OllamaError(Exception):
+    pass
+
+
+class OllamaTimeoutError(OllamaError):
+    pass
+
+
+class OllamaClient:
+    """Shared async client for the Ollama chat API.
+
+    One pooled ``httpx.AsyncClient`` is reused across requests, so connections
+    are kept alive between calls and no call blocks the event loop. Connection
+    failures and 5xx responses are retried with full-jitter exponential backoff,
+    but only before any output has been returned to the caller.
+    """
+
+    def __init__(
+        self,
+        chat_url: str,
+        model: str,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 5.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 4.0,
+    ) -> None:
+        self.chat_url = chat_url
+        self.model = model
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Created lazily so the client binds to the running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(limits=self._limits)
+        return self._client
+
+    def _payload(self, messages: List[Dict[str, str]], stream: bool, temperature: Optional[float]) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {
+            "model": self.model,
+            "messages": messages,
+            "stream": stream,
+        }
+        if temperature is not None:
+            payload["options"] = {"temperature": temperature}
+        return payload
+
+    def _timeout(self, timeout: float) -> httpx.Timeout:
+        return httpx.Timeout(timeout, connect=min(self.connect_timeout, timeout))
+
+    async def _backoff(self, attempt: int) -> None:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        await asyncio.sleep(random.uniform(0, delay))
+
+    async def _send(self, payload: Dict[str, Any], timeout: float, stream: bool) -> httpx.Response:
+        client = self._get_client()
+        attempt = 0
+        while True:
+            try:
+                request = client.build_request("POST", self.chat_url, json=payload, timeout=self._timeout(timeout))
+                response = await client.send(request, stream=stream)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError) as e:
+                if attempt >= self.max_retries:
+                    if isinstance(e, httpx.TimeoutException):
+                        raise OllamaTimeoutError(str(e)) from e
+                    raise OllamaError(str(e)) from e
+            except httpx.TimeoutException as e:
+                raise OllamaTimeoutError(str(e)) from e
+            except httpx.HTTPError as e:
+                raise OllamaError(str(e)) from e
+            else:
+                if response.status_code in RETRYABLE_STATUS_CODES and attempt < self.max_retries:
+                    await response.aclose()
+                elif response.is_error:
+                    if stream:
+                        await response.aread()
+                    await response.aclose()
+                    raise OllamaError(f"Ollama returned HTTP {response.status_code}: {response.text[:200]}")
+                else:
+                    return response
+            await self._backoff(attempt)
+            attempt += 1
+
+    async def chat(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float] = None,
+        timeout: float = 30.0,
+    ) -> Dict[str, Any]:
+        response = await self._send(self._payload(messages, False, temperature), timeout, stream=False)
+        try:
+            return response.json()
+        except ValueError as e:
+            raise OllamaError(f"Invalid JSON from Ollama: {e}") from e
+
+    async def stream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float] = None,
+        timeout: float = 60.0,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield decoded chunks from a streaming chat call; ``timeout`` applies per read."""
+        response = await self._send(self._payload(messages, True, temperature), timeout, stream=True)
+        try:
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as json_err:
+                    print(f"Error decoding Ollama response line: {line}, Error: {json_err}")
+        except httpx.TimeoutException as e:
+            raise OllamaTimeoutError(str(e)) from e
+        except httpx.HTTPError as e:
+            raise OllamaError(str(e)) from e
+        finally:
+            await response.aclose()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,79 @@
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from passlib.context import CryptContext
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    """Runs bcrypt hashing and verification on a bounded worker pool.
+
+    bcrypt releases the GIL while hashing, so a small thread pool keeps the
+    event loop free. Calls beyond ``max_pending`` (running plus queued) are
+    rejected with PasswordHasherBusy instead of piling up behind a login burst.
+    A call stays pending until its bcrypt thread is done, even if the request
+    awaiting it was cancelled, since the thread can't be interrupted.
+    """
+
+    def __init__(self, context: CryptContext, max_workers: int = 2, max_pending: int = 16) -> None:
+        self.context = context
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        # Only touched from the event loop thread, so no lock is needed
+        self._pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.rejected = 0
+
+    async def _submit(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHasherBusy(f"{self._pending} password operations already pending")
+        loop = asyncio.get_running_loop()
+        future = self._executor.submit(fn, *args)
+        self._pending += 1
+        # Runs on the worker thread (or here, if cancelled before it started); count on the loop
+        future.add_done_callback(lambda done: self._call_on_loop(loop, done))
+        return await asyncio.wrap_future(future)
+
+    def _call_on_loop(self, loop: asyncio.AbstractEventLoop, future: Future) -> None:
+        try:
+            loop.call_soon_threadsafe(self._finished, future)
+        except RuntimeError:
+            # Loop already closed at shutdown
+            pass
+
+    def _finished(self, future: Future) -> None:
+        self._pending -= 1
+        if future.cancelled():
+            self.cancelled += 1
+        elif future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(self.context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._submit(self.context.verify, plain_password, hashed_password)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
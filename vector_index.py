@@ -0,0 +1,344 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cache import TTLCache
+from embedding_versions import EmbeddingVersion
+from neo4j_repository import Neo4jRepository
+
+# A user's embedded notes and journals, formatted with a version's embedding property
+LOAD_QUERIES = {
+    "note": """
+    MATCH (x:Note)-[:CREATED_BY]->(:User {username: $username})
+    WHERE x.%(embedding)s IS NOT NULL
+    RETURN x.id as id, x.%(embedding)s as embedding
+    """,
+    "journal": """
+    MATCH (x:Journal)-[:OWNED_BY]->(:User {username: $username})
+    WHERE x.%(embedding)s IS NOT NULL
+    RETURN x.id as id, x.%(embedding)s as embedding
+    """,
+}
+
+OWNER_QUERIES = {
+    "note": """
+    UNWIND $ids AS item_id
+    MATCH (x:Note {id: item_id})-[:CREATED_BY]->(u:User)
+    RETURN x.id as id, u.username as username
+    """,
+    "journal": """
+    UNWIND $ids AS item_id
+    MATCH (x:Journal {id: item_id})-[:OWNED_BY]->(u:User)
+    RETURN x.id as id, u.username as username
+    """,
+}
+
+
+def normalize(vectors: Any) -> np.ndarray:
+    """Rows scaled to unit length as float32, so a dot product is the cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+class VectorMatrix:
+    """Unit-length float32 vectors in one contiguous matrix, scored with a single matrix-vector product.
+
+    Rows stay packed: a removed vector's row is filled with the last one, and
+    capacity doubles as vectors are added, so updates never copy the matrix
+    except to grow it.
+    """
+
+    def __init__(self, dimension: int, capacity: int = 64) -> None:
+        self.dimension = dimension
+        self._matrix = np.zeros((max(capacity, 1), dimension), dtype=np.float32)
+        self.ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._rows
+
+    @classmethod
+    def build(cls, dimension: int, ids: Sequence[str], vectors: Any) -> "VectorMatrix":
+        matrix = cls(dimension, capacity=len(ids))
+        if len(ids):
+            matrix._matrix[:len(ids)] = normalize(vectors)
+            matrix.ids = list(ids)
+            matrix._rows = {item_id: row for row, item_id in enumerate(ids)}
+        return matrix
+
+    def upsert(self, item_id: str, vector: Sequence[float]) -> None:
+        row = self._rows.get(item_id)
+        if row is None:
+            row = len(self.ids)
+            if row == len(self._matrix):
+                grown = np.zeros((2 * len(self._matrix), self.dimension), dtype=np.float32)
+                grown[:row] = self._matrix[:row]
+                self._matrix = grown
+            self.ids.append(item_id)
+            self._rows[item_id] = row
+        self._matrix[row] = normalize(vector)
+
+    def remove(self, item_id: str) -> bool:
+        row = self._rows.pop(item_id, None)
+        if row is None:
+            return False
+        last = len(self.ids) - 1
+        if row != last:
+            moved = self.ids[last]
+            self._matrix[row] = self._matrix[last]
+            self.ids[row] = moved
+            self._rows[moved] = row
+        self.ids.pop()
+        return True
+
+    def search(self, query: Any, k: int, min_score: float = -1.0) -> List[Tuple[str, float]]:
+        """The ``k`` most similar ids above ``min_score``, best first."""
+        count = len(self.ids)
+        if not count or k <= 0:
+            return []
+        scores = self._matrix[:count] @ normalize(query)
+        if k < count:
+            # Partial selection of the top k, then sort just those
+            top = np.argpartition(scores, count - k)[count - k:]
+        else:
+            top = np.arange(count)
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[row], float(scores[row])) for row in top if scores[row] > min_score]
+
+
+class UserVectors:
+    """One user's note and journal vectors under one embedding version."""
+
+    def __init__(self, version_key: str, matrices: Dict[str, VectorMatrix]) -> None:
+        self.version_key = version_key
+        self.matrices = matrices
+
+
+class UserVectorIndexes:
+    """In-memory vector indexes of recently active users, for semantic search without the Neo4j vector index.
+
+    A user's vectors are loaded on their first search and then kept current
+    by ``update``, which the embedding pipeline calls after every write.
+    Writes and removals that land while a user's index is loading are queued
+    and applied once the load finishes, since the load may have read the
+    rows before they changed.
+    Indexes are kept for ``max_users`` users and reloaded after ``ttl``
+    seconds, which bounds how long writes embedded by other worker processes
+    take to show up.
+    """
+
+    def __init__(self, repository: Neo4jRepository, max_users: int = 64, ttl: float = 600.0) -> None:
+        self.repository = repository
+        self.indexes = TTLCache(maxsize=max_users, ttl=ttl, on_remove=self._forget)
+        # item id -> username for every vector in a cached index; entries leave with their index
+        self._owners: Dict[str, str] = {}
+        self._loading: Dict[str, asyncio.Task] = {}
+        # username -> (version key, kind, item id, embedding or None to remove) seen during its load
+        self._queued: Dict[str, List[Tuple[Optional[str], str, str, Optional[Sequence[float]]]]] = {}
+        # Bumped by clear(), so loads that started before it don't cache what they read
+        self._generation = 0
+        self.loads = 0
+        self.load_seconds = 0.0
+        self.searches = 0
+        self.search_seconds = 0.0
+        self.updates = 0
+
+    async def get(self, username: str, version: EmbeddingVersion) -> UserVectors:
+        index = self.indexes.get(username)
+        if index is not None and index.version_key == version.key:
+            return index
+        # Concurrent searches by the same user share one load
+        task = self._loading.get(username)
+        if task is None:
+            self._queued[username] = []
+            task = self._loading[username] = asyncio.create_task(self._load(username, version, self._generation))
+            task.add_done_callback(lambda _: self._load_finished(username))
+        return await asyncio.shield(task)
+
+    def _load_finished(self, username: str) -> None:
+        self._loading.pop(username, None)
+        # Left over only if the load failed; the next load reads those rows anyway
+        self._queued.pop(username, None)
+
+    async def _load(self, username: str, version: EmbeddingVersion, generation: int) -> UserVectors:
+        start = time.perf_counter()
+        matrices = {}
+        for kind, query in LOAD_QUERIES.items():
+            rows = await self.repository.read(
+                query % {"embedding": version.embedding_property}, {"username": username}
+            )
+            rows = [row for row in rows if len(row["embedding"]) == version.dimension]
+            ids = [row["id"] for row in rows]
+            # Normalizing a large account's vectors takes a while; keep it off the event loop
+            matrices[kind] = await asyncio.to_thread(
+                VectorMatrix.build, version.dimension, ids, [row["embedding"] for row in rows]
+            )
+        index = UserVectors(version.key, matrices)
+        if generation != self._generation:
+            # Cleared while loading: serve this search, but don't keep what may be gone
+            return index
+        # Replacing a previous index forgets its owners first
+        self.indexes.set(username, index)
+        for matrix in matrices.values():
+            for item_id in matrix.ids:
+                self._owners[item_id] = username
+        for version_key, kind, item_id, embedding in self._queued.pop(username, []):
+            if embedding is None:
+                self._owners.pop(item_id, None)
+                matrices[kind].remove(item_id)
+            elif version_key == version.key:
+                self._owners[item_id] = username
+                matrices[kind].upsert(item_id, embedding)
+                self.updates += 1
+        self.loads += 1
+        self.load_seconds += time.perf_counter() - start
+        return index
+
+    async def search(
+        self,
+        username: str,
+        version: EmbeddingVersion,
+        kind: str,
+        query_embedding: Sequence[float],
+        k: int,
+        min_score: float = -1.0,
+    ) -> List[Tuple[str, float]]:
+        index = await self.get(username, version)
+        start = time.perf_counter()
+        hits = index.matrices[kind].search(query_embedding, k, min_score)
+        self.searches += 1
+        self.search_seconds += time.perf_counter() - start
+        return hits
+
+    async def update(self, version: EmbeddingVersion, kind: str, rows: List[Dict[str, Any]]) -> None:
+        """Apply freshly written embeddings to the loaded indexes of their owners, or queue them behind a load."""
+        if not len(self.indexes) and not self._loading:
+            return
+        try:
+            unknown = [row["id"] for row in rows if row["id"] not in self._owners]
+            if unknown:
+                # New notes and journals, or ones whose owner has no index loaded
+                for row in await self.repository.read(OWNER_QUERIES[kind], {"ids": unknown}):
+                    self._owners[row["id"]] = row["username"]
+            for row in rows:
+                username = self._owners.get(row["id"])
+                # peek: updates aren't lookups, so they stay out of the hit rate
+                index = self.indexes.peek(username) if username is not None else None
+                if (index is None or index.version_key != version.key) and username in self._queued:
+                    # Owner recorded again when the queued write is applied
+                    self._owners.pop(row["id"], None)
+                    self._queued[username].append((version.key, kind, row["id"], row["embedding"]))
+                    continue
+                if index is None:
+                    self._owners.pop(row["id"], None)
+                    continue
+                if index.version_key == version.key:
+                    index.matrices[kind].upsert(row["id"], row["embedding"])
+                    self.updates += 1
+                elif row["id"] not in index.matrices[kind]:
+                    self._owners.pop(row["id"], None)
+        except Exception as e:
+            # The index catches up when it is next reloaded
+            print(f"Vector index update failed: {e}")
+
+    def discard(self, username: str, kind: str, item_ids: Iterable[str]) -> None:
+        index = self.indexes.peek(username)
+        queued = self._queued.get(username)
+        for item_id in item_ids:
+            self._owners.pop(item_id, None)
+            if index is not None:
+                index.matrices[kind].remove(item_id)
+            if queued is not None:
+                queued.append((None, kind, item_id, None))
+
+    def clear(self) -> None:
+        """Drop every loaded index, e.g. after the notes and journals in them were deleted."""
+        self._generation += 1
+        self.indexes.clear()
+        self._owners.clear()
+        for queued in self._queued.values():
+            queued.clear()
+
+    def _forget(self, username: str, index: UserVectors) -> None:
+        # The index was evicted, expired or replaced by a reload
+        for matrix in index.matrices.values():
+            for item_id in matrix.ids:
+                if self._owners.get(item_id) == username:
+                    del self._owners[item_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self.indexes),
+            "tracked_ids": len(self._owners),
+            "loads": self.loads,
+            "mean_load_ms": round(self.load_seconds / self.loads * 1000, 3) if self.loads else 0.0,
+            "searches": self.searches,
+            "mean_search_ms": round(self.search_seconds / self.searches * 1000, 3) if self.searches else 0.0,
+            "updates": self.updates,
+            "cache": self.indexes.stats(),
+        }
+
+
+class OverFetch:
+    """Adaptive over-fetching from a vector index shared by every user, until enough of one user's hits are found.
+
+    ``fetch(top_k)`` queries the index for ``top_k`` candidates and returns
+    ``fetched`` (how many it got), ``lowest`` (the lowest candidate score) and
+    ``owned`` (the user's candidates above the minimum score). While fewer than
+    ``k`` are owned, ``top_k`` grows by the observed owned ratio, at least
+    doubling, up to ``max_candidates``. It stops early once the index has no
+    more candidates or the lowest score is already below the minimum, since
+    candidates further down can't qualify.
+    """
+
+    def __init__(self, max_candidates: int = 1000, initial_factor: int = 2) -> None:
+        self.max_candidates = max_candidates
+        self.initial_factor = initial_factor
+        self.searches = 0
+        self.rounds = 0
+        self.candidates = 0
+        self.incomplete = 0
+
+    async def search(
+        self,
+        fetch: Callable[[int], Awaitable[Dict[str, Any]]],
+        k: int,
+        min_score: float,
+        count: Callable[[List[Dict[str, Any]]], int] = len,
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """The owned hits, best first, and whether they are all of the user's top ``k``.
+
+        ``count`` measures progress towards ``k``, e.g. distinct notes among passage hits.
+        """
+        top_k = min(max(k * self.initial_factor, 10), self.max_candidates)
+        self.searches += 1
+        while True:
+            result = await fetch(top_k)
+            self.rounds += 1
+            self.candidates += result["fetched"]
+            owned = sorted(result["owned"], key=lambda hit: hit["score"], reverse=True)
+            found = count(owned)
+            exhausted = result["fetched"] < top_k
+            below_minimum = result["lowest"] is not None and result["lowest"] <= min_score
+            if found >= k or exhausted or below_minimum:
+                return owned, True
+            if top_k >= self.max_candidates:
+                self.incomplete += 1
+                return owned, False
+            # Enough candidates for k owned hits at the ratio seen so far
+            growth = k / found * 1.5 if found else float(k)
+            top_k = min(int(top_k * max(growth, 2.0)), self.max_candidates)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "searches": self.searches,
+            "mean_rounds": round(self.rounds / self.searches, 2) if self.searches else 0.0,
+            "mean_candidates": round(self.candidates / self.searches, 1) if self.searches else 0.0,
+            "incomplete": self.incomplete,
+        }